@@ -1,16 +1,52 @@
-import boto3, os, json
+import asyncio, base64, functools, gzip, os, json, threading
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from pydantic import BaseModel
-from langchain_core.messages import BaseMessage, message_to_dict, messages_to_dict
 
-from src.services.langgraph.multi_agent_doc_processing.workflow import create_document_workflow
 from src.services.langgraph.multi_agent_doc_processing.state import DocumentState
+from src.services.langgraph.multi_agent_doc_processing.logging.structured import (
+    PACKAGE_LOGGER, configure_logging, flush_logs, get_logger, log_context,
+)
+from src.services.langgraph.multi_agent_doc_processing.utils.cold_start import LazyModule
+
+# Heavy SDKs are imported on first use, not at container start
+boto3 = LazyModule("boto3")
 
 # Load .env locally (safe: in AWS Lambda with env vars set, this is a no-op)
 load_dotenv()
 
+# JSON-lines logging, written to stdout by a background thread
+configure_logging()
+log = get_logger(f"{PACKAGE_LOGGER}.app")
+LOG_FLUSH_TIMEOUT = float(os.getenv("LOG_FLUSH_TIMEOUT", "0.5"))
+
 # Global workflow reference
 workflow_instance = None
+_init_lock = threading.Lock()
+
+# Secrets fetched from Secrets Manager, kept for the container's lifetime
+_secret_cache = {}
+_secret_lock = threading.Lock()
+
+# Upper bound on documents processed concurrently in a single batch invocation
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
+# Response size controls
+RESPONSE_EXCLUDED_FIELDS = frozenset(
+    f.strip() for f in os.getenv("RESPONSE_EXCLUDED_FIELDS", "document_content,messages").split(",") if f.strip()
+)
+GZIP_MIN_BYTES = int(os.getenv("GZIP_MIN_BYTES", "2048"))
+
+# State footprint: slotted result records (opt-in), and per-node messages unless AUDIT_VERBOSE is false
+COMPACT_STATE = os.getenv("COMPACT_STATE", "false").lower() in ("1", "true", "yes")
+AUDIT_VERBOSE = os.getenv("AUDIT_VERBOSE", "true").lower() in ("1", "true", "yes")
+
+# Per-node metrics of the workflow, flushed as CloudWatch EMF after each invocation (None when disabled)
+_instrumentation = None
+
+# Idempotency guard for handler invocations (None when not configured)
+_idempotency = None
+_idempotency_lock = threading.Lock()
 
 def get_openai_key():
     """
@@ -23,96 +59,576 @@ def get_openai_key():
 
     secret_arn = os.getenv("OPENAI_SECRET_ARN")
     if secret_arn:
-        sm = boto3.client("secretsmanager")
-        val = sm.get_secret_value(SecretId=secret_arn)
-        return val["SecretString"]
+        with _secret_lock:
+            if secret_arn not in _secret_cache:
+                sm = boto3.client("secretsmanager")
+                val = sm.get_secret_value(SecretId=secret_arn)
+                _secret_cache[secret_arn] = val["SecretString"]
+            return _secret_cache[secret_arn]
 
     raise RuntimeError("No OpenAI API Key available (checked OPENAI_API_KEY and OPENAI_SECRET_ARN)")
 
 
 
+def with_response_cache(llm, rate_limiter=None):
+    """
+    Wrap the LLM in the response cache when LLM_CACHE_ENABLED is set.
+    Uses the DynamoDB table named by LLM_CACHE_TABLE as the persistent tier,
+    otherwise a SQLite file at LLM_CACHE_PATH (default under /tmp, at most
+    LLM_CACHE_STORE_MAX_ENTRIES rows).
+    The rate limiter goes under the cache, so only calls that reach the
+    provider wait for (and spend) its budget.
+    """
+    if rate_limiter is not None:
+        llm = rate_limiter.wrap(llm)
+    if os.getenv("LLM_CACHE_ENABLED", "").lower() not in ("1", "true", "yes"):
+        return llm
+
+    from src.services.langgraph.multi_agent_doc_processing.utils.llm_cache import (
+        CachedLLM, SQLiteCacheStore, DynamoDBCacheStore,
+    )
+    table_name = os.getenv("LLM_CACHE_TABLE")
+    if table_name:
+        store = DynamoDBCacheStore(boto3.resource("dynamodb").Table(table_name))
+    else:
+        store = SQLiteCacheStore()
+    return CachedLLM(llm, store=store)
+
+
+def cascade_config(chat_model, api_key, rate_limiter=None):
+    """
+    Cascade settings when CASCADE_ESCALATION_MODEL is set: gpt-4o-mini handles every
+    document and those scoring below CASCADE_MIN_SCORE / CASCADE_MIN_CONFIDENCE
+    are re-run on the escalation model.
+    """
+    escalation_model = os.getenv("CASCADE_ESCALATION_MODEL")
+    if not escalation_model:
+        return None
+
+    from src.services.langgraph.multi_agent_doc_processing.utils.cascade import CascadeConfig
+    escalation_llm = chat_model(model=escalation_model, temperature=0, api_key=api_key)
+    return CascadeConfig(
+        with_response_cache(escalation_llm, rate_limiter),
+        min_score=float(os.getenv("CASCADE_MIN_SCORE", "0.8")),
+        min_confidence=float(os.getenv("CASCADE_MIN_CONFIDENCE", "0.8")),
+    )
+
+
+def repair_config():
+    """
+    Repair-loop settings when REPAIR_MAX_ITERATIONS is above 0 (off by default):
+    failing fields are re-requested up to that many times within REPAIR_MAX_TOKENS
+    per document.
+    """
+    max_iterations = int(os.getenv("REPAIR_MAX_ITERATIONS", "0"))
+    if max_iterations <= 0:
+        return None
+
+    from src.services.langgraph.multi_agent_doc_processing.utils.repair import RepairConfig
+    return RepairConfig(
+        max_iterations=max_iterations,
+        max_tokens=int(os.getenv("REPAIR_MAX_TOKENS", "4000")),
+    )
+
+
+def instrumentation_from_env():
+    """
+    Per-node EMF metrics when METRICS_ENABLED is set, in the METRICS_NAMESPACE
+    namespace, with LLM cost priced at METRICS_COST_PER_1K_TOKENS when set.
+    """
+    if os.getenv("METRICS_ENABLED", "").lower() not in ("1", "true", "yes"):
+        return None
+
+    from src.services.langgraph.multi_agent_doc_processing.utils.metrics import Instrumentation, DEFAULT_NAMESPACE
+    cost = os.getenv("METRICS_COST_PER_1K_TOKENS")
+    function_name = os.getenv("AWS_LAMBDA_FUNCTION_NAME")
+    return Instrumentation(
+        namespace=os.getenv("METRICS_NAMESPACE", DEFAULT_NAMESPACE),
+        dimensions={"FunctionName": function_name} if function_name else None,
+        cost_per_1k_tokens=float(cost) if cost else None,
+    )
+
+
+def flush_metrics():
+    if _instrumentation is not None:
+        _instrumentation.flush()
+
+
+def checkpointer_from_env():
+    """
+    Checkpoints in the DynamoDB table named by CHECKPOINT_TABLE, else in the
+    SQLite file at CHECKPOINT_PATH; None (no checkpointing) if neither is set.
+    """
+    table_name, path = os.getenv("CHECKPOINT_TABLE"), os.getenv("CHECKPOINT_PATH")
+    if not table_name and not path:
+        return None
+
+    from src.services.langgraph.multi_agent_doc_processing.utils.checkpoint import (
+        KVCheckpointSaver, SQLiteCheckpointStore, DynamoDBCheckpointStore,
+    )
+    if table_name:
+        return KVCheckpointSaver(DynamoDBCheckpointStore(boto3.resource("dynamodb").Table(table_name)))
+    return KVCheckpointSaver(SQLiteCheckpointStore(path))
+
+
 def get_app():
     """
     Initialize and return the LangGraph workflow.
+
+    The API key is fetched on a background thread while the provider SDK and
+    the graph modules are imported, so the Secrets Manager round-trip overlaps
+    the import work instead of adding to it.
+
+    Only a successfully built workflow is kept: a missing API key, a transient
+    Secrets Manager error or a bad setting raises with its own message, and the
+    next call tries again.
     """
-    global workflow_instance
+    global workflow_instance, _instrumentation
     if workflow_instance is not None:
         return workflow_instance
 
-    try:
-        api_key = get_openai_key()
-        from langchain_openai import ChatOpenAI
+    with _init_lock:
+        if workflow_instance is not None:
+            return workflow_instance
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            api_key = pool.submit(get_openai_key)
+            from langchain_openai import ChatOpenAI
+            from src.services.langgraph.multi_agent_doc_processing.workflow import create_document_workflow
+            api_key = api_key.result()
+        from src.services.langgraph.multi_agent_doc_processing.utils.rate_limit import RateLimiter
+        rate_limiter = RateLimiter.from_env()
         llm = ChatOpenAI(model="gpt-4o-mini", temperature=0, api_key=api_key)
-        workflow_instance = create_document_workflow(llm=llm)
-    except Exception:
-        class DummyWorkflow:
-            def invoke(self, state):
-                raise RuntimeError("OPENAI_API_KEY not set. Workflow not initialized.")
-        workflow_instance = DummyWorkflow()
+        llm = with_response_cache(llm, rate_limiter)
+        instrumentation = instrumentation_from_env()
+        workflow = create_document_workflow(
+            llm=llm,
+            cascade=cascade_config(ChatOpenAI, api_key, rate_limiter),
+            rate_limiter=rate_limiter,
+            structured_output=os.getenv("STRUCTURED_OUTPUT", "").lower() in ("1", "true", "yes"),
+            repair=repair_config(),
+            checkpointer=checkpointer_from_env(),
+            instrumentation=instrumentation,
+        )
+        _instrumentation, workflow_instance = instrumentation, workflow
 
     return workflow_instance
 
 
+def eager_init_enabled():
+    """Compile the workflow at import time when running in Lambda (disable with EAGER_INIT=false)."""
+    if not os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+        return False
+    return os.getenv("EAGER_INIT", "true").lower() in ("1", "true", "yes")
+
+
+@functools.lru_cache(maxsize=None)
+def _serializable_types():
+    from pydantic import BaseModel
+    from langchain_core.messages import BaseMessage, message_to_dict
+    return BaseModel, BaseMessage, message_to_dict
+
+
+def _identity(obj):
+    return obj
+
+
+def _serialize_dict(obj):
+    return {k: serialize(v) for k, v in obj.items()}
+
+
+def _serialize_list(obj):
+    return [serialize(v) for v in obj]
+
+
+def _serialize_model(obj):
+    return {k: serialize(getattr(obj, k)) for k in type(obj).model_fields}
+
+
+@functools.lru_cache(maxsize=256)
+def _converter(cls):
+    """The serializer for instances of `cls`, resolved once per type."""
+    if cls in (str, int, float, bool, type(None)):
+        return _identity
+    if issubclass(cls, Mapping):
+        return _serialize_dict
+    if issubclass(cls, (list, tuple)):
+        return _serialize_list
+    BaseModel, BaseMessage, message_to_dict = _serializable_types()
+    if issubclass(cls, BaseMessage):
+        return message_to_dict
+    if issubclass(cls, BaseModel):
+        return _serialize_model
+    return _identity
+
+
 def serialize(obj):
     """
-    Recursive serializer for workflow outputs
+    Single-pass serializer for workflow outputs: each value is converted by the
+    handler cached for its type (messages via `message_to_dict`, pydantic models
+    field by field, containers recursively, JSON primitives as-is).
     """
-    # Handle Pydantic models (DocumentState, sub-models)
-    if isinstance(obj, BaseModel):
-        return {k: serialize(v) for k, v in obj.dict().items()}
+    return _converter(type(obj))(obj)
 
-    # Handle single LangChain message
-    if isinstance(obj, BaseMessage):
-        return message_to_dict(obj)
 
-    # Handle list of LangChain messages
-    if isinstance(obj, list):
-        if all(isinstance(m, BaseMessage) for m in obj):
-            return messages_to_dict(obj)
-        return [serialize(v) for v in obj]
+def requested_fields(body):
+    """
+    The top-level result fields the client asked for ("fields": list or
+    comma-separated string; "*" for everything), or None for the default.
+    """
+    fields = body.get("fields")
+    if not fields:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    return tuple(field.strip() for field in fields if field.strip())
 
-    # Handle dicts
-    if isinstance(obj, dict):
-        return {k: serialize(v) for k, v in obj.items()}
 
-    # Pass through JSON-safe primitives
-    return obj
+def project(result, fields=None):
+    """
+    Keep only `fields` of a workflow result; by default drop the bulky echoes
+    (RESPONSE_EXCLUDED_FIELDS, the input document and message history).
+    """
+    if not isinstance(result, dict):
+        result = serialize(result)
+        if not isinstance(result, dict):
+            return result
+    if fields is None:
+        return {k: v for k, v in result.items() if k not in RESPONSE_EXCLUDED_FIELDS}
+    if "*" in fields:
+        return result
+    return {k: result[k] for k in fields if k in result}
 
 
+def build_state(body):
+    """
+    Build the initial workflow state for a single document payload.
+    """
+    return DocumentState(
+        document_content=body.get("document_content", ""),
+        document_type=body.get("document_type", "generic"),
+        human_review_required=body.get("human_review_required", False),
+        error_count=body.get("error_count", 0),
+        processing_stage="initial",
+        messages=[],
+        audit_trail=[],
+        audit_verbose=body.get("audit_verbose", AUDIT_VERBOSE),
+        compact_state=COMPACT_STATE,
+    )
 
-def handler(event, context):
+
+def run_document(workflow, body):
+    """
+    Run one document payload. With checkpointing, the document_id is the thread:
+    an interrupted run resumes where it stopped, and a payload with
+    "corrections" continues a reviewed document at validation.
+    """
+    thread_id = body.get("document_id")
+    with log_context(document_id=thread_id):
+        if getattr(workflow, "checkpointer", None) is None or not thread_id:
+            if "corrections" in body:
+                raise ValueError("'corrections' require checkpointing and a document_id")
+            return workflow.invoke(build_state(body))
+
+        from src.services.langgraph.multi_agent_doc_processing.utils.checkpoint import (
+            invoke_checkpointed, resume_with_corrections,
+        )
+        if "corrections" in body:
+            return resume_with_corrections(workflow, thread_id, body["corrections"])
+        return invoke_checkpointed(workflow, build_state(body), thread_id)
+
+
+async def arun_document(workflow, body):
+    """Async variant of `run_document`."""
+    thread_id = body.get("document_id")
+    with log_context(document_id=thread_id):
+        if getattr(workflow, "checkpointer", None) is None or not thread_id:
+            if "corrections" in body:
+                raise ValueError("'corrections' require checkpointing and a document_id")
+            return await workflow.ainvoke(build_state(body))
+
+        from src.services.langgraph.multi_agent_doc_processing.utils.checkpoint import (
+            ainvoke_checkpointed, aresume_with_corrections,
+        )
+        if "corrections" in body:
+            return await aresume_with_corrections(workflow, thread_id, body["corrections"])
+        return await ainvoke_checkpointed(workflow, build_state(body), thread_id)
+
+
+def batch_entry(document):
+    """One batch entry as a document payload: a plain string is the document content."""
+    if isinstance(document, str):
+        return {"document_content": document}
+    if not isinstance(document, Mapping):
+        raise ValueError(f"Batch entries must be objects or strings, not {type(document).__name__}")
+    return document
+
+
+def batch_concurrency(max_concurrency, count):
+    """A requested concurrency clamped to 1..BATCH_MAX_CONCURRENCY (and the batch size)."""
+    try:
+        requested = int(max_concurrency)
+    except (TypeError, ValueError):
+        requested = BATCH_MAX_CONCURRENCY
+    return max(1, min(requested, BATCH_MAX_CONCURRENCY, count))
+
+
+def process_batch(workflow, documents, max_concurrency=BATCH_MAX_CONCURRENCY, fields=None):
+    """
+    Run several documents through the workflow concurrently.
+
+    At most `max_concurrency` documents (never more than BATCH_MAX_CONCURRENCY)
+    are in flight at once. A failing or malformed document is reported in its own
+    result entry and never fails the rest of the batch. Results are returned in
+    the same order as `documents`, projected to `fields`.
+    """
+    def run_one(index, document):
+        entry = {"index": index, "document_id": None}
+        try:
+            document = batch_entry(document)
+            entry["document_id"] = document.get("document_id")
+            entry["status"] = "success"
+            entry["result"] = serialize(project(run_document(workflow, document), fields))
+        except Exception as e:
+            entry["status"] = "error"
+            entry["error"] = str(e)
+        return entry
+
+    if not documents:
+        return []
+
+    workers = batch_concurrency(max_concurrency, len(documents))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run_one, range(len(documents)), documents))
+
+
+async def aprocess_batch(workflow, documents, max_concurrency=BATCH_MAX_CONCURRENCY, fields=None):
+    """
+    Async variant of `process_batch` built on `workflow.ainvoke`.
+    All documents share one event loop; a semaphore caps how many are in flight.
+    """
+    semaphore = asyncio.Semaphore(batch_concurrency(max_concurrency, len(documents)))
+
+    async def run_one(index, document):
+        entry = {"index": index, "document_id": None}
+        async with semaphore:
+            try:
+                document = batch_entry(document)
+                entry["document_id"] = document.get("document_id")
+                entry["status"] = "success"
+                entry["result"] = serialize(project(await arun_document(workflow, document), fields))
+            except Exception as e:
+                entry["status"] = "error"
+                entry["error"] = str(e)
+        return entry
+
+    return list(await asyncio.gather(*(run_one(i, d) for i, d in enumerate(documents))))
+
+
+def parse_body(event):
+    """Handle API Gateway payloads (body may be str) and direct invocations."""
+    return json.loads(event["body"]) if "body" in event and isinstance(event["body"], str) else event
+
+
+def json_response(status_code, payload):
+    return {
+        "statusCode": status_code,
+        "headers": {"Content-Type": "application/json"},
+        "body": json.dumps(payload, separators=(",", ":")),
+    }
+
+
+def accepts_gzip(event):
+    headers = {str(k).lower(): v for k, v in (event.get("headers") or {}).items()}
+    return "gzip" in str(headers.get("accept-encoding", "")).lower()
+
+
+def compress_response(response, event):
+    """Gzip bodies of at least GZIP_MIN_BYTES when the client sent Accept-Encoding: gzip."""
+    body = response.get("body")
+    if not isinstance(body, str) or len(body) < GZIP_MIN_BYTES or not accepts_gzip(event):
+        return response
+    compressed = gzip.compress(body.encode("utf-8"), compresslevel=5)
+    return {
+        **response,
+        "headers": {**response.get("headers", {}), "Content-Encoding": "gzip"},
+        "body": base64.b64encode(compressed).decode("ascii"),
+        "isBase64Encoded": True,
+    }
+
+
+def request_body(event):
+    """The parsed payload, with a `fields` query-string parameter folded in."""
+    body = parse_body(event)
+    query_fields = (event.get("queryStringParameters") or {}).get("fields")
+    if query_fields and "fields" not in body:
+        body = {**body, "fields": query_fields}
+    return body
+
+
+def batch_documents(body):
+    """Return the batch's document list, or None for a single-document payload."""
+    if "documents" not in body:
+        return None
+    documents = body["documents"]
+    if not isinstance(documents, list):
+        raise ValueError("'documents' must be a list")
+    return documents
+
+
+def batch_payload(results):
+    failed = sum(1 for r in results if r["status"] == "error")
+    return {"results": results, "succeeded": len(results) - failed, "failed": failed}
+
+
+def get_idempotency():
+    """
+    Idempotency guard on the DynamoDB table named by IDEMPOTENCY_TABLE, else on
+    the SQLite file at IDEMPOTENCY_PATH; None (every request runs) if neither is set.
+    """
+    global _idempotency
+    table_name, path = os.getenv("IDEMPOTENCY_TABLE"), os.getenv("IDEMPOTENCY_PATH")
+    if not table_name and not path:
+        return None
+
+    with _idempotency_lock:
+        if _idempotency is None:
+            from src.services.langgraph.multi_agent_doc_processing.utils.idempotency import (
+                Idempotency, SQLiteIdempotencyStore, DynamoDBIdempotencyStore,
+            )
+            if table_name:
+                store = DynamoDBIdempotencyStore(boto3.resource("dynamodb").Table(table_name))
+            else:
+                store = SQLiteIdempotencyStore(path)
+            _idempotency = Idempotency(store, wait_timeout=float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "30")))
+    return _idempotency
+
+
+def idempotency_error_response(error):
+    """409 while a duplicate is still running, 422 for a reused key, None for other errors."""
+    from src.services.langgraph.multi_agent_doc_processing.utils.idempotency import (
+        RequestInProgress, KeyReuseError,
+    )
+    if isinstance(error, RequestInProgress):
+        return json_response(409, {"error": str(error)})
+    if isinstance(error, KeyReuseError):
+        return json_response(422, {"error": str(error)})
+    return None
+
+
+def handle_body(body):
+    """Process a parsed single-document or batch payload into an HTTP response."""
     try:
         workflow = get_app()
 
-        # Handle API Gateway payloads (body may be str)
-        body = json.loads(event["body"]) if "body" in event and isinstance(event["body"], str) else event
-
-        # Build state object for workflow
-        state = DocumentState(
-            document_content=body.get("document_content", ""),
-            document_type=body.get("document_type", "generic"), 
-            human_review_required=body.get("human_review_required", False),
-            error_count=body.get("error_count", 0),
-            processing_stage="initial",
-            messages=[],
-        )
+        # Batch mode: {"documents": [...], "max_concurrency": n}
+        documents = batch_documents(body)
+        if documents is not None:
+            results = process_batch(
+                workflow,
+                documents,
+                max_concurrency=body.get("max_concurrency", BATCH_MAX_CONCURRENCY),
+                fields=requested_fields(body),
+            )
+            return json_response(200, batch_payload(results))
+
+        # Run workflow (resuming the document's checkpoint when there is one)
+        result = run_document(workflow, body)
+
+        # Serialize the requested part of the workflow output into a JSON-safe dict
+        return json_response(200, serialize(project(result, requested_fields(body))))
+
+    except Exception as e:
+        return json_response(500, {"error": str(e)})
+
+
+async def ahandle_body(body):
+    """Async variant of `handle_body`."""
+    try:
+        workflow = get_app()
+
+        documents = batch_documents(body)
+        if documents is not None:
+            results = await aprocess_batch(
+                workflow,
+                documents,
+                max_concurrency=body.get("max_concurrency", BATCH_MAX_CONCURRENCY),
+                fields=requested_fields(body),
+            )
+            return json_response(200, batch_payload(results))
+
+        result = await arun_document(workflow, body)
+        return json_response(200, serialize(project(result, requested_fields(body))))
+
+    except Exception as e:
+        return json_response(500, {"error": str(e)})
+
 
+def succeeded(body, response):
+    """Whether a response may be replayed: a 200 and, for a batch, no failed documents (a retry re-runs those)."""
+    if response["statusCode"] != 200:
+        return False
+    return "documents" not in body or json.loads(response["body"]).get("failed", 0) == 0
 
-        # Run workflow
-        result = workflow.invoke(state)
 
-        # Serialize workflow output into JSON-safe dict
-        safe_result = serialize(result)
+def handler(event, context):
+    """
+    Lambda entry point. With an idempotency store configured, a repeated request
+    (same client idempotency key, or same body) gets the first execution's
+    response, and concurrent duplicates wait for it instead of running again.
+    """
+    try:
+        body = request_body(event)
+        idempotency = get_idempotency()
+        if idempotency is None:
+            return compress_response(handle_body(body), event)
+
+        from src.services.langgraph.multi_agent_doc_processing.utils.idempotency import request_key, body_hash
+        response = idempotency.run(request_key(event, body), body_hash(body), lambda: handle_body(body),
+                                   functools.partial(succeeded, body))
+        return compress_response(response, event)
+
+    except Exception as e:
+        return idempotency_error_response(e) or json_response(500, {"error": str(e)})
+    finally:
+        # Don't let the container freeze with metrics or log lines still buffered
+        flush_metrics()
+        flush_logs(LOG_FLUSH_TIMEOUT)
+
+
+async def ahandler(event, context):
+    """
+    Async handler: same payloads and responses as `handler`, but the workflow
+    runs through `ainvoke` so LLM calls of many documents overlap on one event loop.
+    """
+    try:
+        body = request_body(event)
+        idempotency = get_idempotency()
+        if idempotency is None:
+            return compress_response(await ahandle_body(body), event)
 
-        return {
-            "statusCode": 200,
-            "headers": {"Content-Type": "application/json"},
-            "body": json.dumps(safe_result),
-        }
+        from src.services.langgraph.multi_agent_doc_processing.utils.idempotency import request_key, body_hash
+        response = await idempotency.arun(request_key(event, body), body_hash(body), lambda: ahandle_body(body),
+                                          functools.partial(succeeded, body))
+        return compress_response(response, event)
+
+    except Exception as e:
+        return idempotency_error_response(e) or json_response(500, {"error": str(e)})
+    finally:
+        # Don't let the container freeze with metrics or log lines still buffered
+        flush_metrics()
+        flush_logs(LOG_FLUSH_TIMEOUT)
 
+
+def async_handler(event, context):
+    """Lambda entry point (`app.async_handler`) that drives `ahandler` on a fresh event loop."""
+    return asyncio.run(ahandler(event, context))
+
+
+# Lambda init phase: fetch the secret and compile the graph before the first request
+if eager_init_enabled():
+    try:
+        get_app()
     except Exception as e:
-        return {
-            "statusCode": 500,
-            "headers": {"Content-Type": "application/json"},
-            "body": json.dumps({"error": str(e)}),
-        }
+        # Not fatal: the first request retries the initialization and reports its error
+        log.warning("Eager initialization failed: %s", e)
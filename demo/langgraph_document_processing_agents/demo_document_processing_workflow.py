@@ -5,8 +5,11 @@
 import requests, sys
 from src.services.langgraph.multi_agent_doc_processing.workflow import create_document_workflow
 from src.services.langgraph.multi_agent_doc_processing.state import DocumentState
+from src.services.langgraph.multi_agent_doc_processing.logging.structured import configure_logging
 from langchain_ollama import OllamaLLM
 
+configure_logging()
+
 print("🧪 END-TO-END WORKFLOW DEMO (using Ollama)")
 print("=" * 55)
 
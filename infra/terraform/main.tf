@@ -55,6 +55,9 @@ module "lambda" {
     OPENAI_SECRET_ARN    = module.iam.openai_secret_arn
     ANTHROPIC_SECRET_ARN = module.iam.anthropic_secret_arn
     DYNAMODB_TABLE       = module.dynamodb.table_name
+    # Per-node EMF metrics are extracted from the function's log group (module.cloudwatch)
+    METRICS_ENABLED      = "true"
+    METRICS_NAMESPACE    = "DocumentProcessing"
   }
   depends_on = [module.ecr]
 }
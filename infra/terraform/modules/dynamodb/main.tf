@@ -14,6 +14,11 @@ resource "aws_dynamodb_table" "this" {
     name = "timestamp"
     type = "N"
   }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
 }
 
 output "table_name" {
@@ -0,0 +1,199 @@
+# =============================================================================
+"""
+llm_health.py
+Background health probing for LLM providers, with a circuit breaker per provider.
+
+Probes run concurrently on a small thread pool and their results are cached for
+`ttl` seconds. Reads never wait on a probe: a stale result is served while a
+fresh probe runs in the background, and a provider that has never been probed
+counts as available until a probe says otherwise. Probe failures (and failures
+reported by callers) feed the provider's circuit breaker; an open breaker
+suppresses probes until `reset_timeout` has passed, then allows a single
+half-open probe to decide whether to close again.
+"""
+# =============================================================================
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+import requests
+
+PROBE_TIMEOUT = float(os.getenv("LLM_PROBE_TIMEOUT", "2"))
+
+# provider -> (API key env var, models endpoint, auth header builder)
+_HOSTED_PROVIDERS = {
+    "openai": ("OPENAI_API_KEY", "https://api.openai.com/v1/models",
+               lambda key: {"Authorization": f"Bearer {key}"}),
+    "anthropic": ("ANTHROPIC_API_KEY", "https://api.anthropic.com/v1/models",
+                  lambda key: {"x-api-key": key, "anthropic-version": "2023-06-01"}),
+    "google": ("GOOGLE_API_KEY", "https://generativelanguage.googleapis.com/v1beta/models",
+               lambda key: {"x-goog-api-key": key}),
+    "groq": ("GROQ_API_KEY", "https://api.groq.com/openai/v1/models",
+             lambda key: {"Authorization": f"Bearer {key}"}),
+    "mistral": ("MISTRAL_API_KEY", "https://api.mistral.ai/v1/models",
+                lambda key: {"Authorization": f"Bearer {key}"}),
+    "deepseek": ("DEEPSEEK_API_KEY", "https://api.deepseek.com/models",
+                 lambda key: {"Authorization": f"Bearer {key}"}),
+}
+
+
+def http_probe(url: str, headers: Optional[dict] = None, timeout: float = PROBE_TIMEOUT) -> Callable[[], bool]:
+    """Probe that succeeds when GET `url` answers 200."""
+    def probe() -> bool:
+        return requests.get(url, headers=headers or {}, timeout=timeout).status_code == 200
+    return probe
+
+
+def configured_probes() -> Dict[str, Callable[[], bool]]:
+    """Probes for Ollama plus every hosted provider whose API key is set."""
+    base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434").rstrip("/")
+    probes = {"ollama": http_probe(f"{base_url}/api/tags")}
+    for provider, (key_var, url, auth) in _HOSTED_PROVIDERS.items():
+        api_key = os.getenv(key_var)
+        if api_key:
+            probes[provider] = http_probe(url, auth(api_key))
+    return probes
+
+
+# =============================================================================
+
+class CircuitBreaker:
+    """
+    Closed -> open after `failure_threshold` consecutive failures.
+    Open -> half-open once `reset_timeout` seconds have passed; the next
+    success closes the breaker and the next failure opens it again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+            return self._state
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+
+class ProviderHealth:
+    """
+    Cached, non-blocking availability of LLM providers.
+
+    Args:
+        probes: provider -> callable returning True when the provider is healthy
+            (raising counts as unhealthy).
+        ttl: Seconds a probe result is served before a background re-probe.
+        failure_threshold: Consecutive failures that open a provider's breaker.
+        reset_timeout: Seconds an open breaker waits before a half-open probe.
+    """
+
+    def __init__(self, probes: Dict[str, Callable[[], bool]], ttl: float = 30.0,
+                 failure_threshold: int = 3, reset_timeout: float = 30.0, clock=time.monotonic):
+        self.probes = dict(probes)
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._breakers = {
+            provider: CircuitBreaker(failure_threshold, reset_timeout, clock) for provider in self.probes
+        }
+        self._healthy: Dict[str, Optional[bool]] = {provider: None for provider in self.probes}
+        self._checked_at: Dict[str, float] = {}
+        self._in_flight = set()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, len(self.probes)), thread_name_prefix="llm-probe")
+
+    # ------------------------------------------------------------------ probing
+
+    def refresh(self, providers=None):
+        """Start background probes for the given (default: all) providers that are due one."""
+        futures = []
+        now = self._clock()
+        with self._lock:
+            for provider in providers or self.probes:
+                if provider not in self.probes or provider in self._in_flight:
+                    continue
+                state = self._breakers[provider].state
+                if state == CircuitBreaker.OPEN:
+                    continue
+                checked_at = self._checked_at.get(provider)
+                if state == CircuitBreaker.CLOSED and checked_at is not None and now - checked_at < self.ttl:
+                    continue
+                self._in_flight.add(provider)
+                futures.append(self._pool.submit(self._probe, provider))
+        return futures
+
+    def _probe(self, provider: str):
+        try:
+            healthy = bool(self.probes[provider]())
+        except Exception:
+            healthy = False
+        if healthy:
+            self.record_success(provider)
+        else:
+            self.record_failure(provider)
+        with self._lock:
+            self._checked_at[provider] = self._clock()
+            self._in_flight.discard(provider)
+        return healthy
+
+    # ------------------------------------------------------------------ outcomes
+
+    def record_success(self, provider: str):
+        if provider in self._breakers:
+            self._breakers[provider].record_success()
+            self._healthy[provider] = True
+
+    def record_failure(self, provider: str):
+        if provider in self._breakers:
+            self._breakers[provider].record_failure()
+            self._healthy[provider] = False
+
+    # ------------------------------------------------------------------ reads
+
+    def is_available(self, provider: str) -> bool:
+        """False for unconfigured providers, open breakers and failed probes; never blocks."""
+        if provider not in self.probes:
+            return False
+        self.refresh([provider])
+        if self._breakers[provider].state != CircuitBreaker.CLOSED:
+            return False
+        return self._healthy[provider] is not False
+
+    def available(self) -> Dict[str, bool]:
+        return {provider: self.is_available(provider) for provider in self.probes}
+
+    def snapshot(self) -> Dict[str, dict]:
+        now = self._clock()
+        return {
+            provider: {
+                "healthy": self._healthy[provider],
+                "breaker": self._breakers[provider].state,
+                "age": now - self._checked_at[provider] if provider in self._checked_at else None,
+            }
+            for provider in self.probes
+        }
+
+    def close(self):
+        self._pool.shutdown(wait=False)
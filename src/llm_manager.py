@@ -1,8 +1,13 @@
+import hashlib
 import os
-import requests
+import threading
 from pathlib import Path
 from dotenv import load_dotenv
 from typing import Optional
+
+from src.llm_health import ProviderHealth, configured_probes
+from src.llm_pool import ClientRegistry
+from src.llm_router import RoutingLLM
 # =============================================================================
 
 # Smart environment loading
@@ -33,6 +38,55 @@ load_environment()
 
 # =============================================================================
 
+# Fallback order when the configured provider is unavailable
+PROVIDER_PREFERENCE = ["ollama", "openai", "anthropic", "google", "groq", "mistral", "deepseek"]
+
+# Env vars whose values change the client a provider factory builds
+PROVIDER_SETTINGS_ENV = {
+    "ollama": ("OLLAMA_BASE_URL", "OLLAMA_DEFAULT_MODEL"),
+    "google": ("GOOGLE_API_KEY", "GOOGLE_DEFAULT_MODEL"),
+    "deepseek": ("DEEPSEEK_API_KEY", "DEEPSEEK_DEFAULT_MODEL"),
+    "groq": ("GROQ_API_KEY", "GROQ_DEFAULT_MODEL"),
+    "mistral": ("MISTRAL_API_KEY", "MISTRAL_DEFAULT_MODEL"),
+    "anthropic": ("ANTHROPIC_API_KEY", "ANTHROPIC_DEFAULT_MODEL"),
+    "openai": ("OPENAI_API_KEY", "OPENAI_DEFAULT_MODEL"),
+}
+
+# Health monitor and client registry shared by every manager in the process
+_shared_health: Optional[ProviderHealth] = None
+_shared_health_lock = threading.Lock()
+_shared_registry: Optional[ClientRegistry] = None
+
+
+def shared_health() -> ProviderHealth:
+    """Process-wide provider health monitor, probing every configured provider."""
+    global _shared_health
+    with _shared_health_lock:
+        if _shared_health is None:
+            _shared_health = ProviderHealth(
+                configured_probes(),
+                ttl=float(os.getenv("LLM_HEALTH_TTL", "30")),
+                failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "3")),
+                reset_timeout=float(os.getenv("LLM_BREAKER_RESET", "30")),
+            )
+        return _shared_health
+
+
+def shared_registry() -> ClientRegistry:
+    """Process-wide LLM client registry (pool sizes from LLM_POOL_* env vars)."""
+    global _shared_registry
+    with _shared_health_lock:
+        if _shared_registry is None:
+            _shared_registry = ClientRegistry()
+        return _shared_registry
+
+
+def settings_fingerprint(provider: str) -> str:
+    """Digest of the provider's settings env vars, so rotated keys or endpoints get a new client."""
+    values = "\0".join(os.getenv(name, "") for name in PROVIDER_SETTINGS_ENV.get(provider, ()))
+    return hashlib.sha256(values.encode()).hexdigest()[:16]
+
+
 class LLMManager:
     """
     Minimal provider-agnostic LLM manager.
@@ -43,35 +97,70 @@ class LLMManager:
       - OLLAMA_DEFAULT_MODEL (default: llama3.2)
       - OPENAI_API_KEY
       - OPENAI_DEFAULT_MODEL (default: gpt-4o-mini)
+
+    Provider health comes from a `ProviderHealth` monitor (shared per process by
+    default) that probes in the background, so creating a manager and calling
+    `get_llm` never wait on the network. Clients come from a `ClientRegistry`
+    and are reused, with their connection pools, across calls and threads.
     """
 
-    def __init__(self, provider: Optional[str] = None):
+    def __init__(self, provider: Optional[str] = None, health: Optional[ProviderHealth] = None,
+                 registry: Optional[ClientRegistry] = None):
         self.provider = (provider or os.getenv("LLM_PROVIDER", "ollama")).lower()
-        self.available_providers = self._check_availability()  # <--- add this line
-
-    def _check_availability(self) -> dict:
-        available = {}
-        # Check Ollama
-        try:
-            response = requests.get("http://localhost:11434/api/tags", timeout=2)
-            print(f"Ollama check: status_code={response.status_code}")  # Debugging line
-            available['ollama'] = response.status_code == 200
-        except Exception as e:
-            print(f"Ollama check failed: {e}")  # Debugging line
-            available['ollama'] = False
-        # Add other providers as needed...
-        print(f"Available providers: {available}") # Debugging line
-        return available
+        self.health = health or shared_health()
+        self.registry = registry or shared_registry()
+        self.health.refresh()
+
+    @property
+    def available_providers(self) -> dict:
+        """Current availability of each configured provider (cached, non-blocking)."""
+        return self.health.available()
+
+    def _get_preferred_provider(self) -> str:
+        """The configured provider if it is available, else the first available fallback."""
+        for candidate in [self.provider] + PROVIDER_PREFERENCE:
+            if self.health.is_available(candidate):
+                return candidate
+        raise RuntimeError("No LLM provider available")
+
+    def report_failure(self, provider: str):
+        """Record a failed call so repeated failures open the provider's circuit breaker."""
+        self.health.record_failure(provider)
+
+    def report_success(self, provider: str):
+        self.health.record_success(provider)
     
     def get_llm(self, provider: Optional[str] = None, model: Optional[str] = None):
-        """Return an LLM client with provider-aware selection."""
+        """Return an LLM client with provider-aware selection, reusing a cached client when possible."""
         # Resolve provider
         if provider is None:
             provider = self._get_preferred_provider()
-        elif provider not in self.available_providers or not self.available_providers[provider]:
+        elif not self.health.is_available(provider):
             raise ValueError(f"Provider '{provider}' not available or not configured")
 
-        # Dispatch to provider-specific factory
+        return self.registry.get(
+            provider, model,
+            lambda: self._build_llm(provider, model),
+            settings=settings_fingerprint(provider),
+        )
+
+    def get_routing_llm(self, providers: Optional[list] = None, **router_kwargs) -> RoutingLLM:
+        """
+        Return a `RoutingLLM` over the default models of `providers` (default: every
+        available provider), sharing this manager's health monitor.
+        """
+        targets = []
+        for provider in providers or [p for p, ok in self.available_providers.items() if ok]:
+            try:
+                llm = self.get_llm(provider=provider)
+            except ValueError:
+                continue
+            model = getattr(llm, "model", None) or getattr(llm, "model_name", None) or "default"
+            targets.append((f"{provider}:{model}", llm))
+        return RoutingLLM(targets, health=self.health, **router_kwargs)
+
+    def _build_llm(self, provider: str, model: Optional[str] = None):
+        """Dispatch to the provider-specific factory."""
         if provider == "ollama":
             return self._get_ollama(model)
         elif provider == "google":
@@ -99,6 +188,7 @@ class LLMManager:
             model=model or default_model,
             base_url=base_url,
             temperature=0.1,
+            client_kwargs={"limits": self.registry.settings.limits},
         )
 
 
@@ -123,11 +213,14 @@ class LLMManager:
         api_key = os.getenv("DEEPSEEK_API_KEY")
         if not api_key:
             raise ValueError("DEEPSEEK_API_KEY is not set")
+        http_client, http_async_client = self.registry.http_clients("deepseek")
         return ChatOpenAI(
             model=model or default_model,
             api_key=api_key,
             base_url="https://api.deepseek.com",
             temperature=0.1,
+            http_client=http_client,
+            http_async_client=http_async_client,
         )
 
 
@@ -138,10 +231,13 @@ class LLMManager:
         api_key = os.getenv("GROQ_API_KEY")
         if not api_key:
             raise ValueError("GROQ_API_KEY is not set")
+        http_client, http_async_client = self.registry.http_clients("groq")
         return ChatGroq(
             model=model or default_model,
             groq_api_key=api_key,
             temperature=0.1,
+            http_client=http_client,
+            http_async_client=http_async_client,
         )
 
 
@@ -180,10 +276,13 @@ class LLMManager:
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise ValueError("OPENAI_API_KEY is not set")
+        http_client, http_async_client = self.registry.http_clients("openai")
         return ChatOpenAI(
             model=model or default_model,
             api_key=api_key,
             temperature=0.1,
+            http_client=http_client,
+            http_async_client=http_async_client,
         )
 
     
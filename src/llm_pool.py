@@ -0,0 +1,258 @@
+# =============================================================================
+"""
+llm_pool.py
+Registry of reusable LLM clients and the HTTP connection pools behind them.
+
+Clients are keyed by (provider, model, settings) and built once per process, so
+repeated `get_llm` calls return the same instance and its open connections.
+Providers whose LangChain integration accepts httpx clients (OpenAI-compatible
+APIs and Groq) additionally share one sync and one async pool per provider,
+sized by `PoolSettings`; for the rest the reused instance keeps its own pool.
+
+The sync pool is an ordinary `httpx.HTTPTransport`. Async connections belong
+to an event loop, so the async transport keeps one pool per running loop, which
+lets the Lambda `async_handler` (a fresh loop per invocation) share a client
+safely; a loop's pool is closed when `asyncio.run` shuts that loop down. Both
+transports count requests, new and reused connections and
+in-flight requests for `ClientRegistry.stats()`.
+"""
+# =============================================================================
+
+import asyncio
+import os
+import threading
+import weakref
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import httpx
+
+
+class PoolSettings:
+    """
+    Connection pool sizing shared by every pooled provider.
+
+    Args:
+        max_connections: Maximum open connections per provider pool.
+        max_keepalive_connections: Idle connections kept open for reuse.
+        keepalive_expiry: Seconds an idle connection is kept before closing.
+        timeout: Request timeout in seconds.
+    """
+
+    def __init__(self, max_connections: int = 100, max_keepalive_connections: int = 20,
+                 keepalive_expiry: float = 30.0, timeout: float = 60.0):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout = timeout
+
+    @classmethod
+    def from_env(cls) -> "PoolSettings":
+        return cls(
+            max_connections=int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=float(os.getenv("LLM_POOL_KEEPALIVE_EXPIRY", "30")),
+            timeout=float(os.getenv("LLM_POOL_TIMEOUT", "60")),
+        )
+
+    @property
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+
+class PoolMetrics:
+    """Request and connection counters for one provider's pools (sync and async)."""
+
+    def __init__(self, max_connections: int):
+        self.max_connections = max_connections
+        self._lock = threading.Lock()
+        self._connections = weakref.WeakSet()
+        self.requests = 0
+        self.connections_opened = 0
+        self.connections_reused = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def started(self):
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def finished(self, response: Optional[httpx.Response]):
+        with self._lock:
+            self.in_flight -= 1
+            if response is None:
+                return
+            self.requests += 1
+            stream = response.extensions.get("network_stream")
+            if stream is None:
+                return
+            if stream in self._connections:
+                self.connections_reused += 1
+            else:
+                self._connections.add(stream)
+                self.connections_opened += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "connections_opened": self.connections_opened,
+                "connections_reused": self.connections_reused,
+                "reuse_ratio": self.connections_reused / self.requests if self.requests else 0.0,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "utilisation": self.in_flight / self.max_connections,
+                "peak_utilisation": self.peak_in_flight / self.max_connections,
+            }
+
+
+class MeteredTransport(httpx.HTTPTransport):
+    """Sync pooled transport that reports to a `PoolMetrics`."""
+
+    def __init__(self, metrics: PoolMetrics, **kwargs):
+        super().__init__(**kwargs)
+        self.metrics = metrics
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self.metrics.started()
+        response = None
+        try:
+            response = super().handle_request(request)
+            return response
+        finally:
+            self.metrics.finished(response)
+
+
+class LoopLocalAsyncTransport(httpx.AsyncBaseTransport):
+    """
+    Async transport with one connection pool per running event loop.
+
+    Each pool is closed when its loop cancels leftover tasks on shutdown, as
+    `asyncio.run` does; loops closed another way should `aclose()` first.
+    """
+
+    def __init__(self, metrics: PoolMetrics, **kwargs):
+        self.metrics = metrics
+        self._kwargs = kwargs
+        self._lock = threading.Lock()
+        self._transports: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[httpx.AsyncHTTPTransport, asyncio.Task]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _transport(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._transports.get(loop)
+            if entry is None:
+                transport = httpx.AsyncHTTPTransport(**self._kwargs)
+                entry = self._transports[loop] = (transport, loop.create_task(self._close_on_shutdown(loop)))
+            return entry[0]
+
+    async def _close_on_shutdown(self, loop: asyncio.AbstractEventLoop):
+        # Waits until the loop cancels it at shutdown, then closes that loop's pool
+        try:
+            await loop.create_future()
+        finally:
+            await self._close(loop)
+
+    async def _close(self, loop: asyncio.AbstractEventLoop):
+        with self._lock:
+            entry = self._transports.pop(loop, None)
+        if entry is not None:
+            transport, watcher = entry
+            if watcher is not asyncio.current_task():
+                watcher.cancel()
+            await transport.aclose()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        transport = self._transport()
+        self.metrics.started()
+        response = None
+        try:
+            response = await transport.handle_async_request(request)
+            return response
+        finally:
+            self.metrics.finished(response)
+
+    async def aclose(self):
+        await self._close(asyncio.get_running_loop())
+
+
+# =============================================================================
+
+class ClientRegistry:
+    """
+    Thread-safe cache of LLM clients keyed by (provider, model, settings).
+
+    Args:
+        settings: Pool sizing for the shared httpx pools (default: from env).
+    """
+
+    def __init__(self, settings: Optional[PoolSettings] = None):
+        self.settings = settings or PoolSettings.from_env()
+        self._lock = threading.Lock()
+        self._clients: Dict[Hashable, Any] = {}
+        self._building: Dict[Hashable, threading.Lock] = {}
+        self._http: Dict[str, Tuple[httpx.Client, httpx.AsyncClient]] = {}
+        self._metrics: Dict[str, PoolMetrics] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, provider: str, model: Optional[str], factory: Callable[[], Any], **settings) -> Any:
+        """Return the cached client for this key, building it with `factory()` on first use."""
+        key = (provider, model, tuple(sorted(settings.items())))
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self.hits += 1
+                return client
+            build_lock = self._building.setdefault(key, threading.Lock())
+
+        # Build outside the registry lock so slow constructors do not serialise other keys
+        with build_lock:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is not None:
+                    self.hits += 1
+                    return client
+            client = factory()
+            with self._lock:
+                self._clients[key] = client
+                self._building.pop(key, None)
+                self.misses += 1
+            return client
+
+    def http_clients(self, provider: str) -> Tuple[httpx.Client, httpx.AsyncClient]:
+        """Shared (sync, async) httpx clients for `provider`, created on first use."""
+        with self._lock:
+            if provider not in self._http:
+                metrics = PoolMetrics(self.settings.max_connections)
+                limits = self.settings.limits
+                timeout = httpx.Timeout(self.settings.timeout)
+                self._metrics[provider] = metrics
+                self._http[provider] = (
+                    httpx.Client(transport=MeteredTransport(metrics, limits=limits), timeout=timeout),
+                    httpx.AsyncClient(transport=LoopLocalAsyncTransport(metrics, limits=limits), timeout=timeout),
+                )
+            return self._http[provider]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "clients": len(self._clients),
+                "hits": self.hits,
+                "misses": self.misses,
+                "pools": {provider: metrics.snapshot() for provider, metrics in self._metrics.items()},
+            }
+
+    def close(self):
+        """Close the shared sync pools and forget every client."""
+        with self._lock:
+            for sync_client, _ in self._http.values():
+                sync_client.close()
+            self._http.clear()
+            self._clients.clear()
@@ -0,0 +1,249 @@
+# =============================================================================
+"""
+llm_router.py
+Latency-aware routing across several LLM clients, with hedged requests.
+
+Every completed call records its latency in a rolling window per target
+(provider/model). Each call goes to the healthy target with the lowest p50;
+targets with too few samples are tried first so that every target gets
+measured. If the chosen target has not answered by its own p95, a duplicate
+(hedged) request goes to the next-fastest target and whichever answers first
+is returned. A target that fails is reported to the health monitor and the
+call fails over to the next target.
+
+In the async path the losing request is cancelled. Blocking `invoke` calls
+cannot be interrupted, so the loser finishes on its worker thread and its
+answer is discarded (its latency is still recorded).
+"""
+# =============================================================================
+
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from src.services.langgraph.multi_agent_doc_processing.utils.llm import ainvoke_llm
+
+
+class LatencyWindow:
+    """Rolling window of the most recent latencies (seconds) for one target."""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._samples)
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, int(round(p * (len(ordered) - 1)))))
+        return ordered[index]
+
+
+class RoutingLLM:
+    """
+    Drop-in `llm` for `create_document_workflow` that routes across several clients.
+
+    Args:
+        targets: Sequence of (name, llm) pairs, e.g. [("openai:gpt-4o-mini", llm), ...].
+            A name's prefix before ":" is the provider reported to `health`.
+        health: Optional `ProviderHealth`; unavailable providers are skipped and
+            failed calls are recorded against them.
+        window: Latencies kept per target.
+        min_samples: Samples needed before a target's percentiles are trusted.
+        hedge_percentile: Percentile of the primary's latency after which a hedge is sent.
+        default_hedge_delay: Hedge delay (seconds) while the primary has too few samples.
+        max_workers: Threads for blocking `invoke` calls (primary plus hedge).
+    """
+
+    def __init__(self, targets: Sequence[Tuple[str, Any]], health=None, window: int = 200,
+                 min_samples: int = 10, hedge_percentile: float = 0.95,
+                 default_hedge_delay: float = 2.0, max_workers: int = 16):
+        if not targets:
+            raise ValueError("RoutingLLM needs at least one target")
+        self.targets: Dict[str, Any] = dict(targets)
+        self.health = health
+        self.min_samples = min_samples
+        self.hedge_percentile = hedge_percentile
+        self.default_hedge_delay = default_hedge_delay
+        self.latency = {name: LatencyWindow(window) for name in self.targets}
+        self.model = "+".join(self.targets)
+
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-route")
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    # ------------------------------------------------------------------ routing
+
+    @staticmethod
+    def provider_of(name: str) -> str:
+        return name.split(":", 1)[0]
+
+    def ranked(self) -> List[str]:
+        """Healthy targets, fastest first; under-sampled targets lead so they get measured."""
+        names = [
+            name for name in self.targets
+            if self.health is None or self.health.is_available(self.provider_of(name))
+        ]
+
+        def score(name):
+            window = self.latency[name]
+            if len(window) < self.min_samples:
+                return (0, len(window))
+            return (1, window.percentile(0.5))
+
+        return sorted(names, key=score)
+
+    def hedge_delay(self, name: str) -> float:
+        window = self.latency[name]
+        if len(window) < self.min_samples:
+            return self.default_hedge_delay
+        return window.percentile(self.hedge_percentile)
+
+    def _succeeded(self, name: str, started: float):
+        self.latency[name].record(time.perf_counter() - started)
+        if self.health is not None:
+            self.health.record_success(self.provider_of(name))
+
+    def _failed(self, name: str):
+        if self.health is not None:
+            self.health.record_failure(self.provider_of(name))
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    # ------------------------------------------------------------------ sync
+
+    def _call(self, name: str, prompt, args, kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.targets[name].invoke(prompt, *args, **kwargs)
+        except Exception:
+            self._failed(name)
+            raise
+        self._succeeded(name, started)
+        return response
+
+    def invoke(self, prompt, *args, **kwargs):
+        self._count("calls")
+        queue = self.ranked()
+        if not queue:
+            raise RuntimeError("No healthy LLM target available")
+
+        last_error = None
+        while queue:
+            primary = queue.pop(0)
+            pending = {self._pool.submit(self._call, primary, prompt, args, kwargs): primary}
+            done, _ = wait(pending, timeout=self.hedge_delay(primary))
+            if not done and queue:
+                hedge = queue.pop(0)
+                self._count("hedges")
+                pending[self._pool.submit(self._call, hedge, prompt, args, kwargs)] = hedge
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = pending.pop(future)
+                    if future.exception() is None:
+                        if name != primary:
+                            self._count("hedge_wins")
+                        return future.result()
+                    last_error = future.exception()
+            self._count("failovers")
+        raise last_error
+
+    # ------------------------------------------------------------------ async
+
+    async def _acall(self, name: str, prompt, args, kwargs):
+        started = time.perf_counter()
+        try:
+            if args or kwargs:
+                response = await self.targets[name].ainvoke(prompt, *args, **kwargs)
+            else:
+                response = await ainvoke_llm(self.targets[name], prompt)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._failed(name)
+            raise
+        self._succeeded(name, started)
+        return response
+
+    async def ainvoke(self, prompt, *args, **kwargs):
+        self._count("calls")
+        queue = self.ranked()
+        if not queue:
+            raise RuntimeError("No healthy LLM target available")
+
+        last_error = None
+        while queue:
+            primary = queue.pop(0)
+            pending = {asyncio.ensure_future(self._acall(primary, prompt, args, kwargs)): primary}
+            done, _ = await asyncio.wait(pending, timeout=self.hedge_delay(primary))
+            if not done and queue:
+                hedge = queue.pop(0)
+                self._count("hedges")
+                pending[asyncio.ensure_future(self._acall(hedge, prompt, args, kwargs))] = hedge
+
+            try:
+                while pending:
+                    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        name = pending.pop(task)
+                        if task.exception() is None:
+                            if name != primary:
+                                self._count("hedge_wins")
+                            return task.result()
+                        last_error = task.exception()
+            finally:
+                for task in pending:
+                    task.cancel()
+            self._count("failovers")
+        raise last_error
+
+    # ------------------------------------------------------------------ streaming
+
+    def stream(self, prompt, *args, **kwargs):
+        """Stream from the fastest healthy target (streams are not hedged)."""
+        ranked = self.ranked()
+        if not ranked:
+            raise RuntimeError("No healthy LLM target available")
+        return self.targets[ranked[0]].stream(prompt, *args, **kwargs)
+
+    def astream(self, prompt, *args, **kwargs):
+        ranked = self.ranked()
+        if not ranked:
+            raise RuntimeError("No healthy LLM target available")
+        return self.targets[ranked[0]].astream(prompt, *args, **kwargs)
+
+    # ------------------------------------------------------------------ stats
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers,
+            "targets": {
+                name: {
+                    "samples": len(window),
+                    "p50": window.percentile(0.5),
+                    "p95": window.percentile(self.hedge_percentile),
+                }
+                for name, window in self.latency.items()
+            },
+        }
@@ -1,16 +1,114 @@
 from src.services.langgraph.multi_agent_doc_processing.state import DocumentState, DOCUMENT_TYPES
-from langchain_core.messages import AIMessage
+from src.services.langgraph.multi_agent_doc_processing.utils.llm import response_text, ainvoke_llm
+from src.services.langgraph.multi_agent_doc_processing.utils.chunking import count_tokens, leading_text
+from src.services.langgraph.multi_agent_doc_processing.utils.audit import (
+    CLASSIFICATION_ERROR,
+    CLASSIFIED,
+    CLASSIFIED_NEAR_DUPLICATE,
+    CLASSIFIED_PRE_CLASSIFIER,
+    record_event,
+)
+from src.services.langgraph.multi_agent_doc_processing.logging.structured import get_logger
 
-def classify_document(state: DocumentState, llm) -> DocumentState:
+log = get_logger(__name__, stage="classify")
+
+def classify_document(state: DocumentState, llm, pre_classifier=None, similarity_index=None,
+                      long_document=None) -> DocumentState:
     """
     Classifies the document type using an injected LLM.
+    The LLM is not called when a `NearDuplicateIndex` knows a near-duplicate of the
+    document, or when a `PreClassifier` is confident. With a `LongDocumentConfig`
+    only the leading part of the document that fits its token budget is sent.
     Returns updated state with 'document_type', 'confidence_score', etc.
     """
+    if recall_near_duplicate(state, similarity_index) or pre_classify(state, pre_classifier):
+        return state
+
+    prompt = build_classification_prompt(state.get("document_content", ""), long_document)
+
+    try:
+        response = llm.invoke(prompt)
+        apply_classification(state, response_text(response))
+    except Exception as e:
+        classification_failed(state, e)
+
+    return state
+
+
+async def aclassify_document(state: DocumentState, llm, pre_classifier=None, similarity_index=None,
+                             long_document=None) -> DocumentState:
+    """Async variant of `classify_document` using the LLM's async API."""
+    if recall_near_duplicate(state, similarity_index) or pre_classify(state, pre_classifier):
+        return state
+
+    prompt = build_classification_prompt(state.get("document_content", ""), long_document)
+
+    try:
+        response = await ainvoke_llm(llm, prompt)
+        apply_classification(state, response_text(response))
+    except Exception as e:
+        classification_failed(state, e)
+
+    return state
+
+
+def recall_near_duplicate(state: DocumentState, similarity_index) -> bool:
+    """
+    Reuse the classification of a known near-duplicate document. Returns True if it did.
+    Field values of the earlier document that also appear in this one are kept in
+    'extracted_data' as a head start for `extract_data`.
+    """
+    if similarity_index is None:
+        return False
+
     content = state.get("document_content", "")
-    detected_type = "unknown"
-    confidence = 0.0
+    match = similarity_index.lookup(content)
+    if match is None:
+        return False
+
+    confidence = min(match.similarity, match.confidence)
+    state["document_type"] = match.document_type
+    state["confidence_score"] = confidence
+    state["extracted_data"] = match.head_start(content)
+    state["processing_stage"] = "classified"
+    if confidence < 0.8:
+        state["human_review_required"] = True
+        state["next_action"] = "human_review"
+    else:
+        state["next_action"] = "extract_data"
+    record_event(state, CLASSIFIED_NEAR_DUPLICATE,
+                 lambda: f"Classified as {match.document_type} (near-duplicate, {match.similarity:.0%} similar)")
+    return True
+
+
+def pre_classify(state: DocumentState, pre_classifier) -> bool:
+    """Classify deterministically when the pre-classifier is confident. Returns True if it did."""
+    if pre_classifier is None:
+        return False
+
+    result = pre_classifier.classify(state.get("document_content", ""))
+    if result is None:
+        return False
 
-    prompt = f"""
+    detected_type, confidence = result
+    state["document_type"] = detected_type
+    state["confidence_score"] = confidence
+    state["processing_stage"] = "classified"
+    if confidence < 0.8:
+        state["human_review_required"] = True
+        state["next_action"] = "human_review"
+    else:
+        state["next_action"] = "extract_data"
+    record_event(state, CLASSIFIED_PRE_CLASSIFIER, lambda: f"Classified as {detected_type} (pre-classifier)")
+    return True
+
+
+def build_classification_prompt(content: str, long_document=None) -> str:
+    """Prompt asking the LLM for a single document type, trimmed to the token budget if one is set."""
+    if long_document is not None:
+        budget = long_document.max_prompt_tokens - count_tokens(build_classification_prompt(""))
+        content = leading_text(content, budget)
+    return f"""
 Classify this document type. Return only one of: invoice, contract, receipt, or report.
 
 Document:
@@ -18,51 +116,49 @@ Document:
 
 Type:""".strip()
 
-    try:
-        response = llm.invoke(prompt)
-        detected_type = ""
-        if hasattr(response, "content"):
-            detected_type = (response.content or "").strip().lower()
-        else:
-            detected_type = str(response).strip().lower()
 
+def keyword_classify(content: str):
+    """Fallback keyword-based classification. Returns (document_type, confidence)."""
+    content_lower = content.lower()
+    if "invoice" in content_lower or "bill" in content_lower:
+        return "invoice", 0.7
+    elif "contract" in content_lower or "agreement" in content_lower:
+        return "contract", 0.7
+    elif "receipt" in content_lower:
+        return "receipt", 0.7
+    elif "report" in content_lower:
+        return "report", 0.7
+    return "unknown", 0.3
 
-        if detected_type in DOCUMENT_TYPES:
-            confidence = 0.9
-            state["next_action"] = "extract_data"
-        else:
-            # Fallback keyword-based classification
-            content_lower = content.lower()
-            if "invoice" in content_lower or "bill" in content_lower:
-                detected_type, confidence = "invoice", 0.7
-            elif "contract" in content_lower or "agreement" in content_lower:
-                detected_type, confidence = "contract", 0.7
-            elif "receipt" in content_lower:
-                detected_type, confidence = "receipt", 0.7
-            elif "report" in content_lower:
-                detected_type, confidence = "report", 0.7
-            else:
-                detected_type, confidence = "unknown", 0.3
-
-            if confidence < 0.8:
-                state["human_review_required"] = True
-                state["next_action"] = "human_review"
-            else:
-                state["next_action"] = "extract_data"
-
-        state["document_type"] = detected_type
-        state["confidence_score"] = confidence
-        state["processing_stage"] = "classified"
-        state.setdefault("messages", []).append(
-            AIMessage(content=f"Classified as {detected_type}")
-        )
 
-    except Exception as e:
-        state["error_count"] += 1
-        state["next_action"] = "error_handling"
-        state.setdefault("messages", []).append(
-            AIMessage(content=f"Classification error: {e}")
-        )
+def apply_classification(state: DocumentState, answer: str) -> DocumentState:
+    """Record the LLM's answer on the state, falling back to keywords if it is not a known type."""
+    detected_type = answer.strip().lower()
 
+    if detected_type in DOCUMENT_TYPES:
+        confidence = 0.9
+        state["next_action"] = "extract_data"
+    else:
+        detected_type, confidence = keyword_classify(state.get("document_content", ""))
+
+        if confidence < 0.8:
+            state["human_review_required"] = True
+            state["next_action"] = "human_review"
+        else:
+            state["next_action"] = "extract_data"
+
+    state["document_type"] = detected_type
+    state["confidence_score"] = confidence
+    state["processing_stage"] = "classified"
+    log.info("Classified as %s (confidence %.2f)", detected_type, confidence)
+    record_event(state, CLASSIFIED, lambda: f"Classified as {detected_type}")
     return state
 
+
+def classification_failed(state: DocumentState, error: Exception) -> DocumentState:
+    """Mark the state as failed after an LLM or parsing error."""
+    state["error_count"] += 1
+    state["next_action"] = "error_handling"
+    log.error("Classification error: %s", error)
+    record_event(state, CLASSIFICATION_ERROR, lambda: f"Classification error: {error}")
+    return state
@@ -0,0 +1,150 @@
+# =============================================================================
+"""
+pre_classifier.py
+Deterministic pre-classification stage that runs in front of the LLM classifier.
+
+Signals (document headers, field labels, number formats) are compiled once when
+the classifier is built and searched only in the head of the document, where
+headers and labels live. Each matched signal adds its weight to its document
+types, and the scores are turned into a confidence with a softmax that includes a
+fixed "none of these" baseline, so a lone weak signal never looks certain.
+Above the threshold the LLM call is skipped.
+"""
+# =============================================================================
+
+import math
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# Confidence needed to skip the LLM
+DEFAULT_THRESHOLD = float(os.getenv("PRECLASSIFY_THRESHOLD", "0.9"))
+
+# Signal weights by kind
+HEADER_WEIGHT = 3.0
+LABEL_WEIGHT = 1.5
+FORMAT_WEIGHT = 0.5
+
+# Score of the implicit "none of the known types" class
+NONE_SCORE = 1.0
+
+# Only the head of the document is scanned
+DEFAULT_MAX_CHARS = 4000
+
+# (document_type(s), kind, pattern). Header patterns are anchored to the start of the document.
+DEFAULT_SIGNALS: List[Tuple[object, str, str]] = [
+    # Invoice
+    ("invoice", "header", r"\A\s*(?:tax\s+|commercial\s+)?invoice\b"),
+    ("invoice", "label", r"\binvoice\s*(?:#|no\.?|num(?:ber)?\b)"),
+    ("invoice", "label", r"\bbill\s+to\b"),
+    ("invoice", "label", r"\b(?:amount|balance)\s+due\b"),
+    ("invoice", "label", r"\bdue\s+date\b"),
+    ("invoice", "label", r"\bpayment\s+terms\b|\bnet\s+\d{1,3}\b"),
+    ("invoice", "format", r"\bINV[-\s]?\d{2,}"),
+    # Receipt
+    ("receipt", "header", r"\A\s*(?:sales\s+|payment\s+)?receipt\b"),
+    ("receipt", "label", r"\breceipt\s*(?:#|no\.?|num(?:ber)?\b)"),
+    ("receipt", "label", r"\bsub\s*-?total\b"),
+    ("receipt", "label", r"\b(?:cash|visa|mastercard|amex|debit)\b"),
+    ("receipt", "label", r"\bthank\s+you\s+for\s+(?:your\s+)?(?:purchase|shopping|visiting)\b"),
+    ("receipt", "format", r"\b(?:x{4}|\*{4})\s?\d{4}\b"),
+    # Contract
+    ("contract", "header", r"\A\s*(?:[\w-]+\s+){0,4}(?:agreement|contract)\b"),
+    ("contract", "label", r"\bcontract\s*(?:#|no\.?|num(?:ber)?\b)"),
+    ("contract", "label", r"\bparties\b|\bby\s+and\s+between\b"),
+    ("contract", "label", r"\beffective\s+date\b"),
+    ("contract", "label", r"\bwhereas\b|\bhereinafter\b|\bin\s+witness\s+whereof\b"),
+    ("contract", "label", r"\bgoverning\s+law\b|\btermination\b"),
+    # Report
+    ("report", "header", r"\A\s*(?:[\w-]+\s+){0,5}report\b"),
+    ("report", "label", r"\bexecutive\s+summary\b|\bsummary\s*:"),
+    ("report", "label", r"\bauthor\s*:|\bprepared\s+by\b"),
+    ("report", "label", r"\bfindings\b|\brecommendations\b|\bmethodology\b"),
+    ("report", "format", r"\b(?:Q[1-4]|FY)\s?\d{2,4}\b"),
+    # Money amounts are shared by invoices and receipts
+    (("invoice", "receipt"), "format", r"[$€£]\s?\d[\d,]*\.\d{2}\b"),
+]
+
+KIND_WEIGHTS = {"header": HEADER_WEIGHT, "label": LABEL_WEIGHT, "format": FORMAT_WEIGHT}
+
+
+class PreClassifierStats:
+    """Thread-safe counters showing how often the pre-classifier short-circuits the LLM."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.evaluated = 0
+        self.short_circuited = 0
+        self.deferred = 0
+        self.by_type: Dict[str, int] = {}
+
+    def record(self, document_type: Optional[str]):
+        with self._lock:
+            self.evaluated += 1
+            if document_type is None:
+                self.deferred += 1
+            else:
+                self.short_circuited += 1
+                self.by_type[document_type] = self.by_type.get(document_type, 0) + 1
+
+    @property
+    def short_circuit_rate(self) -> float:
+        return self.short_circuited / self.evaluated if self.evaluated else 0.0
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "evaluated": self.evaluated,
+                "short_circuited": self.short_circuited,
+                "deferred": self.deferred,
+                "short_circuit_rate": self.short_circuit_rate,
+                "by_type": dict(self.by_type),
+            }
+
+
+class PreClassifier:
+    """
+    Rule-based classifier that answers only when it is confident.
+
+    Args:
+        threshold: Minimum confidence for `classify` to return a result.
+        signals: (document_type(s), kind, pattern) triples; kind is "header", "label" or "format".
+        max_chars: Number of leading characters searched.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, signals=None, max_chars: int = DEFAULT_MAX_CHARS):
+        self.threshold = threshold
+        self.max_chars = max_chars
+        self.stats = PreClassifierStats()
+
+        self._signals = []
+        types = set()
+        for doc_types, kind, pattern in (DEFAULT_SIGNALS if signals is None else signals):
+            doc_types = (doc_types,) if isinstance(doc_types, str) else tuple(doc_types)
+            types.update(doc_types)
+            self._signals.append((re.compile(pattern, re.IGNORECASE | re.MULTILINE), doc_types, KIND_WEIGHTS[kind]))
+        self._types = sorted(types)
+
+    def score(self, content: str) -> Tuple[str, float]:
+        """Return the most likely type and its confidence, without applying the threshold."""
+        head = content[:self.max_chars]
+        scores = dict.fromkeys(self._types, 0.0)
+        for pattern, doc_types, weight in self._signals:
+            if pattern.search(head):
+                for doc_type in doc_types:
+                    scores[doc_type] += weight
+
+        best_type = max(scores, key=scores.get)
+        if scores[best_type] == 0.0:
+            return "unknown", 0.0
+
+        denominator = math.exp(NONE_SCORE) + sum(math.exp(s) for s in scores.values())
+        return best_type, math.exp(scores[best_type]) / denominator
+
+    def classify(self, content: str) -> Optional[Tuple[str, float]]:
+        """Return (document_type, confidence) if confident enough, else None (ask the LLM)."""
+        doc_type, confidence = self.score(content)
+        result = (doc_type, confidence) if confidence >= self.threshold else None
+        self.stats.record(result[0] if result else None)
+        return result
@@ -0,0 +1,101 @@
+# =============================================================================
+"""
+classify_extract.py
+Fused mode: one LLM call classifies the document and extracts the fields of
+its type, leaving the state as `classify_document` followed by `extract_data`
+would. The workflow goes straight from this node to validation, so a failed
+call still records an (empty) extraction for `validate_data` to score.
+"""
+# =============================================================================
+
+import json
+from src.services.langgraph.multi_agent_doc_processing.state import DocumentState, DOCUMENT_TYPES
+from src.services.langgraph.multi_agent_doc_processing.utils.llm import response_text, ainvoke_llm
+from src.services.langgraph.multi_agent_doc_processing.agents.classify_agent.classify_document import (
+    apply_classification,
+    classification_failed,
+)
+from src.services.langgraph.multi_agent_doc_processing.agents.extract_agent.extract_data import record_extraction
+from src.services.langgraph.multi_agent_doc_processing.utils.records import store_extraction
+
+def classify_and_extract(state: DocumentState, llm) -> DocumentState:
+    """
+    Classify the document and extract its fields with a single LLM call.
+    Leaves the state exactly as `classify_document` followed by `extract_data` would,
+    so `validate_data` and `route_document` run unchanged.
+    """
+    prompt = build_fused_prompt(state.get("document_content", ""))
+
+    try:
+        response = llm.invoke(prompt)
+        apply_fused_output(state, response_text(response))
+    except Exception as e:
+        fused_call_failed(state, e)
+
+    return state
+
+
+async def aclassify_and_extract(state: DocumentState, llm) -> DocumentState:
+    """Async variant of `classify_and_extract` using the LLM's async API."""
+    prompt = build_fused_prompt(state.get("document_content", ""))
+
+    try:
+        response = await ainvoke_llm(llm, prompt)
+        apply_fused_output(state, response_text(response))
+    except Exception as e:
+        fused_call_failed(state, e)
+
+    return state
+
+
+def fused_call_failed(state: DocumentState, error: Exception) -> DocumentState:
+    """Mark the classification as failed and record an empty extraction, so validation sends it to review."""
+    classification_failed(state, error)
+    state.setdefault("document_type", "generic")
+    store_extraction(state, {})
+    return state
+
+
+def build_fused_prompt(content: str) -> str:
+    """Prompt asking for the document type and the fields of that type in one JSON object."""
+    type_fields = "\n".join(
+        f"- {doc_type}: {', '.join(config['fields'])}"
+        for doc_type, config in DOCUMENT_TYPES.items()
+    )
+    return f"""
+Classify this document as one of: {', '.join(DOCUMENT_TYPES)}.
+Then extract the fields listed for that type:
+{type_fields}
+
+Document:
+{content}
+
+Return JSON only. Use "NOT_FOUND" for missing fields:
+{{"document_type": "<type>", "fields": {{"<field>": "value"}}}}""".strip()
+
+
+def parse_fused_output(raw_output: str) -> dict:
+    """Return the JSON object in the LLM output, or an empty dict if there is none."""
+    json_start = raw_output.find('{')
+    json_end = raw_output.rfind('}') + 1
+    if json_start == -1 or json_end <= json_start:
+        return {}
+    try:
+        parsed = json.loads(raw_output[json_start:json_end])
+    except json.JSONDecodeError:
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+def apply_fused_output(state: DocumentState, raw_output: str) -> DocumentState:
+    """Record both the classification and the extracted fields from one LLM answer."""
+    parsed = parse_fused_output(raw_output)
+    apply_classification(state, str(parsed.get("document_type", "")))
+
+    required_fields = DOCUMENT_TYPES.get(state["document_type"], {}).get("fields", [])
+    fields = parsed.get("fields")
+    if not isinstance(fields, dict):
+        fields = {}
+
+    extracted_data = {field: fields.get(field, "NOT_FOUND") for field in required_fields}
+    return record_extraction(state, extracted_data, required_fields)
@@ -0,0 +1,58 @@
+from src.services.langgraph.multi_agent_doc_processing.state import DocumentState
+from src.services.langgraph.multi_agent_doc_processing.agents.classify_agent.classify_document import classify_document, aclassify_document
+from src.services.langgraph.multi_agent_doc_processing.agents.extract_agent.extract_data import extract_data, aextract_data
+from src.services.langgraph.multi_agent_doc_processing.utils.cascade import CascadeConfig, LARGE
+from src.services.langgraph.multi_agent_doc_processing.utils.audit import ESCALATED, record_event
+from src.services.langgraph.multi_agent_doc_processing.logging.structured import get_logger
+
+log = get_logger(__name__, stage="escalate")
+
+def escalate_document(state: DocumentState, llm, cascade: CascadeConfig, **extract_options) -> DocumentState:
+    """
+    Re-run a document that the small model handled poorly on the larger `llm`.
+    A low classifier confidence re-classifies the document first; extraction then
+    keeps the fields that validated well and asks the larger model for the rest.
+    `extract_options` are passed through to `extract_data`.
+    """
+    reclassify = prepare_escalation(state, cascade)
+    if reclassify:
+        previous_type = state.get("document_type")
+        classify_document(state, llm, long_document=extract_options.get("long_document"))
+        if state.get("document_type") != previous_type:
+            state["extracted_data"] = {}
+    return extract_data(state, llm, **extract_options)
+
+
+async def aescalate_document(state: DocumentState, llm, cascade: CascadeConfig, **extract_options) -> DocumentState:
+    """Async variant of `escalate_document` using the LLM's async API."""
+    reclassify = prepare_escalation(state, cascade)
+    if reclassify:
+        previous_type = state.get("document_type")
+        await aclassify_document(state, llm, long_document=extract_options.get("long_document"))
+        if state.get("document_type") != previous_type:
+            state["extracted_data"] = {}
+    return await aextract_data(state, llm, **extract_options)
+
+
+def prepare_escalation(state: DocumentState, cascade: CascadeConfig) -> bool:
+    """
+    Reset the review flags, keep only the fields that validated well and mark the
+    state as handled by the larger tier. Returns True if the document should be
+    re-classified.
+    """
+    results = state.get("validation_results") or {}
+    field_scores = results.get("field_scores", {})
+    confidence = state.get("confidence_score", 0.0)
+
+    state["model_tier"] = LARGE
+    state["human_review_required"] = False
+    state["next_action"] = "extract_data"
+    state["extracted_data"] = {
+        field: value
+        for field, value in (state.get("extracted_data") or {}).items()
+        if field_scores.get(field, 0.0) >= 0.8
+    }
+    log.info("Escalating to the larger model (score %.2f, confidence %.2f)", results.get('overall_score', 0.0), confidence)
+    record_event(state, ESCALATED, lambda: f"Escalated to larger model (score {results.get('overall_score', 0.0):.1%}, "
+                                           f"confidence {confidence:.1%})")
+    return confidence < cascade.min_confidence
@@ -1,73 +1,322 @@
+import asyncio
+import contextvars
 import json
-from langchain_core.messages import AIMessage
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from src.services.langgraph.multi_agent_doc_processing.state import DocumentState, DOCUMENT_TYPES
+from src.services.langgraph.multi_agent_doc_processing.utils.llm import response_text, ainvoke_llm
+from src.services.langgraph.multi_agent_doc_processing.utils.json_stream import IncrementalJSONObjectParser
+from src.services.langgraph.multi_agent_doc_processing.utils.chunking import count_tokens, chunk_text
+from src.services.langgraph.multi_agent_doc_processing.utils.structured_output import decode_extraction, structured_output_kwargs
+from src.services.langgraph.multi_agent_doc_processing.agents.extract_agent.field_rules import rule_extract
+from src.services.langgraph.multi_agent_doc_processing.utils.audit import EXTRACTED, record_event
+from src.services.langgraph.multi_agent_doc_processing.utils.records import store_extraction
+from src.services.langgraph.multi_agent_doc_processing.logging.structured import get_logger
 
-def extract_data(state: DocumentState, llm) -> DocumentState:
-    """Extract structured data based on document type using an injected LLM."""
+log = get_logger(__name__, stage="extract")
+
+def extract_data(state: DocumentState, llm, template_store=None, rule_extraction: bool = False,
+                 streaming: bool = False, long_document=None, structured_output: bool = False) -> DocumentState:
+    """
+    Extract structured data based on document type using an injected LLM.
+    Fields already present in 'extracted_data' (a head start from an earlier
+    stage), filled by a learned vendor template or, with `rule_extraction`,
+    found by the deterministic field rules are kept, and only the remaining
+    fields are requested from the LLM.
+
+    With `streaming`, the LLM's token stream is parsed as it arrives and the
+    generation is cancelled once every requested field has been received.
+
+    With a `LongDocumentConfig`, documents whose prompt would exceed its token
+    budget are split into overlapping chunks that are extracted in parallel
+    and merged.
+
+    With `structured_output`, the provider is constrained to the cached JSON
+    schema of the requested fields and its answer is decoded directly.
+    """
+    doc_type = state['document_type']
+    required_fields = DOCUMENT_TYPES.get(doc_type, {}).get('fields', [])
+    prefilled = prefilled_fields(state, required_fields, template_store, rule_extraction)
+    missing_fields = [field for field in required_fields if field not in prefilled]
+
+    log.info("Extracting %d fields from %s", len(required_fields), doc_type)
+
+    if not missing_fields:
+        return record_extraction(state, prefilled, required_fields)
+
+    prompt = build_extraction_prompt(doc_type, missing_fields, state['document_content'])
+    llm_kwargs = structured_output_kwargs(llm, doc_type, missing_fields) if structured_output else {}
+
+    try:
+        if needs_chunking(prompt, long_document):
+            fields = map_reduce_extraction(llm, doc_type, missing_fields, state['document_content'], long_document,
+                                           structured_output)
+            merge_extraction(state, fields, required_fields, prefilled)
+        elif streaming and hasattr(llm, "stream"):
+            fields = stream_extraction(llm, prompt, missing_fields, **llm_kwargs)
+            merge_extraction(state, fields, required_fields, prefilled)
+        else:
+            # Handle both new and old LLM outputs
+            response = llm.invoke(prompt, **llm_kwargs)
+            apply_extraction(state, response_text(response), required_fields, prefilled, structured_output)
+    except Exception as e:
+        extraction_failed(state, e)
+
+    return state
+
+
+async def aextract_data(state: DocumentState, llm, template_store=None, rule_extraction: bool = False,
+                        streaming: bool = False, long_document=None, structured_output: bool = False) -> DocumentState:
+    """Async variant of `extract_data` using the LLM's async API."""
     doc_type = state['document_type']
     required_fields = DOCUMENT_TYPES.get(doc_type, {}).get('fields', [])
-    
-    print(f"Extracting {len(required_fields)} fields from {doc_type}")
-    
-    prompt = f"""
+    prefilled = prefilled_fields(state, required_fields, template_store, rule_extraction)
+    missing_fields = [field for field in required_fields if field not in prefilled]
+
+    log.info("Extracting %d fields from %s", len(required_fields), doc_type)
+
+    if not missing_fields:
+        return record_extraction(state, prefilled, required_fields)
+
+    prompt = build_extraction_prompt(doc_type, missing_fields, state['document_content'])
+    llm_kwargs = structured_output_kwargs(llm, doc_type, missing_fields) if structured_output else {}
+
+    try:
+        if needs_chunking(prompt, long_document):
+            fields = await amap_reduce_extraction(llm, doc_type, missing_fields, state['document_content'],
+                                                  long_document, structured_output)
+            merge_extraction(state, fields, required_fields, prefilled)
+        elif streaming and hasattr(llm, "astream"):
+            fields = await astream_extraction(llm, prompt, missing_fields, **llm_kwargs)
+            merge_extraction(state, fields, required_fields, prefilled)
+        else:
+            response = await ainvoke_llm(llm, prompt, **llm_kwargs)
+            apply_extraction(state, response_text(response), required_fields, prefilled, structured_output)
+    except Exception as e:
+        extraction_failed(state, e)
+
+    return state
+
+
+def prefilled_fields(state: DocumentState, required_fields: list, template_store=None,
+                     rule_extraction: bool = False) -> dict:
+    """
+    Required fields already filled by an earlier stage, a vendor template or the field rules.
+    Fields the template store holds back for an audit are left to the LLM.
+    """
+    filled, held_back = template_store.apply_with_audit(state) if template_store is not None else ({}, frozenset())
+    prefilled = {
+        field: value
+        for field, value in (state.get('extracted_data') or {}).items()
+        if field in required_fields and field not in held_back and value not in ("NOT_FOUND", "", None)
+    }
+    for field, value in filled.items():
+        prefilled.setdefault(field, value)
+    if rule_extraction:
+        missing_fields = [field for field in required_fields if field not in prefilled and field not in held_back]
+        if missing_fields:
+            prefilled.update(rule_extract(state.get('document_content', ''), missing_fields))
+    return prefilled
+
+
+def stream_extraction(llm, prompt: str, requested_fields: list, **llm_kwargs) -> dict:
+    """
+    Parse the JSON object out of the LLM's token stream as it arrives.
+    Stops consuming (and closes the stream) once every requested field is present.
+    """
+    parser = IncrementalJSONObjectParser()
+    raw_output = ""
+    stream = llm.stream(prompt, **llm_kwargs)
+    try:
+        for chunk in stream:
+            text = response_text(chunk)
+            raw_output += text
+            parser.feed(text)
+            if parser.done or all(field in parser.fields for field in requested_fields):
+                break
+    finally:
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+    return parser.fields or parse_extraction(raw_output, requested_fields)
+
+
+async def astream_extraction(llm, prompt: str, requested_fields: list, **llm_kwargs) -> dict:
+    """Async variant of `stream_extraction` over the LLM's `astream`."""
+    parser = IncrementalJSONObjectParser()
+    raw_output = ""
+    stream = llm.astream(prompt, **llm_kwargs)
+    try:
+        async for chunk in stream:
+            text = response_text(chunk)
+            raw_output += text
+            parser.feed(text)
+            if parser.done or all(field in parser.fields for field in requested_fields):
+                break
+    finally:
+        aclose = getattr(stream, "aclose", None)
+        if aclose is not None:
+            await aclose()
+    return parser.fields or parse_extraction(raw_output, requested_fields)
+
+
+def needs_chunking(prompt: str, long_document) -> bool:
+    return long_document is not None and count_tokens(prompt) > long_document.max_prompt_tokens
+
+
+def document_chunks(doc_type: str, fields: list, content: str, long_document) -> list:
+    """Split the document so each chunk's extraction prompt fits the token budget."""
+    overhead = count_tokens(build_extraction_prompt(doc_type, fields, ""))
+    chunk_tokens = long_document.max_prompt_tokens - overhead
+    if chunk_tokens <= long_document.overlap_tokens:
+        raise ValueError(f"max_prompt_tokens={long_document.max_prompt_tokens} leaves no room for document text")
+    return chunk_text(content, chunk_tokens, long_document.overlap_tokens)
+
+
+def merge_chunk_fields(chunk_results: list, fields: list) -> dict:
+    """
+    Merge per-chunk extractions. A field takes the value most chunks agree on
+    (compared case- and whitespace-insensitively); ties go to the earliest chunk.
+    """
+    merged = {}
+    for field in fields:
+        values = [
+            result[field] for result in chunk_results
+            if result.get(field) not in ("NOT_FOUND", "", None)
+        ]
+        if not values:
+            merged[field] = "NOT_FOUND"
+            continue
+        keys = [str(value).strip().lower() for value in values]
+        counts = Counter(keys)
+        winner = max(counts, key=lambda key: (counts[key], -keys.index(key)))
+        merged[field] = values[keys.index(winner)]
+    return merged
+
+
+def map_reduce_extraction(llm, doc_type: str, fields: list, content: str, long_document,
+                          structured_output: bool = False) -> dict:
+    """Extract `fields` from every chunk in parallel and merge the results."""
+    chunks = document_chunks(doc_type, fields, content, long_document)
+    llm_kwargs = structured_output_kwargs(llm, doc_type, fields) if structured_output else {}
+    log.info("Long document: extracting from %d chunks", len(chunks))
+
+    def extract_chunk(chunk):
+        response = llm.invoke(build_extraction_prompt(doc_type, fields, chunk), **llm_kwargs)
+        return parse_extraction(response_text(response), fields, structured_output)
+
+    # Each chunk runs in a copy of this context, so its LLM call is attributed to the node
+    contexts = [contextvars.copy_context() for _ in chunks]
+    with ThreadPoolExecutor(max_workers=max(1, min(long_document.max_workers, len(chunks)))) as pool:
+        results = pool.map(lambda context, chunk: context.run(extract_chunk, chunk), contexts, chunks)
+        return merge_chunk_fields(list(results), fields)
+
+
+async def amap_reduce_extraction(llm, doc_type: str, fields: list, content: str, long_document,
+                                 structured_output: bool = False) -> dict:
+    """Async variant of `map_reduce_extraction`; chunks share the event loop."""
+    chunks = document_chunks(doc_type, fields, content, long_document)
+    llm_kwargs = structured_output_kwargs(llm, doc_type, fields) if structured_output else {}
+    log.info("Long document: extracting from %d chunks", len(chunks))
+    semaphore = asyncio.Semaphore(max(1, long_document.max_workers))
+
+    async def extract_chunk(chunk):
+        async with semaphore:
+            response = await ainvoke_llm(llm, build_extraction_prompt(doc_type, fields, chunk), **llm_kwargs)
+        return parse_extraction(response_text(response), fields, structured_output)
+
+    return merge_chunk_fields(list(await asyncio.gather(*(extract_chunk(c) for c in chunks))), fields)
+
+
+def build_extraction_prompt(doc_type: str, required_fields: list, content: str) -> str:
+    """Prompt asking the LLM for the given fields as a JSON object."""
+    return f"""
     Extract these fields from the {doc_type}:
     {', '.join(required_fields)}
 
     Document:
-    {state['document_content']}
+    {content}
 
     Return JSON format. Use "NOT_FOUND" for missing fields:
     {{
         {', '.join([f'"{field}": "value"' for field in required_fields])}
     }}
     """.strip()
-    
-    try:
-        # Handle both new and old LLM outputs
-        response = llm.invoke(prompt)
-        if hasattr(response, "content"):   # old community Ollama
-            raw_output = response.content
-        else:                              # new langchain-ollama
-            raw_output = str(response)
-
-        # Try to extract JSON
-        json_start = raw_output.find('{')
-        json_end = raw_output.rfind('}') + 1
-        
-        if json_start != -1 and json_end > json_start:
-            json_str = raw_output[json_start:json_end]
-            try:
-                extracted_data = json.loads(json_str)
-            except json.JSONDecodeError:
-                print("⚠️ LLM returned malformed JSON, marking all fields as NOT_FOUND")
-                extracted_data = {field: "NOT_FOUND" for field in required_fields}
-        else:
+
+
+def parse_extraction(raw_output: str, required_fields: list, structured_output: bool = False) -> dict:
+    """
+    Pull the JSON object out of the LLM output; every required field is present in the result.
+    Schema-constrained output is decoded directly, falling back to the scan below.
+    """
+    if structured_output:
+        decoded = decode_extraction(raw_output, required_fields)
+        if decoded is not None:
+            return decoded
+
+    # Try to extract JSON
+    json_start = raw_output.find('{')
+    json_end = raw_output.rfind('}') + 1
+
+    if json_start != -1 and json_end > json_start:
+        json_str = raw_output[json_start:json_end]
+        try:
+            extracted_data = json.loads(json_str)
+        except json.JSONDecodeError:
+            log.warning("LLM returned malformed JSON, marking all fields as NOT_FOUND")
             extracted_data = {field: "NOT_FOUND" for field in required_fields}
-        
-        # Ensure all required fields exist
-        for field in required_fields:
-            if field not in extracted_data:
-                extracted_data[field] = "NOT_FOUND"
-        
-        state['extracted_data'] = extracted_data
-        state['processing_stage'] = 'extracted'
-        state['next_action'] = 'validate_data'
-
-        # Logging
-        found_count = len([v for v in extracted_data.values() if v != "NOT_FOUND"])
-        print(f"Extracted {found_count}/{len(required_fields)} fields")
-        
+    else:
+        extracted_data = {field: "NOT_FOUND" for field in required_fields}
+
+    # Ensure all required fields exist
+    for field in required_fields:
+        if field not in extracted_data:
+            extracted_data[field] = "NOT_FOUND"
+
+    return extracted_data
+
+
+def apply_extraction(state: DocumentState, raw_output: str, required_fields: list, prefilled: dict = None,
+                     structured_output: bool = False) -> DocumentState:
+    """Parse the LLM output, merge it with any prefilled fields and record the result on the state."""
+    prefilled = prefilled or {}
+    requested_fields = [field for field in required_fields if field not in prefilled]
+    parsed = parse_extraction(raw_output, requested_fields, structured_output)
+    return merge_extraction(state, parsed, required_fields, prefilled)
+
+
+def merge_extraction(state: DocumentState, extracted_data: dict, required_fields: list,
+                     prefilled: dict = None) -> DocumentState:
+    """Combine LLM fields with prefilled ones, mark the rest NOT_FOUND and record the result."""
+    extracted_data = dict(extracted_data)
+    extracted_data.update(prefilled or {})
+    for field in required_fields:
+        if field not in extracted_data:
+            extracted_data[field] = "NOT_FOUND"
+    return record_extraction(state, extracted_data, required_fields)
+
+
+def record_extraction(state: DocumentState, extracted_data: dict, required_fields: list) -> DocumentState:
+    """Record already-parsed fields on the state and hand over to validation."""
+    store_extraction(state, extracted_data)
+    state['processing_stage'] = 'extracted'
+    state['next_action'] = 'validate_data'
+
+    found_count = sum(1 for v in extracted_data.values() if v != "NOT_FOUND")
+    log.info("Extracted %d/%d fields", found_count, len(required_fields))
+    if log.isEnabledFor(logging.DEBUG):
         for field, value in extracted_data.items():
-            status = "Found" if value != "NOT_FOUND" else "Missing"
-            print(f"   {status}: {field}: {value}")
-        
-        state.setdefault('messages', []).append(
-            AIMessage(content=f"Extracted {found_count} fields")
-        )
-        
-    except Exception as e:
-        print(f"Extraction error: {e}")
-        state['error_count'] += 1
-        state['next_action'] = 'error_handling'
-    
+            log.debug("%s: %s: %s", "Found" if value != "NOT_FOUND" else "Missing", field, value,
+                      extra={"sampled": True, "field": field})
+
+    record_event(state, EXTRACTED, lambda: f"Extracted {found_count} fields")
+    return state
+
+
+def extraction_failed(state: DocumentState, error: Exception) -> DocumentState:
+    """Mark the state as failed after an LLM error."""
+    log.error("Extraction error: %s", error)
+    state['error_count'] += 1
+    state['next_action'] = 'error_handling'
     return state
@@ -0,0 +1,139 @@
+# =============================================================================
+"""
+field_rules.py
+Deterministic extractors for structured fields (numbers, dates, amounts and
+labelled values), run before the LLM so it is only asked for what they miss.
+
+Each field has a list of label-anchored regexes compiled at import time. Amounts
+are normalised to "$ 1,234.56" and dates to ISO "YYYY-MM-DD", and a value is only
+accepted if `validate_amount`/`validate_date` accept it, so rule output always
+passes the same checks as LLM output.
+"""
+# =============================================================================
+
+import re
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from src.services.langgraph.multi_agent_doc_processing.agents.validate_agent.validate_data import (
+    validate_amount,
+    validate_date,
+)
+
+_FLAGS = re.IGNORECASE | re.MULTILINE
+
+_MONEY = r"(?P<value>\$?[ \t]?\d[\d,]*(?:\.\d{1,2})?)(?![\d.,]*\s*%)"
+_DATE = (
+    r"(?P<value>\d{4}-\d{1,2}-\d{1,2}"
+    r"|\d{1,2}[/-]\d{1,2}[/-]\d{2,4}"
+    r"|[A-Za-z]{3,9}\.? \d{1,2}, \d{4})"
+)
+_IDENTIFIER = r"(?P<value>#?[A-Z0-9][A-Z0-9/-]*\d[A-Z0-9/-]*)"
+_LINE = r"(?P<value>[^\n]*?\S)[ \t]*$"
+
+FIELD_PATTERNS: Dict[str, List[str]] = {
+    "invoice_number": [
+        r"\binvoice\s*(?:#|no\.?|num(?:ber)?)\s*[:#]?\s*" + _IDENTIFIER,
+        r"\binvoice\s+" + _IDENTIFIER,
+    ],
+    "contract_number": [
+        r"\b(?:contract|agreement)\s*(?:#|no\.?|num(?:ber)?)\s*[:#]?\s*" + _IDENTIFIER,
+    ],
+    "date": [
+        r"\b(?:invoice\s+|receipt\s+|issue\s+|report\s+)?date\s*(?:of\s+issue)?\s*[:\-]?\s*" + _DATE,
+        r"^\s*" + _DATE + r"\s*$",
+    ],
+    "effective_date": [
+        r"\beffective(?:\s+date)?\s*(?:as\s+of)?\s*[:\-]?\s*" + _DATE,
+    ],
+    "amount": [
+        r"\b(?:total[ \t]+amount(?:[ \t]+due)?|amount[ \t]+due|balance[ \t]+due|grand[ \t]+total|total|amount)"
+        r"[ \t]*[:\-]?[ \t]*" + _MONEY,
+    ],
+    "value": [
+        r"\b(?:contract[ \t]+value|total[ \t]+value|value)[ \t]*[:\-]?[ \t]*" + _MONEY,
+    ],
+    "vendor": [
+        r"^\s*(?:vendor|supplier|seller|merchant|from)\s*:\s*" + _LINE,
+    ],
+    "parties": [
+        r"^\s*parties\s*:\s*" + _LINE,
+        r"\bby\s+and\s+between\s+(?P<value>[^\n.]+?)\s*(?:[.\n]|$)",
+    ],
+    "title": [
+        r"^\s*title\s*:\s*" + _LINE,
+    ],
+    "author": [
+        r"^\s*(?:author|prepared\s+by|written\s+by)\s*:\s*" + _LINE,
+    ],
+}
+
+COMPILED_PATTERNS: Dict[str, List[re.Pattern]] = {
+    field: [re.compile(pattern, _FLAGS) for pattern in patterns]
+    for field, patterns in FIELD_PATTERNS.items()
+}
+
+_DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%m-%d-%Y", "%m-%d-%y", "%B %d, %Y", "%b %d, %Y", "%b. %d, %Y")
+
+
+def normalize_amount(raw: str) -> Optional[str]:
+    """'$12500' / '12,500.0' -> '$ 12,500.00'; None if it is not a valid amount."""
+    cleaned = re.sub(r"[$,\s]", "", raw)
+    try:
+        amount = float(cleaned)
+    except ValueError:
+        return None
+    normalized = f"$ {amount:,.2f}"
+    return normalized if validate_amount(normalized) else None
+
+
+def normalize_date(raw: str) -> Optional[str]:
+    """Any recognised date format -> 'YYYY-MM-DD'; None if it does not parse."""
+    raw = raw.strip()
+    for fmt in _DATE_FORMATS:
+        try:
+            normalized = datetime.strptime(raw, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+        return normalized if validate_date(normalized) else None
+    return None
+
+
+def _normalize_text(raw: str) -> Optional[str]:
+    value = raw.strip().strip(",;")
+    return value if 2 <= len(value) <= 200 else None
+
+
+def _normalize_identifier(raw: str) -> Optional[str]:
+    value = raw.strip()
+    return value if len(value) >= 3 else None
+
+
+NORMALIZERS: Dict[str, Callable[[str], Optional[str]]] = {
+    "invoice_number": _normalize_identifier,
+    "contract_number": _normalize_identifier,
+    "date": normalize_date,
+    "effective_date": normalize_date,
+    "amount": normalize_amount,
+    "value": normalize_amount,
+    "vendor": _normalize_text,
+    "parties": _normalize_text,
+    "title": _normalize_text,
+    "author": _normalize_text,
+}
+
+
+def rule_extract(content: str, fields: List[str]) -> Dict[str, str]:
+    """Return the fields the deterministic rules can fill, normalised; missing fields are omitted."""
+    found = {}
+    for field in fields:
+        normalize = NORMALIZERS.get(field)
+        for pattern in COMPILED_PATTERNS.get(field, ()):
+            match = pattern.search(content)
+            if match is None:
+                continue
+            value = normalize(match.group("value"))
+            if value is not None:
+                found[field] = value
+                break
+    return found
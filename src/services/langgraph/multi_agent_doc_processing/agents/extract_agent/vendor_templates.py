@@ -0,0 +1,343 @@
+# =============================================================================
+"""
+vendor_templates.py
+Per-vendor extraction templates learned from high-scoring extractions.
+
+When a document validates well, each field value is located in the text and a
+rule is derived from it: the label text just before the value on the same line
+(the anchor) followed by the value's shape (digit runs, word runs, punctuation),
+or "rest of the line" when the value ends the line. The next document from the
+same vendor is matched by its vendor name in the issuer context (the first
+lines and lines labelled "Vendor:", "From:", "Remit to:"..., never a bill-to
+block), or, for types without a vendor field, by its first line; the rules fill
+whatever fields they can before `extract_data` asks the LLM for the remainder.
+
+A rule's precision is measured against independent extractions: until it has
+`min_samples` of them, and for an `audit_rate` sample of documents afterwards,
+its field is still sent to the LLM, and `learn` compares the rule's prediction
+with the LLM's answer. Only rules that are trusted this way prefill fields;
+rules that fall below `min_precision` are dropped and relearned.
+"""
+# =============================================================================
+
+import random
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+from src.services.langgraph.multi_agent_doc_processing.state import DocumentState, DOCUMENT_TYPES
+
+_VALUE_TOKENS = re.compile(r"\d[\d,]*(?:\.\d+)?|[^\W\d_]+|\s+|.", re.DOTALL)
+_HAS_LETTER = re.compile(r"[^\W\d_]")
+_DIGIT_RUN = re.compile(r"\d+")
+_WORD = re.compile(r"\w+")
+_ISSUER_LABEL = re.compile(
+    r"^\W*(?:vendor|supplier|seller|merchant|from|issued by|remit(?: payment)? to|payable to)\b", re.IGNORECASE)
+_RECIPIENT_LABEL = re.compile(r"\b(?:bill(?:ed)? to|ship(?:ped)? to|sold to|customer|client)\b", re.IGNORECASE)
+
+MAX_ANCHOR_CHARS = 40
+HEADER_LINES = 3
+MAX_PENDING_AUDITS = 1024
+
+
+def value_shape(value: str) -> str:
+    """Regex matching values shaped like `value` (e.g. 'INV-2025-045' -> letters-digits-digits)."""
+    parts = []
+    for token in _VALUE_TOKENS.findall(value):
+        if token[0].isdigit():
+            parts.append(r"\d[\d,]*(?:\.\d+)?")
+        elif token.isspace():
+            parts.append(r"\s+")
+        elif _HAS_LETTER.match(token):
+            parts.append(r"[^\W\d_]+")
+        else:
+            parts.append(re.escape(token))
+    return "".join(parts)
+
+
+def derive_rule(content: str, value: str) -> Optional[str]:
+    """Build an anchor + shape pattern for `value` at its first position in `content`."""
+    start = content.find(value)
+    if start < 0:
+        return None
+
+    line_start = content.rfind("\n", 0, start) + 1
+    line_end = content.find("\n", start + len(value))
+    if line_end < 0:
+        line_end = len(content)
+
+    anchor = content[line_start:start].strip()[-MAX_ANCHOR_CHARS:].lstrip()
+    if not _HAS_LETTER.search(anchor):
+        return None
+    anchor_pattern = _DIGIT_RUN.sub(r"\\d+", re.escape(anchor))
+
+    if content[start + len(value):line_end].strip():
+        value_pattern = value_shape(value)
+    else:
+        value_pattern = r"[^\n]*?\S(?=[ \t]*$)"
+
+    return anchor_pattern + r"[ \t]*(?P<value>" + value_pattern + ")"
+
+
+def issuer_context(content: str) -> str:
+    """
+    The lines that name the document's issuer: the first HEADER_LINES non-empty
+    lines and any issuer-labelled line, minus bill-to/customer lines.
+    """
+    lines, header = [], 0
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+        header += 1
+        if _RECIPIENT_LABEL.search(line):
+            continue
+        if header <= HEADER_LINES or _ISSUER_LABEL.match(line):
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def header_key(content: str) -> str:
+    """First non-empty line with digits masked, used to identify templates without a vendor field."""
+    for line in content.splitlines():
+        line = line.strip()
+        if line:
+            return _DIGIT_RUN.sub("0", line.lower())
+    return ""
+
+
+class FieldRule:
+    """A compiled extraction rule for one field, with its running precision."""
+
+    __slots__ = ("pattern", "applied", "validated")
+
+    def __init__(self, pattern: str):
+        self.pattern = re.compile(pattern, re.MULTILINE)
+        self.applied = 0
+        self.validated = 0
+
+    def match(self, content: str) -> Optional[str]:
+        found = self.pattern.search(content)
+        return found.group("value").strip() if found else None
+
+    @property
+    def precision(self) -> float:
+        return self.validated / self.applied if self.applied else 1.0
+
+
+class VendorTemplate:
+    """Rules learned for one (document type, vendor) pair."""
+
+    __slots__ = ("key", "vendor", "rules", "documents_learned")
+
+    def __init__(self, key: tuple, vendor: Optional[str]):
+        self.key = key
+        self.vendor = vendor
+        self.rules: Dict[str, FieldRule] = {}
+        self.documents_learned = 0
+
+    def apply(self, content: str) -> Dict[str, str]:
+        filled = {"vendor": self.vendor} if self.vendor else {}
+        for field, rule in self.rules.items():
+            value = rule.match(content)
+            if value:
+                filled[field] = value
+        return filled
+
+
+class TemplateStore:
+    """
+    Learns vendor templates from validated documents and applies them in front of the LLM.
+
+    Args:
+        min_score: Minimum validation `overall_score` for a document to teach new rules.
+        min_precision: Rules whose precision falls below this are dropped.
+        min_samples: Independent checks needed before a rule prefills its field.
+        audit_rate: Fraction of documents on which trusted rules are still checked against the LLM.
+        max_templates: Maximum templates kept; least recently used are evicted.
+    """
+
+    def __init__(self, min_score: float = 0.9, min_precision: float = 0.8, min_samples: int = 5,
+                 audit_rate: float = 0.05, max_templates: int = 10_000):
+        self.min_score = min_score
+        self.min_precision = min_precision
+        self.min_samples = min_samples
+        self.audit_rate = audit_rate
+        self.max_templates = max_templates
+
+        self._lock = threading.RLock()
+        self._templates: "OrderedDict[tuple, VendorTemplate]" = OrderedDict()
+        # doc type -> first word of a vendor name -> vendor names, longest first
+        self._vendors: Dict[str, Dict[str, list]] = {}
+        # (template key, content) -> {field: prediction} for fields left to the LLM to check the rule
+        self._audits: "OrderedDict[tuple, Dict[str, str]]" = OrderedDict()
+
+        self.documents_seen = 0
+        self.templates_matched = 0
+        self.fields_requested = 0
+        self.fields_filled = 0
+        self.fully_covered = 0
+
+    def __len__(self):
+        return len(self._templates)
+
+    # ------------------------------------------------------------------ lookup
+
+    def _find_template(self, doc_type: str, content: str) -> Optional[VendorTemplate]:
+        fields = DOCUMENT_TYPES.get(doc_type, {}).get("fields", [])
+        if "vendor" not in fields:
+            return self._templates.get((doc_type, header_key(content)))
+
+        vendors = self._vendors.get(doc_type)
+        if not vendors:
+            return None
+        context = issuer_context(content)
+        for word in _WORD.finditer(context):
+            for vendor in vendors.get(word.group(), ()):
+                if context.startswith(vendor, word.start()):
+                    return self._templates.get((doc_type, vendor))
+        return None
+
+    def _index_vendor(self, doc_type: str, vendor: str):
+        names = self._vendors.setdefault(doc_type, {}).setdefault(_WORD.match(vendor).group(), [])
+        names.append(vendor)
+        names.sort(key=len, reverse=True)
+
+    def _unindex_vendor(self, doc_type: str, vendor: str):
+        names = self._vendors.get(doc_type, {}).get(_WORD.match(vendor).group(), [])
+        if vendor in names:
+            names.remove(vendor)
+
+    def _template_key(self, doc_type: str, content: str, extracted_data: Dict[str, Any]) -> Optional[tuple]:
+        fields = DOCUMENT_TYPES.get(doc_type, {}).get("fields", [])
+        if "vendor" in fields:
+            vendor = extracted_data.get("vendor")
+            if not isinstance(vendor, str) or vendor == "NOT_FOUND" or not _WORD.match(vendor) \
+                    or vendor not in issuer_context(content):
+                return None
+            return doc_type, vendor
+        key = header_key(content)
+        return (doc_type, key) if key else None
+
+    def _trusted(self, rule: FieldRule) -> bool:
+        return rule.applied >= self.min_samples and rule.precision >= self.min_precision
+
+    # ------------------------------------------------------------------ apply
+
+    def apply(self, state: DocumentState) -> Dict[str, str]:
+        """
+        Return the field values the matching template can fill for this document.
+        Predictions of untrusted rules (and of trusted ones on audited documents)
+        are held back, so the LLM extracts those fields and `learn` can check them.
+        """
+        return self.apply_with_audit(state)[0]
+
+    def apply_with_audit(self, state: DocumentState) -> Tuple[Dict[str, str], FrozenSet[str]]:
+        """
+        `apply`, plus the held-back fields. The caller must leave those to the
+        LLM (no rule extraction or head start), or the audit would compare the
+        template against something other than an independent extraction.
+        """
+        doc_type = state.get("document_type", "")
+        content = state.get("document_content", "")
+        fields = DOCUMENT_TYPES.get(doc_type, {}).get("fields", [])
+
+        with self._lock:
+            self.documents_seen += 1
+            self.fields_requested += len(fields)
+            template = self._find_template(doc_type, content)
+            if template is None:
+                return {}, frozenset()
+            self._templates.move_to_end(template.key)
+            self.templates_matched += 1
+
+            audit = random.random() < self.audit_rate
+            filled, held_back = {}, {}
+            for field, value in template.apply(content).items():
+                if field not in fields:
+                    continue
+                rule = template.rules.get(field)
+                if rule is not None and (audit or not self._trusted(rule)):
+                    held_back[field] = value
+                else:
+                    filled[field] = value
+            if held_back:
+                self._audits[(template.key, content)] = held_back
+                while len(self._audits) > MAX_PENDING_AUDITS:
+                    self._audits.popitem(last=False)
+            self.fields_filled += len(filled)
+            if len(filled) == len(fields):
+                self.fully_covered += 1
+            return filled, frozenset(held_back)
+
+    # ------------------------------------------------------------------ learn
+
+    def learn(self, state: DocumentState):
+        """Score held-back predictions against the LLM's extraction of this document, then learn from it."""
+        doc_type = state.get("document_type", "")
+        content = state.get("document_content", "")
+        extracted_data = state.get("extracted_data", {}) or {}
+        results = state.get("validation_results", {}) or {}
+        field_scores = results.get("field_scores", {})
+
+        key = self._template_key(doc_type, content, extracted_data)
+        if key is None:
+            return
+
+        with self._lock:
+            template = self._templates.get(key)
+
+            # Precision: did each held-back prediction agree with the LLM's independent extraction?
+            held_back = self._audits.pop((key, content), {})
+            if template is not None:
+                for field, predicted in held_back.items():
+                    rule, extracted = template.rules.get(field), extracted_data.get(field)
+                    if rule is None or not isinstance(extracted, str) or extracted == "NOT_FOUND":
+                        continue
+                    rule.applied += 1
+                    if predicted == extracted:
+                        rule.validated += 1
+                    if rule.applied >= self.min_samples and rule.precision < self.min_precision:
+                        del template.rules[field]
+
+            if results.get("overall_score", 0.0) < self.min_score:
+                return
+
+            if template is None:
+                has_vendor = "vendor" in DOCUMENT_TYPES.get(doc_type, {}).get("fields", [])
+                template = VendorTemplate(key, key[1] if has_vendor else None)
+                self._templates[key] = template
+                if has_vendor:
+                    self._index_vendor(doc_type, key[1])
+                while len(self._templates) > self.max_templates:
+                    _, evicted = self._templates.popitem(last=False)
+                    if evicted.vendor:
+                        self._unindex_vendor(evicted.key[0], evicted.vendor)
+
+            template.documents_learned += 1
+            for field in DOCUMENT_TYPES.get(doc_type, {}).get("fields", []):
+                value = extracted_data.get(field)
+                if field == "vendor" or field in template.rules:
+                    continue
+                if not isinstance(value, str) or value == "NOT_FOUND" or field_scores.get(field, 0.0) < 0.8:
+                    continue
+                pattern = derive_rule(content, value)
+                if pattern is not None:
+                    template.rules[field] = FieldRule(pattern)
+
+    # ------------------------------------------------------------------ stats
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rules = [rule for template in self._templates.values() for rule in template.rules.values()]
+            applied = sum(rule.applied for rule in rules)
+            validated = sum(rule.validated for rule in rules)
+            return {
+                "templates": len(self._templates),
+                "rules": len(rules),
+                "documents_seen": self.documents_seen,
+                "templates_matched": self.templates_matched,
+                "fully_covered": self.fully_covered,
+                "field_coverage": self.fields_filled / self.fields_requested if self.fields_requested else 0.0,
+                "precision": validated / applied if applied else 1.0,
+            }
@@ -0,0 +1,148 @@
+from src.services.langgraph.multi_agent_doc_processing.state import DocumentState, DOCUMENT_TYPES
+from src.services.langgraph.multi_agent_doc_processing.utils.llm import response_text, ainvoke_llm
+from src.services.langgraph.multi_agent_doc_processing.utils.chunking import count_tokens, leading_text
+from src.services.langgraph.multi_agent_doc_processing.utils.cascade import LARGE
+from src.services.langgraph.multi_agent_doc_processing.utils.repair import RepairConfig
+from src.services.langgraph.multi_agent_doc_processing.utils.audit import REPAIRED, record_event
+from src.services.langgraph.multi_agent_doc_processing.utils.structured_output import structured_output_kwargs
+from src.services.langgraph.multi_agent_doc_processing.agents.extract_agent.extract_data import parse_extraction, record_extraction
+from src.services.langgraph.multi_agent_doc_processing.logging.structured import get_logger
+
+log = get_logger(__name__, stage="repair")
+
+FIELD_HINTS = {
+    "amount": "a monetary amount, e.g. 1234.56",
+    "value": "a monetary amount, e.g. 1234.56",
+    "date": "a date, e.g. 2024-06-01",
+    "effective_date": "a date, e.g. 2024-06-01",
+    "invoice_number": "the invoice identifier, at least 3 characters",
+    "contract_number": "the contract identifier, at least 3 characters",
+}
+
+def repair_fields(state: DocumentState, llm, repair: RepairConfig, escalation_llm=None,
+                  long_document=None, structured_output: bool = False) -> DocumentState:
+    """
+    Re-ask the LLM for only the fields that failed validation and merge the
+    answers into 'extracted_data' before the document is validated again.
+    Documents escalated by a cascade are repaired with `escalation_llm`.
+    """
+    plan = plan_repair(state, repair, long_document)
+    if plan is None:
+        return state
+    fields, prompt = plan
+    llm = repair_llm(state, llm, escalation_llm)
+    llm_kwargs = structured_output_kwargs(llm, state['document_type'], fields) if structured_output else {}
+
+    start_repair(state, repair, fields, prompt)
+    try:
+        response = llm.invoke(prompt, **llm_kwargs)
+        merge_repair(state, repair, response_text(response), fields, structured_output)
+    except Exception as e:
+        log.error("Repair error: %s", e)
+    return state
+
+
+async def arepair_fields(state: DocumentState, llm, repair: RepairConfig, escalation_llm=None,
+                         long_document=None, structured_output: bool = False) -> DocumentState:
+    """Async variant of `repair_fields` using the LLM's async API."""
+    plan = plan_repair(state, repair, long_document)
+    if plan is None:
+        return state
+    fields, prompt = plan
+    llm = repair_llm(state, llm, escalation_llm)
+    llm_kwargs = structured_output_kwargs(llm, state['document_type'], fields) if structured_output else {}
+
+    start_repair(state, repair, fields, prompt)
+    try:
+        response = await ainvoke_llm(llm, prompt, **llm_kwargs)
+        merge_repair(state, repair, response_text(response), fields, structured_output)
+    except Exception as e:
+        log.error("Repair error: %s", e)
+    return state
+
+
+def plan_repair(state: DocumentState, repair: RepairConfig, long_document=None):
+    """
+    The failing fields and the prompt for them, or None if the document should
+    not (or can no longer) be repaired: nothing failed, its classification is in
+    doubt, or the iteration count or token budget is spent.
+    """
+    if not repair.should_repair(state):
+        return None
+    fields = repair.failing_fields(state)
+    prompt = build_repair_prompt(state, fields, long_document)
+    if not repair.within_budget(state, prompt, fields):
+        return None
+    return fields, prompt
+
+
+def repair_llm(state: DocumentState, llm, escalation_llm=None):
+    if escalation_llm is not None and state.get('model_tier') == LARGE:
+        return escalation_llm
+    return llm
+
+
+def build_repair_prompt(state: DocumentState, fields: list, long_document=None) -> str:
+    """Short prompt naming each failing field, its rejected value and what a valid value looks like."""
+    doc_type = state['document_type']
+    extracted_data = state.get('extracted_data') or {}
+    lines = []
+    for field in fields:
+        previous = extracted_data.get(field, "NOT_FOUND")
+        hint = FIELD_HINTS.get(field, "a short text value")
+        if previous in ("NOT_FOUND", "", None):
+            lines.append(f"- {field}: not found before; expected {hint}")
+        else:
+            lines.append(f'- {field}: "{previous}" failed validation; expected {hint}')
+
+    content = state['document_content']
+    if long_document is not None:
+        overhead = count_tokens("\n".join(lines)) + 60
+        content = leading_text(content, long_document.max_prompt_tokens - overhead)
+
+    return f"""
+    Re-check these fields of the {doc_type}:
+    {chr(10).join(lines)}
+
+    Document:
+    {content}
+
+    Return only JSON with these keys. Use "NOT_FOUND" if a field is absent:
+    {{
+        {', '.join([f'"{field}": "value"' for field in fields])}
+    }}
+    """.strip()
+
+
+def start_repair(state: DocumentState, repair: RepairConfig, fields: list, prompt: str):
+    """Charge the attempt to the document's iteration count and token budget."""
+    tokens = repair.estimate_tokens(prompt, fields)
+    state['repair_attempts'] = state.get('repair_attempts', 0) + 1
+    state['repair_tokens'] = state.get('repair_tokens', 0) + tokens
+    state['processing_stage'] = 'repaired'
+    repair.stats.incr("attempts")
+    repair.stats.incr("fields_requested", len(fields))
+    repair.stats.incr("tokens", tokens)
+    log.info("Repair attempt %d: re-requesting %s", state['repair_attempts'], ", ".join(fields))
+
+
+def merge_repair(state: DocumentState, repair: RepairConfig, raw_output: str, fields: list,
+                 structured_output: bool = False) -> DocumentState:
+    """Merge the repaired fields, keeping earlier values the LLM could not improve on."""
+    required_fields = DOCUMENT_TYPES.get(state['document_type'], {}).get('fields', [])
+    parsed = parse_extraction(raw_output, fields, structured_output)
+    extracted_data = dict(state.get('extracted_data') or {})
+    answered = 0
+    for field in fields:
+        value = parsed.get(field, "NOT_FOUND")
+        if value not in ("NOT_FOUND", "", None):
+            extracted_data[field] = value if isinstance(value, str) else str(value)
+            answered += 1
+    repair.stats.incr("fields_answered", answered)
+
+    # Re-validation decides afresh; the classification was trusted (see RepairConfig.min_confidence)
+    state['human_review_required'] = False
+    record_extraction(state, extracted_data, required_fields)
+    state['processing_stage'] = 'repaired'
+    record_event(state, REPAIRED, lambda: f"Repaired {answered}/{len(fields)} fields")
+    return state
@@ -1,8 +1,12 @@
 import re
 import time
 from datetime import datetime
-from langchain_core.messages import AIMessage
 from src.services.langgraph.multi_agent_doc_processing.state import DocumentState, DOCUMENT_TYPES
+from src.services.langgraph.multi_agent_doc_processing.utils.audit import ROUTED, record_event
+from src.services.langgraph.multi_agent_doc_processing.utils.records import store_routing
+from src.services.langgraph.multi_agent_doc_processing.logging.structured import get_logger
+
+log = get_logger(__name__, stage="route")
 
 def route_document(state: DocumentState) -> DocumentState:
     """Route validated documents to appropriate business systems."""
@@ -10,7 +14,7 @@ def route_document(state: DocumentState) -> DocumentState:
     validation_score = state.get('validation_results', {}).get('overall_score', 0)
     extracted_data = state.get('extracted_data', {})
 
-    print(f"Routing {doc_type} to business systems...")
+    log.info("Routing %s to business systems", doc_type)
 
     try:
         config = DOCUMENT_TYPES.get(doc_type, {})
@@ -44,22 +48,19 @@ def route_document(state: DocumentState) -> DocumentState:
             'integration_status': 'success'
         }
 
-        state['routing_result'] = routing_result
+        store_routing(state, routing_result)
         state['processing_stage'] = 'routed'
         state['processing_complete'] = True
         state['next_action'] = 'complete'
 
-        print(f"   Target: {target_system}")
-        print(f"   Priority: {routing_result['routing_priority']}")
-        print(f"   Approval: {'Required' if requires_approval else 'Auto-approved'}")
-        print(f"   Reference: {routing_result['reference_id']}")
+        log.info("Routed to %s (priority %s, %s): %s", target_system, routing_result['routing_priority'],
+                 "approval required" if requires_approval else "auto-approved", routing_result['reference_id'],
+                 extra={"target_system": target_system, "reference_id": routing_result['reference_id']})
 
-        state.setdefault('messages', []).append(
-            AIMessage(content=f"Routed to {target_system} - {routing_result['reference_id']}")
-        )
+        record_event(state, ROUTED, lambda: f"Routed to {target_system} - {routing_result['reference_id']}")
 
     except Exception as e:
-        print(f"Routing error: {e}")
+        log.error("Routing error: %s", e)
         state['error_count'] += 1
         state['next_action'] = 'error_handling'
 
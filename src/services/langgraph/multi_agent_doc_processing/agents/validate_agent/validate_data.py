@@ -1,71 +1,54 @@
-import re
-from langchain_core.messages import AIMessage
-from src.services.langgraph.multi_agent_doc_processing.state import DocumentState, DOCUMENT_TYPES
+import logging
+from src.services.langgraph.multi_agent_doc_processing.state import DocumentState
+from src.services.langgraph.multi_agent_doc_processing.agents.validate_agent.validation_engine import (
+    ROUTE_SCORE,
+    check_amount,
+    check_date,
+    next_action_for,
+    validate_record,
+)
+from src.services.langgraph.multi_agent_doc_processing.utils.audit import VALIDATED, record_event
+from src.services.langgraph.multi_agent_doc_processing.utils.records import store_validation
+from src.services.langgraph.multi_agent_doc_processing.logging.structured import get_logger
+
+log = get_logger(__name__, stage="validate")
 
 def validate_data(state: DocumentState) -> DocumentState:
     """Validate extracted data quality for the given document."""
     doc_type = state['document_type']
     extracted_data = state['extracted_data']
-    required_fields = DOCUMENT_TYPES.get(doc_type, {}).get('fields', [])
 
-    print(f"Validating {doc_type} data quality...")
-
-    validation_results = {
-        'overall_score': 0.0,
-        'field_scores': {},
-        'missing_fields': [],
-        'issues': []
-    }
+    log.info("Validating %s data quality", doc_type)
 
     try:
-        field_scores = []
-
-        for field in required_fields:
-            value = extracted_data.get(field, 'NOT_FOUND')
+        validation_results = validate_record(doc_type, extracted_data)
 
-            if value == 'NOT_FOUND' or not value.strip():
-                validation_results['missing_fields'].append(field)
-                field_score = 0.0
-                print(f"   Missing: {field}")
-            else:
-                # Field-specific validation
-                if field in ['amount', 'value']:
-                    field_score = 1.0 if validate_amount(value) else 0.3
-                elif field in ['date', 'effective_date']:
-                    field_score = 1.0 if validate_date(value) else 0.4
-                elif field in ['invoice_number', 'contract_number']:
-                    field_score = 1.0 if len(value) >= 3 else 0.5
+        if log.isEnabledFor(logging.DEBUG):
+            for field, field_score in validation_results['field_scores'].items():
+                if field in validation_results['missing_fields']:
+                    log.debug("Missing: %s", field, extra={"sampled": True, "field": field})
                 else:
-                    field_score = 1.0 if 2 <= len(value) <= 200 else 0.6
-
-                status = "High" if field_score >= 0.8 else "Moderate"
-                print(f"   {status} confidence: {field}: {value} (score: {field_score:.1f})")
+                    log.debug("%s confidence: %s: %s (score: %.1f)", "High" if field_score >= 0.8 else "Moderate",
+                              field, extracted_data[field], field_score, extra={"sampled": True, "field": field})
 
-            validation_results['field_scores'][field] = field_score
-            field_scores.append(field_score)
-
-        overall_score = sum(field_scores) / len(field_scores) if field_scores else 0.0
-        validation_results['overall_score'] = overall_score
-
-        state['validation_results'] = validation_results
+        overall_score = validation_results['overall_score']
+        store_validation(state, validation_results)
         state['processing_stage'] = 'validated'
 
         # Determine next action
-        if overall_score >= 0.8:
-            state['next_action'] = 'route_document'
-            print(f"High quality ({overall_score:.1%}) → Routing")
-        elif overall_score >= 0.6:
-            state['next_action'] = 'route_document'
-            print(f"Moderate quality ({overall_score:.1%}) → Routing with caution")
+        state['next_action'] = next_action_for(overall_score)
+        if overall_score >= ROUTE_SCORE:
+            log.info("High quality (%.1f%%) -> routing", overall_score * 100)
+        elif state['next_action'] == 'route_document':
+            log.info("Moderate quality (%.1f%%) -> routing with caution", overall_score * 100)
         else:
             state['human_review_required'] = True
-            state['next_action'] = 'human_review'
-            print(f"Low quality ({overall_score:.1%}) → Human review")
+            log.info("Low quality (%.1f%%) -> human review", overall_score * 100)
 
-        state.setdefault('messages', []).append(AIMessage(content=f"Validation: {overall_score:.1%} quality"))
+        record_event(state, VALIDATED, lambda: f"Validation: {overall_score:.1%} quality")
 
     except Exception as e:
-        print(f"Validation error: {e}")
+        log.error("Validation error: %s", e)
         state['error_count'] += 1
         state['next_action'] = 'error_handling'
 
@@ -73,19 +56,8 @@ def validate_data(state: DocumentState) -> DocumentState:
 
 def validate_amount(amount_str: str) -> bool:
     """Validate monetary amount."""
-    try:
-        cleaned = re.sub(r'[$,]', '', amount_str.strip())
-        amount = float(cleaned)
-        return 0.01 <= amount <= 1000000
-    except Exception:
-        return False
+    return check_amount(amount_str)
 
 def validate_date(date_str: str) -> bool:
     """Validate date format."""
-    patterns = [
-        r'\d{1,2}/\d{1,2}/\d{2,4}',
-        r'\d{1,2}-\d{1,2}-\d{2,4}',
-        r'\d{4}-\d{1,2}-\d{1,2}',
-        r'\w+ \d{1,2}, \d{4}'
-    ]
-    return any(re.match(pattern, date_str.strip()) for pattern in patterns)
+    return check_date(date_str)
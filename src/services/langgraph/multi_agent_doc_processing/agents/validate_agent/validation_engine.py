@@ -0,0 +1,213 @@
+# =============================================================================
+"""
+validation_engine.py
+Declarative field validation, compiled once per document type.
+
+Each field maps to a rule kind (amount, date, identifier or text) with a check
+and the score a value gets when the check fails. `compile_schema` turns a
+document type's fields from DOCUMENT_TYPES into a cached `ValidationSchema`;
+the regexes behind the checks are compiled at import time.
+
+`validate_record` scores one `extracted_data` dict (what `validate_data` uses).
+`validate_batch` scores many records of one type column by column: each field
+is dictionary-encoded, every distinct value is checked once, and the scores and
+missing masks are gathered back into (records x fields) NumPy arrays. Extracted
+histories repeat vendors, dates and amounts heavily, so re-validating them costs
+roughly one check per distinct value per field.
+"""
+# =============================================================================
+
+import functools
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from src.services.langgraph.multi_agent_doc_processing.state import DOCUMENT_TYPES
+
+NOT_FOUND = "NOT_FOUND"
+
+# Routing thresholds on the overall score
+ROUTE_SCORE = 0.8
+CAUTION_SCORE = 0.6
+
+_CURRENCY = re.compile(r"[$,]")
+_DATE = re.compile(
+    r"\d{1,2}/\d{1,2}/\d{2,4}"
+    r"|\d{1,2}-\d{1,2}-\d{2,4}"
+    r"|\d{4}-\d{1,2}-\d{1,2}"
+    r"|\w+ \d{1,2}, \d{4}"
+)
+
+
+def check_amount(value: Any) -> bool:
+    """Monetary amount between 0.01 and 1,000,000 ("$" and "," ignored; numbers accepted)."""
+    try:
+        amount = float(_CURRENCY.sub("", str(value).strip()))
+    except ValueError:
+        return False
+    return 0.01 <= amount <= 1000000
+
+
+def check_date(value: Any) -> bool:
+    """Starts with a numeric (d/m/y, d-m-y, y-m-d) or "Month d, yyyy" date."""
+    return _DATE.match(str(value).strip()) is not None
+
+
+@dataclass(frozen=True)
+class RuleKind:
+    """A field check and the score of a value that fails it (passing values score 1.0)."""
+    name: str
+    fail_score: float
+    check: Optional[Callable[[str], bool]] = None
+    min_length: int = 0
+    max_length: Optional[int] = None
+
+    def passes(self, value: str) -> bool:
+        if self.check is not None:
+            return self.check(value)
+        return len(value) >= self.min_length and (self.max_length is None or len(value) <= self.max_length)
+
+
+AMOUNT = RuleKind("amount", 0.3, check=check_amount)
+DATE = RuleKind("date", 0.4, check=check_date)
+IDENTIFIER = RuleKind("identifier", 0.5, min_length=3)
+TEXT = RuleKind("text", 0.6, min_length=2, max_length=200)
+
+FIELD_KINDS: Dict[str, RuleKind] = {
+    "amount": AMOUNT,
+    "value": AMOUNT,
+    "date": DATE,
+    "effective_date": DATE,
+    "invoice_number": IDENTIFIER,
+    "contract_number": IDENTIFIER,
+}
+
+
+@dataclass(frozen=True)
+class ValidationSchema:
+    """The ordered fields of a document type and the rule each one is checked with."""
+    doc_type: str
+    fields: Tuple[str, ...]
+    rules: Tuple[RuleKind, ...]
+
+
+@functools.lru_cache(maxsize=None)
+def compile_schema(doc_type: str) -> ValidationSchema:
+    """Schema for `doc_type` (no fields for unknown types)."""
+    fields = tuple(DOCUMENT_TYPES.get(doc_type, {}).get("fields", []))
+    return ValidationSchema(doc_type, fields, tuple(FIELD_KINDS.get(field, TEXT) for field in fields))
+
+
+def is_missing(value: Any) -> bool:
+    return value is None or value == NOT_FOUND or not str(value).strip()
+
+
+def next_action_for(overall_score: float) -> str:
+    return "route_document" if overall_score >= CAUTION_SCORE else "human_review"
+
+
+def validate_record(doc_type: str, extracted_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Validation results (overall_score, field_scores, missing_fields, issues) for one record."""
+    schema = compile_schema(doc_type)
+    results = {"overall_score": 0.0, "field_scores": {}, "missing_fields": [], "issues": []}
+
+    for field, rule in zip(schema.fields, schema.rules):
+        value = extracted_data.get(field, NOT_FOUND)
+        if is_missing(value):
+            results["missing_fields"].append(field)
+            score = 0.0
+        else:
+            score = 1.0 if rule.passes(str(value)) else rule.fail_score
+        results["field_scores"][field] = score
+
+    scores = results["field_scores"].values()
+    results["overall_score"] = sum(scores) / len(scores) if scores else 0.0
+    return results
+
+
+class BatchValidation:
+    """
+    Columnar results of `validate_batch`: `scores` and `missing` are
+    (records x fields) arrays in `fields` order, `overall` has one score per record.
+    """
+
+    def __init__(self, fields: Tuple[str, ...], scores: np.ndarray, missing: np.ndarray):
+        self.fields = fields
+        self.scores = scores
+        self.missing = missing
+        self.overall = scores.mean(axis=1) if fields else np.zeros(len(scores))
+
+    def __len__(self) -> int:
+        return len(self.overall)
+
+    def needs_review(self) -> np.ndarray:
+        return self.overall < CAUTION_SCORE
+
+    def results(self, index: int) -> Dict[str, Any]:
+        """The `validation_results` dict of one record, as `validate_record` returns it."""
+        return {
+            "overall_score": float(self.overall[index]),
+            "field_scores": {field: float(score) for field, score in zip(self.fields, self.scores[index])},
+            "missing_fields": [field for field, missing in zip(self.fields, self.missing[index]) if missing],
+            "issues": [],
+        }
+
+    def to_results(self) -> List[Dict[str, Any]]:
+        return [self.results(index) for index in range(len(self))]
+
+
+def _encode_column(records: List[Dict[str, Any]], field: str) -> Tuple[List[Any], np.ndarray]:
+    """Dictionary-encode one field: its distinct values and each record's code into them."""
+    codes: Dict[Any, int] = {}
+    column = (record.get(field, NOT_FOUND) for record in records)
+    inverse = np.fromiter(
+        (codes.setdefault(value if value is None or isinstance(value, str) else str(value), len(codes))
+         for value in column),
+        dtype=np.intp, count=len(records),
+    )
+    return list(codes), inverse
+
+
+def validate_batch(doc_type: str, records: Iterable[Dict[str, Any]]) -> BatchValidation:
+    """
+    Validate many `extracted_data` records of one document type at once. Each
+    column is dictionary-encoded, its distinct values scored once, and the
+    scores gathered back to the records with NumPy indexing.
+    """
+    schema = compile_schema(doc_type)
+    records = list(records)
+    scores = np.zeros((len(records), len(schema.fields)))
+    missing = np.zeros((len(records), len(schema.fields)), dtype=bool)
+
+    for column_index, (field, rule) in enumerate(zip(schema.fields, schema.rules)):
+        values, inverse = _encode_column(records, field)
+        absent = np.fromiter((is_missing(value) for value in values), dtype=bool, count=len(values))
+        value_scores = np.fromiter(
+            (0.0 if gone else 1.0 if rule.passes(str(value)) else rule.fail_score
+             for value, gone in zip(values, absent)),
+            dtype=float, count=len(values),
+        )
+        scores[:, column_index] = value_scores[inverse]
+        missing[:, column_index] = absent[inverse]
+
+    return BatchValidation(schema.fields, scores, missing)
+
+
+def revalidate(documents: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Re-validate stored documents (each with 'document_type' and 'extracted_data'),
+    batching by type. Returns each document's new `validation_results`, in input order.
+    """
+    documents = list(documents)
+    by_type: Dict[str, List[int]] = {}
+    for index, document in enumerate(documents):
+        by_type.setdefault(document.get("document_type", ""), []).append(index)
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(documents)
+    for doc_type, indices in by_type.items():
+        batch = validate_batch(doc_type, (documents[i].get("extracted_data") or {} for i in indices))
+        for position, index in enumerate(indices):
+            results[index] = batch.results(position)
+    return results
@@ -0,0 +1,231 @@
+# =============================================================================
+"""
+structured.py
+Structured, queue-backed logging for the document processing agents.
+
+Agents log through `get_logger(__name__, stage=...)` with %-style arguments,
+so disabled levels cost one level check and enabled lines are formatted later:
+  - the request thread only runs the filters (level, sampling, correlation)
+    and puts the record on an in-memory queue;
+  - a QueueListener thread formats each record as one JSON line (timestamp,
+    level, logger, message, document_id, stage, extra fields) and writes it to
+    stdout, where Lambda ships it to CloudWatch.
+
+`log_context(document_id=...)` binds correlation fields for everything logged
+inside it (contextvars, so it follows threads started by LangGraph and asyncio
+tasks). Per-field lines are logged at DEBUG with `extra={"sampled": True}` and
+kept for a deterministic fraction of documents (LOG_FIELD_SAMPLE_RATE).
+
+Nothing is configured on import: every entry point (the Lambda handler, demo
+and benchmark scripts) calls `configure_logging()`; otherwise the package's
+records go to the root logger, which drops INFO by default. The handler also
+calls `flush_logs()` before returning a response.
+"""
+# =============================================================================
+
+import atexit
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import zlib
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+PACKAGE_LOGGER = "src.services.langgraph.multi_agent_doc_processing"
+
+DEFAULT_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+DEFAULT_SAMPLE_RATE = float(os.getenv("LOG_FIELD_SAMPLE_RATE", "1.0"))
+DEFAULT_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+_document_id = contextvars.ContextVar("document_id", default=None)
+_stage = contextvars.ContextVar("stage", default=None)
+
+# Attributes every LogRecord has; anything else on a record is an `extra` field
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "sampled"}
+
+
+@contextlib.contextmanager
+def log_context(document_id: Optional[str] = None, stage: Optional[str] = None):
+    """Bind correlation fields to every record logged inside the block."""
+    tokens = []
+    if document_id is not None:
+        tokens.append((_document_id, _document_id.set(document_id)))
+    if stage is not None:
+        tokens.append((_stage, _stage.set(stage)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class StageLogger(logging.LoggerAdapter):
+    """Logger that tags its records with an agent stage and keeps per-call `extra` fields."""
+
+    def process(self, msg, kwargs):
+        kwargs["extra"] = {**self.extra, **kwargs.get("extra", {})}
+        return msg, kwargs
+
+
+def get_logger(name: str, stage: Optional[str] = None) -> StageLogger:
+    return StageLogger(logging.getLogger(name), {"stage": stage} if stage else {})
+
+
+class ContextFilter(logging.Filter):
+    """Copy the bound correlation fields onto the record (on the emitting thread, where they are bound)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "document_id", None) is None:
+            record.document_id = _document_id.get()
+        if getattr(record, "stage", None) is None:
+            record.stage = _stage.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep `sampled` records for a fraction of documents. The decision hashes the
+    document_id, so a kept document has all its field lines; records without
+    one are sampled at random.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "sampled", False) or self.rate >= 1.0:
+            return True
+        if self.rate <= 0.0:
+            return False
+        document_id = getattr(record, "document_id", None)
+        if document_id is None:
+            return random.random() < self.rate
+        return zlib.crc32(str(document_id).encode("utf-8")) % 10_000 < self.rate * 10_000
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "document_id": getattr(record, "document_id", None),
+            "stage": getattr(record, "stage", None),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class StdoutHandler(logging.StreamHandler):
+    """StreamHandler bound to the current `sys.stdout` (which test runners may swap)."""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class BufferedQueueHandler(QueueHandler):
+    """
+    Enqueue records without formatting them; drop (and count) records when
+    the queue is full instead of blocking the request.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting is deferred to the listener; only render tracebacks, which reference live frames
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_lock = threading.Lock()
+_listener: Optional[QueueListener] = None
+_handler: Optional[BufferedQueueHandler] = None
+
+
+def configure_logging(level=None, sample_rate: Optional[float] = None, queue_size: Optional[int] = None,
+                      handler: Optional[logging.Handler] = None) -> BufferedQueueHandler:
+    """
+    Route the package's loggers through a queue to a background JSON writer
+    (stdout unless `handler` is given). Reconfiguring replaces the previous
+    queue and listener after draining it.
+    """
+    global _listener, _handler
+    level = level or DEFAULT_LEVEL
+    sample_rate = DEFAULT_SAMPLE_RATE if sample_rate is None else sample_rate
+    if handler is None:
+        handler = StdoutHandler()
+    handler.setFormatter(JSONFormatter())
+
+    queue_handler = BufferedQueueHandler(queue.Queue(maxsize=queue_size or DEFAULT_QUEUE_SIZE))
+    queue_handler.addFilter(ContextFilter())
+    queue_handler.addFilter(SamplingFilter(sample_rate))
+
+    with _lock:
+        shutdown_logging()
+        package_logger = logging.getLogger(PACKAGE_LOGGER)
+        package_logger.setLevel(level)
+        package_logger.addHandler(queue_handler)
+        package_logger.propagate = False
+        _listener = QueueListener(queue_handler.queue, handler)
+        _listener.start()
+        _handler = queue_handler
+    return queue_handler
+
+
+def flush_logs(timeout: float = 1.0) -> bool:
+    """Wait (up to `timeout`) until the listener has written every queued record."""
+    handler = _handler
+    if handler is None:
+        return True
+    deadline = time.monotonic() + timeout
+    while handler.queue.unfinished_tasks:
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.001)
+    return True
+
+
+def shutdown_logging():
+    """Drain and stop the listener and detach the queue handler."""
+    global _listener, _handler
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _handler is not None:
+        logging.getLogger(PACKAGE_LOGGER).removeHandler(_handler)
+        _handler = None
+
+
+atexit.register(shutdown_logging)
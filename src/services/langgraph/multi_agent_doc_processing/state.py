@@ -7,7 +7,7 @@ for the LangGraph Document Processing Pipeline Project.
 # =============================================================================
 
 from typing_extensions import TypedDict
-from typing import Dict, Any, List 
+from typing import Dict, Any, List, Mapping, Tuple
 
 class DocumentState(TypedDict):
 
@@ -19,8 +19,10 @@ class DocumentState(TypedDict):
 
     # Processing results
     confidence_score: float
-    extracted_data: Dict[str, Any]
-    validation_results: Dict[str, Any]
+    # Dicts, or slotted records from utils/records.py when compact_state is set
+    extracted_data: Mapping[str, Any]
+    validation_results: Mapping[str, Any]
+    routing_result: Mapping[str, Any]
 
     # Workflow control/status flags
     processing_stage: str
@@ -29,9 +31,23 @@ class DocumentState(TypedDict):
     human_review_required: bool
     processing_complete: bool
 
+    # Cascade mode: "small" until the document is escalated to the larger model
+    model_tier: str
+
+    # Repair loop: attempts made and estimated tokens spent re-requesting failed fields
+    repair_attempts: int
+    repair_tokens: int
+
     # Message log for Ai-humnan conversation, debugging, or audit trail
     messages: List[Any]
 
+    # Audit trail of (event code, timestamp) pairs; messages are only logged with audit_verbose
+    audit_trail: List[Tuple[str, float]]
+    audit_verbose: bool
+
+    # Store extraction/validation/routing results as slotted records (see utils/records.py)
+    compact_state: bool
+
 DOCUMENT_TYPES: Dict[str, Dict[str, Any]] = {
     "invoice": {
         "fields": ["invoice_number", "date", "amount", "vendor"],
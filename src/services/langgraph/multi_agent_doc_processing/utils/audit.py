@@ -0,0 +1,45 @@
+# =============================================================================
+"""
+audit.py
+Audit trail of workflow events.
+
+Every node records what it did with `record_event`: an interned event code and
+a timestamp are appended to the state's `audit_trail`, which costs a small
+tuple per event and shares one string object per code across all documents.
+With `audit_verbose` (the default, for compatibility) the node's human-readable
+message is also appended to `messages` as an `AIMessage`; with it off, message
+objects are never built, which keeps thousands of in-flight states small.
+"""
+# =============================================================================
+
+import sys
+import time
+from typing import Callable, Union
+
+from langchain_core.messages import AIMessage
+
+CLASSIFIED = sys.intern("classified")
+CLASSIFIED_NEAR_DUPLICATE = sys.intern("classified_near_duplicate")
+CLASSIFIED_PRE_CLASSIFIER = sys.intern("classified_pre_classifier")
+CLASSIFICATION_ERROR = sys.intern("classification_error")
+EXTRACTED = sys.intern("extracted")
+VALIDATED = sys.intern("validated")
+ESCALATED = sys.intern("escalated")
+REPAIRED = sys.intern("repaired")
+ROUTED = sys.intern("routed")
+
+
+def audit_verbose(state) -> bool:
+    return bool(state.get("audit_verbose", True))
+
+
+def record_event(state, code: str, message: Union[str, Callable[[], str]]) -> None:
+    """
+    Append (code, timestamp) to the audit trail and, with verbose auditing, the
+    message to `messages`. `message` may be a callable so compact mode never
+    formats it.
+    """
+    state.setdefault("audit_trail", []).append((sys.intern(code), time.time()))
+    if audit_verbose(state):
+        text = message() if callable(message) else message
+        state.setdefault("messages", []).append(AIMessage(content=text))
@@ -0,0 +1,178 @@
+# =============================================================================
+"""
+cascade.py
+Settings, metering and statistics for the small-model-first cascade.
+
+Every document is classified and extracted by the small model. After
+validation, documents whose `overall_score` or classifier confidence fall below
+the thresholds are escalated once to the larger model; the rest are accepted at
+the small tier. Both models are wrapped in a `TierMeter` that records call
+latency and estimated tokens per tier, from which `CascadeStats.report()`
+estimates the latency and cost saved by the documents the small tier handled.
+"""
+# =============================================================================
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from src.services.langgraph.multi_agent_doc_processing.utils.chunking import count_tokens
+from src.services.langgraph.multi_agent_doc_processing.utils.llm import ainvoke_llm, response_text
+
+SMALL, LARGE = "small", "large"
+
+
+class CascadeStats:
+    """Thread-safe per-tier counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.documents = 0
+        self.accepted_small = 0
+        self.escalated = 0
+        self.accepted_large = 0
+        self.review_after_escalation = 0
+        self.calls = {SMALL: 0, LARGE: 0}
+        self.seconds = {SMALL: 0.0, LARGE: 0.0}
+        self.tokens = {SMALL: 0, LARGE: 0}
+
+    def incr(self, counter: str, amount: int = 1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def record_call(self, tier: str, seconds: float, tokens: int):
+        with self._lock:
+            self.calls[tier] += 1
+            self.seconds[tier] += seconds
+            self.tokens[tier] += tokens
+
+    def report(self, small_cost_per_1k: Optional[float] = None,
+               large_cost_per_1k: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Hit rates per tier plus the estimated savings of the small-tier hits:
+        each one avoided the larger model's average per-escalation latency (and
+        cost, when prices are given) and paid the small model's per-document average.
+        """
+        with self._lock:
+            documents, escalated = self.documents, self.escalated
+            report = {
+                "documents": documents,
+                "small_tier_hit_rate": self.accepted_small / documents if documents else 0.0,
+                "escalation_rate": escalated / documents if documents else 0.0,
+                "large_tier_hit_rate": self.accepted_large / escalated if escalated else 0.0,
+                "review_after_escalation": self.review_after_escalation,
+                "tiers": {
+                    tier: {"calls": self.calls[tier], "seconds": self.seconds[tier], "tokens": self.tokens[tier]}
+                    for tier in (SMALL, LARGE)
+                },
+                "latency_saved_seconds": None,
+                "cost_saved": None,
+            }
+            if not documents or not escalated:
+                return report
+
+            small_seconds = self.seconds[SMALL] / documents
+            large_seconds = self.seconds[LARGE] / escalated
+            report["latency_saved_seconds"] = self.accepted_small * (large_seconds - small_seconds)
+
+            if small_cost_per_1k is not None and large_cost_per_1k is not None:
+                small_cost = self.tokens[SMALL] / documents / 1000 * small_cost_per_1k
+                large_cost = self.tokens[LARGE] / escalated / 1000 * large_cost_per_1k
+                report["cost_saved"] = self.accepted_small * (large_cost - small_cost)
+            return report
+
+
+class TierMeter:
+    """Wraps a tier's LLM and records latency and estimated tokens of each call."""
+
+    def __init__(self, llm, tier: str, stats: CascadeStats):
+        self.llm = llm
+        self.tier = tier
+        self.stats = stats
+
+    def __getattr__(self, name):
+        if name == "llm":
+            raise AttributeError(name)
+        return getattr(self.llm, name)
+
+    def _record(self, prompt, text: str, started: float):
+        tokens = count_tokens(str(prompt)) + count_tokens(text)
+        self.stats.record_call(self.tier, time.perf_counter() - started, tokens)
+
+    def invoke(self, prompt, *args, **kwargs):
+        started = time.perf_counter()
+        response = self.llm.invoke(prompt, *args, **kwargs)
+        self._record(prompt, response_text(response), started)
+        return response
+
+    async def ainvoke(self, prompt, *args, **kwargs):
+        started = time.perf_counter()
+        if args or kwargs:
+            response = await self.llm.ainvoke(prompt, *args, **kwargs)
+        else:
+            response = await ainvoke_llm(self.llm, prompt)
+        self._record(prompt, response_text(response), started)
+        return response
+
+    # Only offered when the wrapped LLM streams, so `hasattr(llm, "stream")` checks stay truthful
+    @property
+    def stream(self):
+        if not hasattr(self.llm, "stream"):
+            raise AttributeError("stream")
+        return self._stream
+
+    @property
+    def astream(self):
+        if not hasattr(self.llm, "astream"):
+            raise AttributeError("astream")
+        return self._astream
+
+    def _stream(self, prompt, *args, **kwargs):
+        started, text = time.perf_counter(), []
+        try:
+            for chunk in self.llm.stream(prompt, *args, **kwargs):
+                text.append(response_text(chunk))
+                yield chunk
+        finally:
+            # Also runs when the consumer stops early (the extraction cancels once all fields arrived)
+            self._record(prompt, "".join(text), started)
+
+    async def _astream(self, prompt, *args, **kwargs):
+        started, text = time.perf_counter(), []
+        try:
+            async for chunk in self.llm.astream(prompt, *args, **kwargs):
+                text.append(response_text(chunk))
+                yield chunk
+        finally:
+            self._record(prompt, "".join(text), started)
+
+
+class CascadeConfig:
+    """
+    Settings for cascade mode.
+
+    Args:
+        escalation_llm: The larger model documents are escalated to.
+        min_score: Documents whose validation `overall_score` is below this escalate.
+        min_confidence: Documents whose classifier confidence is below this escalate
+            and are re-classified by the larger model before re-extraction.
+        small_cost_per_1k_tokens / large_cost_per_1k_tokens: Optional prices used to
+            report the cost saved.
+    """
+
+    def __init__(self, escalation_llm, min_score: float = 0.8, min_confidence: float = 0.8,
+                 small_cost_per_1k_tokens: Optional[float] = None,
+                 large_cost_per_1k_tokens: Optional[float] = None):
+        self.escalation_llm = escalation_llm
+        self.min_score = min_score
+        self.min_confidence = min_confidence
+        self.small_cost_per_1k_tokens = small_cost_per_1k_tokens
+        self.large_cost_per_1k_tokens = large_cost_per_1k_tokens
+        self.stats = CascadeStats()
+
+    def should_escalate(self, state) -> bool:
+        score = (state.get("validation_results") or {}).get("overall_score", 0.0)
+        return score < self.min_score or state.get("confidence_score", 0.0) < self.min_confidence
+
+    def report(self) -> Dict[str, Any]:
+        return self.stats.report(self.small_cost_per_1k_tokens, self.large_cost_per_1k_tokens)
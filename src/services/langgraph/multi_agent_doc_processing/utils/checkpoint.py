@@ -0,0 +1,415 @@
+# =============================================================================
+"""
+checkpoint.py
+Persistent LangGraph checkpointing on a simple key-value store, so documents
+sent to human review (or interrupted by an error) resume where they stopped
+instead of repeating the classify/extract LLM calls.
+
+`KVCheckpointSaver` needs only get/set/delete of string values, which maps onto:
+  - SQLiteCheckpointStore: a local file, e.g. under /tmp in a Lambda container
+  - DynamoDBCheckpointStore: the session_id-keyed table from infra/terraform/modules/dynamodb
+
+Each checkpoint is one item ("checkpoint#<thread>#<ns>#<id>") holding the
+serialized checkpoint, its metadata and its parent's id; a per-thread pointer
+item names the latest checkpoint, and history is walked through the parent
+links, so no scans or secondary indexes are needed. Pending writes of a
+checkpoint are kept in one "writes#..." item. Metadata is stored without its
+informational "writes" copy of each node's output, and values larger than
+BLOB_THRESHOLD bytes (the document content, mostly) are stored once per thread
+as content-addressed "blob#..." items split into BLOB_PART_SIZE parts, so every
+item stays under DynamoDB's 400KB limit and checkpoints only hold a reference.
+
+Use the document id as the thread id. `invoke_checkpointed` re-enters an
+unfinished run at the node that failed and starts a finished one over with
+fresh results, and `resume_with_corrections` applies a reviewer's field
+corrections and continues at validation.
+"""
+# =============================================================================
+
+import base64
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+from src.services.langgraph.multi_agent_doc_processing.utils.cascade import SMALL
+
+DEFAULT_SQLITE_PATH = os.getenv("CHECKPOINT_PATH", "/tmp/checkpoints.sqlite3")
+DEFAULT_TTL_SECONDS = float(os.getenv("CHECKPOINT_TTL_SECONDS", str(14 * 86400)))
+BLOB_THRESHOLD = int(os.getenv("CHECKPOINT_BLOB_THRESHOLD", str(16 * 1024)))
+BLOB_PART_SIZE = 256 * 1024
+
+# Results a finished run leaves in its thread; a new run of the document starts from these
+RESULT_DEFAULTS: Dict[str, Any] = {
+    "document_type": "generic",
+    "confidence_score": 0.0,
+    "extracted_data": {},
+    "validation_results": {},
+    "routing_result": {},
+    "processing_stage": "received",
+    "next_action": "",
+    "error_count": 0,
+    "human_review_required": False,
+    "processing_complete": False,
+    "model_tier": SMALL,
+    "repair_attempts": 0,
+    "repair_tokens": 0,
+    "messages": [],
+    "audit_trail": [],
+}
+
+
+class SQLiteCheckpointStore:
+    """
+    Checkpoint items in a local SQLite file, expiring after `ttl` seconds like the
+    DynamoDB store's. Every write deletes the expired items, so the file in the
+    container's limited /tmp only holds the threads of the last `ttl` seconds.
+    """
+
+    def __init__(self, path: str = DEFAULT_SQLITE_PATH, ttl: Optional[float] = DEFAULT_TTL_SECONDS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoints (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(checkpoints)")}
+            if "expires_at" not in columns:
+                # Files written before items expired
+                self._conn.execute("ALTER TABLE checkpoints ADD COLUMN expires_at REAL")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS checkpoints_expires_at ON checkpoints (expires_at)")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0]
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM checkpoints WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at <= time.time():
+            return None
+        return value
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (key, value, expires_at) VALUES (?, ?, ?)", (key, value, expires_at)
+            )
+            self._conn.execute("DELETE FROM checkpoints WHERE expires_at <= ?", (now,))
+
+    def delete(self, key: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM checkpoints WHERE key = ?", (key,))
+
+
+class DynamoDBCheckpointStore:
+    """
+    Checkpoint items on a DynamoDB table keyed by `session_id`, expiring after `ttl` seconds.
+    `table` is a boto3 Table resource (or anything with the same get_item/put_item/delete_item calls).
+    """
+
+    def __init__(self, table, ttl: Optional[float] = DEFAULT_TTL_SECONDS):
+        self.table = table
+        self.ttl = ttl
+
+    def get(self, key: str) -> Optional[str]:
+        item = self.table.get_item(Key={"session_id": key}).get("Item")
+        if not item:
+            return None
+        expires_at = item.get("expires_at")
+        if expires_at is not None and float(expires_at) <= time.time():
+            return None
+        return item.get("value")
+
+    def set(self, key: str, value: str):
+        now = int(time.time())
+        item = {"session_id": key, "timestamp": now, "value": value}
+        if self.ttl:
+            item["expires_at"] = int(now + self.ttl)
+        self.table.put_item(Item=item)
+
+    def delete(self, key: str):
+        self.table.delete_item(Key={"session_id": key})
+
+
+def _thread_ids(config: RunnableConfig) -> Tuple[str, str]:
+    configurable = config["configurable"]
+    return str(configurable["thread_id"]), configurable.get("checkpoint_ns", "")
+
+
+def _config(thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> RunnableConfig:
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}}
+
+
+class KVCheckpointSaver(BaseCheckpointSaver):
+    """LangGraph checkpointer on any store with get/set/delete of strings."""
+
+    def __init__(self, store, *, serde=None):
+        super().__init__(serde=serde)
+        self.store = store
+        self._lock = threading.Lock()
+        # Blob items this saver has written; later checkpoints of the thread only reference them
+        self._written_blobs = set()
+
+    # -- item encoding ----------------------------------------------------
+
+    def _dump(self, value: Any, thread_id: str) -> Any:
+        """[type, base64 data], or a blob reference when the data is larger than BLOB_THRESHOLD."""
+        type_, data = self.serde.dumps_typed(value)
+        encoded = base64.b64encode(data).decode("ascii")
+        if len(encoded) <= BLOB_THRESHOLD:
+            return [type_, encoded]
+        key = f"blob#{thread_id}#{hashlib.sha256(data).hexdigest()}"
+        parts = [encoded[i:i + BLOB_PART_SIZE] for i in range(0, len(encoded), BLOB_PART_SIZE)]
+        if key not in self._written_blobs:
+            for index, part in enumerate(parts):
+                self.store.set(f"{key}#{index}", part)
+            self._written_blobs.add(key)
+        return {"blob": key, "type": type_, "parts": len(parts)}
+
+    def _load(self, dumped: Any) -> Any:
+        if isinstance(dumped, dict):
+            encoded = "".join(self.store.get(f"{dumped['blob']}#{index}") or "" for index in range(dumped["parts"]))
+            return self.serde.loads_typed((dumped["type"], base64.b64decode(encoded)))
+        return self.serde.loads_typed((dumped[0], base64.b64decode(dumped[1])))
+
+    def _dump_checkpoint(self, checkpoint: Checkpoint, thread_id: str) -> Dict[str, Any]:
+        # Channel values are dumped one by one, so a large one becomes a shared blob on its own
+        channel_values = checkpoint.get("channel_values", {})
+        return {
+            "checkpoint": self._dump({**checkpoint, "channel_values": {}}, thread_id),
+            "channel_values": {channel: self._dump(value, thread_id) for channel, value in channel_values.items()},
+        }
+
+    def _load_checkpoint(self, item: Dict[str, Any]) -> Checkpoint:
+        checkpoint = self._load(item["checkpoint"])
+        for channel, value in item.get("channel_values", {}).items():
+            checkpoint["channel_values"][channel] = self._load(value)
+        return checkpoint
+
+    @staticmethod
+    def _trim_metadata(metadata: CheckpointMetadata) -> CheckpointMetadata:
+        # "writes" repeats each node's whole output (document content included) and is never read back
+        return {key: value for key, value in metadata.items() if key != "writes"}
+
+    def _delete_blobs(self, dumped_values, deleted: set):
+        for dumped in dumped_values:
+            if isinstance(dumped, dict) and dumped["blob"] not in deleted:
+                deleted.add(dumped["blob"])
+                self._written_blobs.discard(dumped["blob"])
+                for index in range(dumped["parts"]):
+                    self.store.delete(f"{dumped['blob']}#{index}")
+
+    @staticmethod
+    def _latest_key(thread_id: str, checkpoint_ns: str) -> str:
+        return f"checkpoint#{thread_id}#{checkpoint_ns}"
+
+    @staticmethod
+    def _checkpoint_key(thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> str:
+        return f"checkpoint#{thread_id}#{checkpoint_ns}#{checkpoint_id}"
+
+    @staticmethod
+    def _writes_key(thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> str:
+        return f"writes#{thread_id}#{checkpoint_ns}#{checkpoint_id}"
+
+    def _read_json(self, key: str) -> Optional[Any]:
+        value = self.store.get(key)
+        return json.loads(value) if value else None
+
+    def _tuple(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str,
+               item: Dict[str, Any]) -> CheckpointTuple:
+        writes = self._read_json(self._writes_key(thread_id, checkpoint_ns, checkpoint_id)) or []
+        parent = item.get("parent")
+        return CheckpointTuple(
+            config=_config(thread_id, checkpoint_ns, checkpoint_id),
+            checkpoint=self._load_checkpoint(item),
+            metadata=self._load(item["metadata"]),
+            parent_config=_config(thread_id, checkpoint_ns, parent) if parent else None,
+            pending_writes=[(task_id, channel, self._load(value)) for task_id, channel, value, _, _ in writes],
+        )
+
+    # -- BaseCheckpointSaver ------------------------------------------------
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id, checkpoint_ns = _thread_ids(config)
+        checkpoint_id = get_checkpoint_id(config) or self.store.get(self._latest_key(thread_id, checkpoint_ns))
+        if not checkpoint_id:
+            return None
+        item = self._read_json(self._checkpoint_key(thread_id, checkpoint_ns, checkpoint_id))
+        return self._tuple(thread_id, checkpoint_ns, checkpoint_id, item) if item else None
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        """Checkpoints of one thread, newest first (the key-value layout cannot list across threads)."""
+        if config is None:
+            raise ValueError("KVCheckpointSaver.list needs a config with a thread_id")
+        thread_id, checkpoint_ns = _thread_ids(config)
+        checkpoint_id = get_checkpoint_id(config) or self.store.get(self._latest_key(thread_id, checkpoint_ns))
+        before_id = get_checkpoint_id(before) if before else None
+
+        while checkpoint_id and (limit is None or limit > 0):
+            item = self._read_json(self._checkpoint_key(thread_id, checkpoint_ns, checkpoint_id))
+            if item is None:
+                return
+            checkpoint_tuple = self._tuple(thread_id, checkpoint_ns, checkpoint_id, item)
+            matches = not filter or all(checkpoint_tuple.metadata.get(k) == v for k, v in filter.items())
+            if matches and (before_id is None or checkpoint_id < before_id):
+                yield checkpoint_tuple
+                if limit is not None:
+                    limit -= 1
+            if get_checkpoint_id(config):
+                return
+            checkpoint_id = item.get("parent")
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id, checkpoint_ns = _thread_ids(config)
+        item = {
+            **self._dump_checkpoint(checkpoint, thread_id),
+            "metadata": self._dump(self._trim_metadata(get_checkpoint_metadata(config, metadata)), thread_id),
+            "parent": config["configurable"].get("checkpoint_id"),
+        }
+        self.store.set(self._checkpoint_key(thread_id, checkpoint_ns, checkpoint["id"]), json.dumps(item))
+        self.store.set(self._latest_key(thread_id, checkpoint_ns), checkpoint["id"])
+        return _config(thread_id, checkpoint_ns, checkpoint["id"])
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        thread_id, checkpoint_ns = _thread_ids(config)
+        key = self._writes_key(thread_id, checkpoint_ns, config["configurable"]["checkpoint_id"])
+        with self._lock:
+            stored = self._read_json(key) or []
+            present = {(entry[0], entry[4]) for entry in stored}
+            for idx, (channel, value) in enumerate(writes):
+                write_idx = WRITES_IDX_MAP.get(channel, idx)
+                if write_idx >= 0 and (task_id, write_idx) in present:
+                    continue
+                stored = [entry for entry in stored if (entry[0], entry[4]) != (task_id, write_idx)]
+                stored.append([task_id, channel, self._dump(value, thread_id), task_path, write_idx])
+            self.store.set(key, json.dumps(stored))
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Delete the thread's checkpoints (default namespace), their writes and blobs."""
+        thread_id = str(thread_id)
+        deleted = set()
+        checkpoint_id = self.store.get(self._latest_key(thread_id, ""))
+        while checkpoint_id:
+            item = self._read_json(self._checkpoint_key(thread_id, "", checkpoint_id))
+            writes = self._read_json(self._writes_key(thread_id, "", checkpoint_id)) or []
+            if item:
+                self._delete_blobs([item["checkpoint"], item["metadata"], *item.get("channel_values", {}).values()],
+                                   deleted)
+            self._delete_blobs([entry[2] for entry in writes], deleted)
+            self.store.delete(self._checkpoint_key(thread_id, "", checkpoint_id))
+            self.store.delete(self._writes_key(thread_id, "", checkpoint_id))
+            checkpoint_id = item.get("parent") if item else None
+        self.store.delete(self._latest_key(thread_id, ""))
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self.get_tuple(config)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None, limit: Optional[int] = None):
+        for checkpoint_tuple in self.list(config, filter=filter, before=before, limit=limit):
+            yield checkpoint_tuple
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self.delete_thread(thread_id)
+
+
+def thread_config(thread_id: str) -> RunnableConfig:
+    return {"configurable": {"thread_id": str(thread_id)}}
+
+
+def fresh_input(state):
+    """
+    `state` with every result key it does not set reset to its default. Input
+    to a thread is merged into the thread's last state, so a new run on a
+    finished thread would otherwise inherit the previous run's results.
+    """
+    return {**RESULT_DEFAULTS, **state}
+
+
+def invoke_checkpointed(workflow, state, thread_id: str):
+    """
+    Run `state` under `thread_id`. If the thread's last run stopped part-way
+    (an error in a node), re-enter it at that node instead of starting over;
+    if it finished, start a new run with fresh results.
+    """
+    config = thread_config(thread_id)
+    snapshot = workflow.get_state(config)
+    if snapshot.next:
+        return workflow.invoke(None, config)
+    return workflow.invoke(fresh_input(state) if snapshot.values else state, config)
+
+
+async def ainvoke_checkpointed(workflow, state, thread_id: str):
+    """Async variant of `invoke_checkpointed`."""
+    config = thread_config(thread_id)
+    snapshot = await workflow.aget_state(config)
+    if snapshot.next:
+        return await workflow.ainvoke(None, config)
+    return await workflow.ainvoke(fresh_input(state) if snapshot.values else state, config)
+
+
+def extraction_node(workflow) -> str:
+    """The node whose output corrections replace ("extract", or "classify_extract" in fused mode)."""
+    return "extract" if "extract" in workflow.nodes else "classify_extract"
+
+
+def correction_update(workflow, thread_id: str, corrections: Dict[str, Any]) -> Tuple[RunnableConfig, Dict[str, Any]]:
+    config = thread_config(thread_id)
+    snapshot = workflow.get_state(config)
+    if not snapshot.values:
+        raise KeyError(f"No checkpoint for document {thread_id!r}")
+    extracted_data = dict(snapshot.values.get("extracted_data") or {})
+    extracted_data.update(corrections)
+    return config, {"extracted_data": extracted_data, "human_review_required": False,
+                    "processing_stage": "corrected"}
+
+
+def resume_with_corrections(workflow, thread_id: str, corrections: Dict[str, Any]):
+    """
+    Apply a reviewer's field corrections to the document's last checkpoint and
+    continue at validation (then routing); classification and extraction are
+    not re-run.
+    """
+    config, update = correction_update(workflow, thread_id, corrections)
+    workflow.update_state(config, update, as_node=extraction_node(workflow))
+    return workflow.invoke(None, config)
+
+
+async def aresume_with_corrections(workflow, thread_id: str, corrections: Dict[str, Any]):
+    """Async variant of `resume_with_corrections`."""
+    config, update = correction_update(workflow, thread_id, corrections)
+    await workflow.aupdate_state(config, update, as_node=extraction_node(workflow))
+    return await workflow.ainvoke(None, config)
@@ -0,0 +1,143 @@
+# =============================================================================
+"""
+cold_start.py
+Helpers for keeping Lambda cold starts short.
+
+`LazyModule` stands in for a module until its first attribute access, so
+provider SDKs (boto3, langchain_ollama, ...) are only imported by the code paths
+that use them. `import_time_report` runs `python -X importtime` in a fresh
+interpreter and returns the per-module cost of importing a module, so cold-start
+regressions show up as numbers rather than as p99 latency:
+
+    python -m src.services.langgraph.multi_agent_doc_processing.utils.cold_start app --top 20
+"""
+# =============================================================================
+
+import argparse
+import importlib
+import subprocess
+import sys
+import threading
+from typing import List, Optional
+
+
+class LazyModule:
+    """Proxy that imports `name` on first attribute access."""
+
+    def __init__(self, name: str):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+        self.__dict__["_lock"] = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self.__dict__["_module"] = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule {self._name!r} ({state})>"
+
+
+class ImportTiming:
+    """One line of `-X importtime` output; times are in microseconds."""
+
+    __slots__ = ("module", "self_us", "cumulative_us", "depth")
+
+    def __init__(self, module: str, self_us: int, cumulative_us: int, depth: int):
+        self.module = module
+        self.self_us = self_us
+        self.cumulative_us = cumulative_us
+        self.depth = depth
+
+    def as_dict(self):
+        return {
+            "module": self.module,
+            "self_ms": self.self_us / 1000,
+            "cumulative_ms": self.cumulative_us / 1000,
+            "depth": self.depth,
+        }
+
+
+def parse_importtime(output: str) -> List[ImportTiming]:
+    """Parse the stderr of `python -X importtime` into one entry per imported module."""
+    timings = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the header line
+        name = fields[2].rstrip()
+        stripped = name.lstrip(" ")
+        timings.append(ImportTiming(
+            module=stripped,
+            self_us=int(fields[0]),
+            cumulative_us=int(fields[1]),
+            depth=(len(name) - len(stripped) - 1) // 2,
+        ))
+    return timings
+
+
+def import_time_report(module: str, top: int = 20, python: Optional[str] = None) -> dict:
+    """
+    Import `module` in a fresh interpreter and report its import cost.
+
+    Returns the total (cumulative time of `module` itself) and the `top` modules
+    ranked by self time, i.e. the time spent executing that module's own body.
+    """
+    completed = subprocess.run(
+        [python or sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module!r} failed:\n{completed.stderr[-2000:]}")
+
+    timings = parse_importtime(completed.stderr)
+    root = next((t for t in reversed(timings) if t.module == module and t.depth == 0), None)
+    ranked = sorted(timings, key=lambda t: t.self_us, reverse=True)[:top]
+    return {
+        "module": module,
+        "total_ms": (root.cumulative_us if root else sum(t.self_us for t in timings)) / 1000,
+        "modules_imported": len(timings),
+        "top": [t.as_dict() for t in ranked],
+    }
+
+
+def format_report(report: dict) -> str:
+    lines = [
+        f"import {report['module']}: {report['total_ms']:.1f} ms across {report['modules_imported']} modules",
+        f"{'self ms':>9} | {'cumul ms':>9} | module",
+    ]
+    for entry in report["top"]:
+        lines.append(f"{entry['self_ms']:9.1f} | {entry['cumulative_ms']:9.1f} | {entry['module']}")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Per-module import-time report.")
+    parser.add_argument("module", nargs="?", default="app", help="Module to import (default: app)")
+    parser.add_argument("--top", type=int, default=20, help="Number of modules to list")
+    parser.add_argument("--max-ms", type=float, default=None,
+                        help="Exit with status 1 if the total import time exceeds this budget")
+    args = parser.parse_args(argv)
+
+    report = import_time_report(args.module, top=args.top)
+    print(format_report(report))
+    if args.max_ms is not None and report["total_ms"] > args.max_ms:
+        print(f"Import budget exceeded: {report['total_ms']:.1f} ms > {args.max_ms:.1f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,319 @@
+# =============================================================================
+"""
+idempotency.py
+Idempotency records for handler invocations, so API Gateway/Lambda retries of
+the same request return the first execution's response instead of re-running
+the workflow (and its LLM calls, and minting a new routing reference).
+
+A request key is the client's idempotency key when it sends one, otherwise a
+SHA-256 of the canonical request body. The first invocation claims the key
+with a conditional put (IN_PROGRESS, with a lease), runs, and stores the
+response (COMPLETED, with a TTL). Repeats get the stored response; concurrent
+duplicates wait for the first execution to finish. A claim whose lease ran out
+(the Lambda timed out or crashed) may be taken over; a failed execution
+releases its claim so the retry runs again. A response the store cannot keep
+(e.g. over DynamoDB's 400KB item limit) is still returned, just not replayed.
+
+Backends implement `claim`/`get`/`complete`/`release`:
+  - SQLiteIdempotencyStore: a local file, e.g. under /tmp in a Lambda container
+  - DynamoDBIdempotencyStore: the session_id-keyed table from infra/terraform/modules/dynamodb
+"""
+# =============================================================================
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from src.services.langgraph.multi_agent_doc_processing.logging.structured import get_logger
+
+IN_PROGRESS, COMPLETED = "IN_PROGRESS", "COMPLETED"
+
+DEFAULT_SQLITE_PATH = os.getenv("IDEMPOTENCY_PATH", "/tmp/idempotency.sqlite3")
+DEFAULT_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+DEFAULT_LEASE_SECONDS = float(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "900"))
+
+KEY_HEADERS = ("idempotency-key", "x-idempotency-key", "x-request-id")
+KEY_FIELDS = ("idempotency_key", "request_id")
+
+log = get_logger(__name__)
+
+
+class IdempotencyError(Exception):
+    """Base class for idempotency failures surfaced to the caller."""
+
+
+class RequestInProgress(IdempotencyError):
+    """A duplicate waited longer than `wait_timeout` for the first execution."""
+
+
+class KeyReuseError(IdempotencyError):
+    """The client reused an idempotency key for a different request body."""
+
+
+def body_hash(body: Dict[str, Any]) -> str:
+    payload = json.dumps(body, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def request_key(event: Dict[str, Any], body: Dict[str, Any]) -> str:
+    """The client-supplied idempotency key (header or body field), else a hash of the body."""
+    headers = {str(k).lower(): v for k, v in (event.get("headers") or {}).items()}
+    for name in KEY_HEADERS:
+        if headers.get(name):
+            return f"client:{headers[name]}"
+    for name in KEY_FIELDS:
+        if body.get(name):
+            return f"client:{body[name]}"
+    return f"body:{body_hash(body)}"
+
+
+class SQLiteIdempotencyStore:
+    """Idempotency records in a local SQLite file; claims are atomic within the host."""
+
+    def __init__(self, path: str = DEFAULT_SQLITE_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS idempotency "
+                "(key TEXT PRIMARY KEY, status TEXT NOT NULL, fingerprint TEXT, "
+                "response TEXT, expires_at REAL NOT NULL)"
+            )
+
+    def claim(self, key: str, fingerprint: str, lease: float) -> bool:
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO idempotency (key, status, fingerprint, expires_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET status = excluded.status, fingerprint = excluded.fingerprint, "
+                "response = NULL, expires_at = excluded.expires_at WHERE idempotency.expires_at <= ?",
+                (key, IN_PROGRESS, fingerprint, now + lease, now),
+            )
+            return cursor.rowcount == 1
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, fingerprint, response, expires_at FROM idempotency WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[3] <= time.time():
+            return None
+        return {"status": row[0], "fingerprint": row[1], "response": json.loads(row[2]) if row[2] else None}
+
+    def complete(self, key: str, response: Any, ttl: float):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE idempotency SET status = ?, response = ?, expires_at = ? WHERE key = ?",
+                (COMPLETED, json.dumps(response), time.time() + ttl, key),
+            )
+
+    def release(self, key: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM idempotency WHERE key = ? AND status = ?", (key, IN_PROGRESS))
+
+
+def _conditional_check_failed(error: Exception) -> bool:
+    response = getattr(error, "response", None) or {}
+    return response.get("Error", {}).get("Code") == "ConditionalCheckFailedException"
+
+
+class DynamoDBIdempotencyStore:
+    """
+    Idempotency records on a DynamoDB table keyed by `session_id`.
+    `table` is a boto3 Table resource (or anything with the same get_item/put_item/
+    update_item/delete_item calls, raising ConditionalCheckFailedException-coded errors).
+    """
+
+    KEY_PREFIX = "idempotency#"
+
+    def __init__(self, table):
+        self.table = table
+
+    def claim(self, key: str, fingerprint: str, lease: float) -> bool:
+        now = int(time.time())
+        try:
+            self.table.put_item(
+                Item={"session_id": self.KEY_PREFIX + key, "timestamp": now, "status": IN_PROGRESS,
+                      "fingerprint": fingerprint, "expires_at": int(now + lease)},
+                ConditionExpression="attribute_not_exists(session_id) OR expires_at <= :now",
+                ExpressionAttributeValues={":now": now},
+            )
+        except Exception as e:
+            if _conditional_check_failed(e):
+                return False
+            raise
+        return True
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        item = self.table.get_item(Key={"session_id": self.KEY_PREFIX + key}, ConsistentRead=True).get("Item")
+        if not item or float(item["expires_at"]) <= time.time():
+            return None
+        response = item.get("response")
+        return {"status": item["status"], "fingerprint": item.get("fingerprint"),
+                "response": json.loads(response) if response else None}
+
+    def complete(self, key: str, response: Any, ttl: float):
+        self.table.update_item(
+            Key={"session_id": self.KEY_PREFIX + key},
+            UpdateExpression="SET #status = :status, #response = :response, expires_at = :expires_at",
+            ExpressionAttributeNames={"#status": "status", "#response": "response"},
+            ExpressionAttributeValues={":status": COMPLETED, ":response": json.dumps(response),
+                                       ":expires_at": int(time.time() + ttl)},
+        )
+
+    def release(self, key: str):
+        try:
+            self.table.delete_item(
+                Key={"session_id": self.KEY_PREFIX + key},
+                ConditionExpression="#status = :status",
+                ExpressionAttributeNames={"#status": "status"},
+                ExpressionAttributeValues={":status": IN_PROGRESS},
+            )
+        except Exception as e:
+            if not _conditional_check_failed(e):
+                raise
+
+
+class Idempotency:
+    """
+    Runs a request at most once per key and replays its stored response.
+
+    Args:
+        store: An idempotency store backend.
+        ttl: How long completed responses are replayed.
+        lease: How long an in-progress claim blocks duplicates before it may be taken over.
+        wait_timeout: How long a duplicate waits for the first execution.
+        poll_interval: Initial delay between store polls while waiting (doubles, capped at 1s).
+    """
+
+    def __init__(self, store, ttl: float = DEFAULT_TTL_SECONDS, lease: float = DEFAULT_LEASE_SECONDS,
+                 wait_timeout: float = 30.0, poll_interval: float = 0.05):
+        self.store = store
+        self.ttl = ttl
+        self.lease = lease
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._local = threading.Lock()
+        self._inflight: Dict[str, threading.Event] = {}
+        self._ainflight: Dict[str, asyncio.Event] = {}
+        self.stats = {"executed": 0, "replayed": 0, "waited": 0}
+
+    def _replay(self, key: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """The stored record if it can answer this request, else None (raises on key reuse)."""
+        record = self.store.get(key)
+        if record is not None and record["fingerprint"] != fingerprint:
+            raise KeyReuseError(f"Idempotency key {key!r} was used for a different request")
+        return record
+
+    def _claim(self, key: str, fingerprint: str):
+        """(claimed, completed record or None)."""
+        record = self._replay(key, fingerprint)
+        if record is not None and record["status"] == COMPLETED:
+            return False, record
+        if self.store.claim(key, fingerprint, self.lease):
+            return True, None
+        return False, None
+
+    def _executed(self, key: str, response: Any, cacheable: bool):
+        """Store (or release) after a finished execution; store errors never fail the request."""
+        self._count("executed")
+        try:
+            if cacheable:
+                self.store.complete(key, response, self.ttl)
+                return
+        except Exception as e:
+            log.warning("Response for %r not stored, a retry will run again: %s", key, e)
+        try:
+            self.store.release(key)
+        except Exception as e:
+            log.warning("Claim on %r not released, it expires with its lease: %s", key, e)
+
+    def _count(self, counter: str):
+        with self._local:
+            self.stats[counter] += 1
+
+    def run(self, key: str, fingerprint: str, execute: Callable[[], Any],
+            cacheable: Callable[[Any], bool] = lambda response: True) -> Any:
+        """`execute()` once for `key`; repeats and concurrent duplicates get its response."""
+        deadline = time.monotonic() + self.wait_timeout
+        delay = self.poll_interval
+        while True:
+            claimed, record = self._claim(key, fingerprint)
+            if record is not None:
+                self._count("replayed")
+                return record["response"]
+            if claimed:
+                with self._local:
+                    done = self._inflight.setdefault(key, threading.Event())
+                try:
+                    response = execute()
+                    self._executed(key, response, cacheable(response))
+                    return response
+                except BaseException:
+                    self.store.release(key)
+                    raise
+                finally:
+                    with self._local:
+                        self._inflight.pop(key, None)
+                    done.set()
+
+            # Another execution holds the key: wait on it locally if it is in this process
+            self._count("waited")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RequestInProgress(f"Request {key!r} is still being processed")
+            with self._local:
+                local = self._inflight.get(key)
+            if local is not None:
+                local.wait(min(remaining, self.lease))
+            else:
+                time.sleep(min(delay, remaining))
+                delay = min(delay * 2, 1.0)
+
+    async def arun(self, key: str, fingerprint: str, execute, cacheable=lambda response: True) -> Any:
+        """
+        Async variant of `run`; `execute` is a coroutine function. Store calls run
+        in a worker thread so they never block the event loop, and duplicates on
+        this loop wait on the execution's asyncio.Event instead of polling the store.
+        """
+        deadline = time.monotonic() + self.wait_timeout
+        delay = self.poll_interval
+        while True:
+            claimed, record = await asyncio.to_thread(self._claim, key, fingerprint)
+            if record is not None:
+                self._count("replayed")
+                return record["response"]
+            if claimed:
+                with self._local:
+                    done = self._ainflight.setdefault(key, asyncio.Event())
+                try:
+                    response = await execute()
+                    await asyncio.to_thread(self._executed, key, response, cacheable(response))
+                    return response
+                except BaseException:
+                    await asyncio.to_thread(self.store.release, key)
+                    raise
+                finally:
+                    with self._local:
+                        self._ainflight.pop(key, None)
+                    done.set()
+
+            self._count("waited")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RequestInProgress(f"Request {key!r} is still being processed")
+            with self._local:
+                local = self._ainflight.get(key)
+            if local is not None:
+                try:
+                    await asyncio.wait_for(local.wait(), min(remaining, self.lease))
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await asyncio.sleep(min(delay, remaining))
+                delay = min(delay * 2, 1.0)
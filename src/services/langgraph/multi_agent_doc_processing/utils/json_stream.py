@@ -0,0 +1,83 @@
+# =============================================================================
+"""
+json_stream.py
+Incremental parser for the first JSON object in a stream of LLM output.
+
+Text before the opening brace is skipped. The parser tracks string/escape state
+and nesting depth, and each time a top-level member ends (at "," or the closing
+brace) that one "key": value pair is decoded and published in `fields`. Members
+completed before a truncation therefore survive, and callers can stop the
+stream as soon as the fields they need are present.
+"""
+# =============================================================================
+
+import json
+from typing import Any, Dict
+
+
+class IncrementalJSONObjectParser:
+    """Feed text chunks; completed top-level members appear in `fields`."""
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+        self._text = ""
+        self._pos = 0
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start = 0
+
+    def feed(self, chunk: str) -> Dict[str, Any]:
+        """Consume a chunk and return the members it completed."""
+        if self.done or not chunk:
+            return {}
+
+        self._text += chunk
+        completed = {}
+        text = self._text
+        i = self._pos
+        while i < len(text):
+            char = text[i]
+            if not self._started:
+                if char == "{":
+                    self._started = True
+                    self._depth = 1
+                    self._member_start = i + 1
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    completed.update(self._close_member(text, i))
+                    self.done = True
+                    i += 1
+                    break
+            elif char == "," and self._depth == 1:
+                completed.update(self._close_member(text, i))
+                self._member_start = i + 1
+            i += 1
+
+        self._pos = i
+        self.fields.update(completed)
+        return completed
+
+    def _close_member(self, text: str, end: int) -> Dict[str, Any]:
+        member = text[self._member_start:end].strip()
+        if not member:
+            return {}
+        try:
+            parsed = json.loads("{" + member + "}")
+        except json.JSONDecodeError:
+            return {}
+        return parsed
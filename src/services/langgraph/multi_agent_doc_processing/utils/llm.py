@@ -0,0 +1,34 @@
+# =============================================================================
+"""
+llm.py
+Helpers shared by the agent nodes for calling the injected LLM client,
+in both the sync and async execution paths.
+"""
+# =============================================================================
+
+import asyncio
+
+
+def response_text(response) -> str:
+    """Return the text of an LLM response (chat message or plain string)."""
+    if hasattr(response, "content"):   # chat models return a message
+        return response.content or ""
+    return str(response)               # completion models return a string
+
+
+async def ainvoke_llm(llm, prompt, **kwargs):
+    """
+    Call the LLM without blocking the event loop.
+    Uses the client's native `ainvoke` when it has one, otherwise runs the
+    blocking `invoke` on a worker thread.
+    """
+    if hasattr(llm, "ainvoke"):
+        return await llm.ainvoke(prompt, **kwargs)
+    return await asyncio.to_thread(llm.invoke, prompt, **kwargs)
+
+
+def innermost_llm(llm):
+    """The provider client under any wrappers (cache, metering, rate limiting) that keep it in `.llm`."""
+    while hasattr(llm, "__dict__") and "llm" in vars(llm):
+        llm = vars(llm)["llm"]
+    return llm
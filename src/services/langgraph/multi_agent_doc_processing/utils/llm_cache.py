@@ -0,0 +1,311 @@
+# =============================================================================
+"""
+llm_cache.py
+Content-addressed response cache that wraps the LLM injected into the workflow.
+
+Keys are a SHA-256 of (provider, model, temperature, prompt and any invoke
+options such as a structured-output response_format), so re-submitted
+documents produce the same prompts and never reach the provider twice.
+Streams are cached too: a hit is replayed as one chunk, and a miss is stored
+only when the stream ran to the end (a caller that stops early, like the
+streaming extraction once every field has arrived, leaves nothing cached). Lookups
+go through an in-process LRU with size and TTL limits first, then through an
+optional persistent tier:
+  - SQLiteCacheStore: a local file, e.g. under /tmp in a Lambda container
+  - DynamoDBCacheStore: the session_id-keyed table from infra/terraform/modules/dynamodb
+"""
+# =============================================================================
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+from src.services.langgraph.multi_agent_doc_processing.utils.llm import response_text, ainvoke_llm
+from src.services.langgraph.multi_agent_doc_processing.utils.metrics import record_cache_hit
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+DEFAULT_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+DEFAULT_SQLITE_PATH = os.getenv("LLM_CACHE_PATH", "/tmp/llm_cache.sqlite3")
+DEFAULT_SQLITE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_STORE_MAX_ENTRIES", "10000"))
+
+
+def cache_key(llm, prompt, *args, **kwargs) -> str:
+    """Hash of everything that determines the LLM's answer, including the invoke options."""
+    provider = getattr(llm, "_llm_type", None) or type(llm).__name__
+    model = getattr(llm, "model", None) or getattr(llm, "model_name", None)
+    temperature = getattr(llm, "temperature", None)
+    parts = [provider, model, temperature, prompt]
+    if args or kwargs:
+        parts += [args, kwargs]
+    payload = json.dumps(parts, default=str, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CacheStats:
+    """Thread-safe hit/miss/eviction counters used to size the cache."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def incr(self, counter: str, amount: int = 1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.persistent_hits + self.misses
+        return (self.hits + self.persistent_hits) / lookups if lookups else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "persistent_hits": self.persistent_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hit_rate,
+            }
+
+
+class LRUCache:
+    """In-process LRU with a maximum entry count and a per-entry TTL."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: Optional[float] = DEFAULT_TTL_SECONDS,
+                 stats: Optional[CacheStats] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = stats or CacheStats()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.stats.incr("expirations")
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.incr("evictions")
+
+
+class SQLiteCacheStore:
+    """
+    Persistent tier in a local SQLite file (survives warm Lambda invocations via /tmp).
+    Like the in-process tier it is bounded: every write deletes expired rows and
+    then the least recently used ones beyond `max_entries`, so the file stays
+    within the container's limited /tmp.
+    """
+
+    def __init__(self, path: str = DEFAULT_SQLITE_PATH, ttl: Optional[float] = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_SQLITE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL, used_at REAL)"
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(llm_cache)")}
+            if "used_at" not in columns:
+                # Files written before the size bound
+                self._conn.execute("ALTER TABLE llm_cache ADD COLUMN used_at REAL")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_expires_at ON llm_cache (expires_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_used_at ON llm_cache (used_at)")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE llm_cache SET used_at = ? WHERE key = ?", (now, key))
+        return value
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, used_at) VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, now),
+            )
+            self._prune(now)
+
+    def _prune(self, now: float):
+        self._conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+        excess = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN "
+                "(SELECT key FROM llm_cache ORDER BY used_at LIMIT ?)",
+                (excess,),
+            )
+
+
+class DynamoDBCacheStore:
+    """
+    Persistent tier on a DynamoDB table keyed by `session_id`.
+    `table` is a boto3 Table resource (or anything with the same get_item/put_item calls).
+    """
+
+    KEY_PREFIX = "llm-cache#"
+
+    def __init__(self, table, ttl: Optional[float] = DEFAULT_TTL_SECONDS):
+        self.table = table
+        self.ttl = ttl
+
+    def get(self, key: str) -> Optional[str]:
+        item = self.table.get_item(Key={"session_id": self.KEY_PREFIX + key}).get("Item")
+        if not item:
+            return None
+        expires_at = item.get("expires_at")
+        if expires_at is not None and float(expires_at) <= time.time():
+            return None
+        return item.get("value")
+
+    def set(self, key: str, value: str):
+        now = int(time.time())
+        item = {"session_id": self.KEY_PREFIX + key, "timestamp": now, "value": value}
+        if self.ttl:
+            item["expires_at"] = int(now + self.ttl)
+        self.table.put_item(Item=item)
+
+
+class CachedLLM:
+    """
+    Drop-in wrapper for the workflow's `llm` that answers repeated prompts from cache.
+    Cache hits are returned as `AIMessage`s; every other attribute is delegated
+    to the wrapped client.
+    """
+
+    def __init__(self, llm, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: Optional[float] = DEFAULT_TTL_SECONDS,
+                 store=None):
+        self.llm = llm
+        self.stats = CacheStats()
+        self.memory = LRUCache(max_entries=max_entries, ttl=ttl, stats=self.stats)
+        self.store = store
+
+    def __getattr__(self, name):
+        if name == "llm":
+            raise AttributeError(name)
+        return getattr(self.llm, name)
+
+    def lookup(self, prompt, *args, **kwargs):
+        """Return (key, cached text or None)."""
+        key = cache_key(self.llm, prompt, *args, **kwargs)
+        value = self.memory.get(key)
+        if value is not None:
+            self.stats.incr("hits")
+            record_cache_hit()
+            return key, value
+
+        if self.store is not None:
+            value = self.store.get(key)
+            if value is not None:
+                self.stats.incr("persistent_hits")
+                record_cache_hit()
+                self.memory.set(key, value)
+                return key, value
+
+        self.stats.incr("misses")
+        return key, None
+
+    def remember(self, key: str, response):
+        value = response_text(response)
+        self.memory.set(key, value)
+        if self.store is not None:
+            self.store.set(key, value)
+
+    def invoke(self, prompt, *args, **kwargs):
+        key, value = self.lookup(prompt, *args, **kwargs)
+        if value is not None:
+            return AIMessage(content=value)
+        response = self.llm.invoke(prompt, *args, **kwargs)
+        self.remember(key, response)
+        return response
+
+    async def ainvoke(self, prompt, *args, **kwargs):
+        key, value = self.lookup(prompt, *args, **kwargs)
+        if value is not None:
+            return AIMessage(content=value)
+        if args or kwargs:
+            response = await self.llm.ainvoke(prompt, *args, **kwargs)
+        else:
+            response = await ainvoke_llm(self.llm, prompt)
+        self.remember(key, response)
+        return response
+
+    # Only offered when the wrapped LLM streams, so `hasattr(llm, "stream")` checks stay truthful
+    @property
+    def stream(self):
+        if not hasattr(self.llm, "stream"):
+            raise AttributeError("stream")
+        return self._stream
+
+    @property
+    def astream(self):
+        if not hasattr(self.llm, "astream"):
+            raise AttributeError("astream")
+        return self._astream
+
+    def _stream(self, prompt, *args, **kwargs):
+        key, value = self.lookup(prompt, *args, **kwargs)
+        if value is not None:
+            yield AIMessageChunk(content=value)
+            return
+        text = []
+        for chunk in self.llm.stream(prompt, *args, **kwargs):
+            text.append(response_text(chunk))
+            yield chunk
+        self.remember(key, "".join(text))
+
+    async def _astream(self, prompt, *args, **kwargs):
+        key, value = self.lookup(prompt, *args, **kwargs)
+        if value is not None:
+            yield AIMessageChunk(content=value)
+            return
+        text = []
+        async for chunk in self.llm.astream(prompt, *args, **kwargs):
+            text.append(response_text(chunk))
+            yield chunk
+        self.remember(key, "".join(text))
@@ -0,0 +1,425 @@
+# =============================================================================
+"""
+metrics.py
+Per-node latency, token and cost instrumentation, exported as CloudWatch
+Embedded Metric Format (EMF) log lines.
+
+`Instrumentation.node(name, func)` wraps a graph node: it binds a sample to
+the node's context (contextvars, so LLM calls on worker threads and asyncio
+tasks see it) and records on completion:
+  - wall time of the node and the outcome (ok, error, or exception);
+  - LLM calls made through `Instrumentation.meter(llm)`: call latency, prompt
+    and completion tokens (the provider's usage metadata when the response
+    carries it, otherwise estimated) and cost at the LLM's price per 1k tokens;
+  - time spent queued by the rate limiter (`record_queue_wait`);
+  - response-cache hits (`record_cache_hit`), which are not billed.
+
+Latencies go into log-bucketed histograms (about 2% relative error), which
+give in-process p50/p95/p99 (`snapshot()`) and map directly onto EMF's
+Values/Counts arrays. `flush()` hands one EMF document per node, covering the
+samples since the previous flush, to the exporter:
+  - EMFExporter: one JSON line per document on stdout; CloudWatch extracts
+    the metrics from the Lambda's log group
+  - InMemoryExporter: keeps the documents (tests, local runs)
+"""
+# =============================================================================
+
+import contextvars
+import functools
+import inspect
+import json
+import math
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from src.services.langgraph.multi_agent_doc_processing.utils.chunking import count_tokens
+from src.services.langgraph.multi_agent_doc_processing.utils.llm import ainvoke_llm, response_text
+
+DEFAULT_NAMESPACE = "DocumentProcessing"
+
+# EMF accepts at most 100 distinct values per metric in one document
+EMF_MAX_VALUES = 100
+
+OK, ERROR, EXCEPTION = "ok", "error", "exception"
+
+_sample = contextvars.ContextVar("node_sample", default=None)
+
+
+class Histogram:
+    """Counts of values in logarithmic buckets (each `growth` times wider than the last)."""
+
+    def __init__(self, growth: float = 1.04):
+        self._log_growth = math.log(growth)
+        self.growth = growth
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, value: float):
+        index = math.floor(math.log(value) / self._log_growth) if value > 0 else -10_000
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+
+    def _value(self, index: int) -> float:
+        # Geometric midpoint of the bucket
+        return 0.0 if index == -10_000 else math.exp((index + 0.5) * self._log_growth)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q / 100 * self.count))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return self._value(index)
+        return None
+
+    def values_and_counts(self, limit: int = EMF_MAX_VALUES):
+        """EMF Values/Counts arrays; adjacent buckets are merged (count-weighted) to stay within `limit`."""
+        pairs = [(self._value(index), count) for index, count in sorted(self.buckets.items())]
+        while len(pairs) > limit:
+            merged = []
+            for i in range(0, len(pairs), 2):
+                chunk = pairs[i:i + 2]
+                count = sum(c for _, c in chunk)
+                merged.append((sum(v * c for v, c in chunk) / count, count))
+            pairs = merged
+        return [round(v, 3) for v, _ in pairs], [c for _, c in pairs]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+class NodeSample:
+    """What one node invocation did; LLM calls from several threads may add to it."""
+
+    __slots__ = ("llm_calls", "llm_ms", "prompt_tokens", "completion_tokens", "cost", "cache_hits",
+                 "queue_wait_ms", "_lock")
+
+    def __init__(self):
+        self.llm_calls = 0
+        self.llm_ms: List[float] = []
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        self.cache_hits = 0
+        self.queue_wait_ms = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, **amounts):
+        with self._lock:
+            for name, amount in amounts.items():
+                setattr(self, name, getattr(self, name) + amount)
+
+    def add_llm_call(self, ms: float, prompt_tokens: int, completion_tokens: int, cost: float):
+        with self._lock:
+            self.llm_calls += 1
+            self.llm_ms.append(ms)
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.cost += cost
+
+
+def record_queue_wait(seconds: float):
+    """Charge rate-limiter queueing to the node running in this context (no-op outside one)."""
+    sample = _sample.get()
+    if sample is not None and seconds > 0:
+        sample.add(queue_wait_ms=seconds * 1000)
+
+
+def record_cache_hit():
+    """Count a response-cache hit for the node running in this context (no-op outside one)."""
+    sample = _sample.get()
+    if sample is not None:
+        sample.add(cache_hits=1)
+
+
+class NodeStats:
+    """Histograms and counters of one node, cumulative and since the last flush."""
+
+    COUNTERS = ("invocations", "errors", "llm_calls", "prompt_tokens", "completion_tokens", "cache_hits", "cost")
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.queue_wait = Histogram()
+        self.llm_latency = Histogram()
+        self.totals = dict.fromkeys(self.COUNTERS, 0)
+        self.reset_window()
+
+    def reset_window(self):
+        self.window_latency = Histogram()
+        self.window_queue_wait = Histogram()
+        self.window_llm_latency = Histogram()
+        self.window = dict.fromkeys(self.COUNTERS, 0)
+
+    def record(self, wall_ms: float, outcome: str, sample: NodeSample):
+        amounts = {
+            "invocations": 1,
+            "errors": int(outcome != OK),
+            "llm_calls": sample.llm_calls,
+            "prompt_tokens": sample.prompt_tokens,
+            "completion_tokens": sample.completion_tokens,
+            "cache_hits": sample.cache_hits,
+            "cost": sample.cost,
+        }
+        for counters in (self.totals, self.window):
+            for name, amount in amounts.items():
+                counters[name] += amount
+        for histogram in (self.latency, self.window_latency):
+            histogram.record(wall_ms)
+        for histogram in (self.queue_wait, self.window_queue_wait):
+            histogram.record(sample.queue_wait_ms)
+        for ms in sample.llm_ms:
+            self.llm_latency.record(ms)
+            self.window_llm_latency.record(ms)
+
+
+class InMemoryExporter:
+    """Keeps exported EMF documents in `documents`."""
+
+    def __init__(self):
+        self.documents: List[Dict[str, Any]] = []
+
+    def export(self, documents: List[Dict[str, Any]]):
+        self.documents.extend(documents)
+
+
+class EMFExporter:
+    """Writes EMF documents as JSON lines to `stream` (the current stdout by default)."""
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def export(self, documents: List[Dict[str, Any]]):
+        stream = self.stream or sys.stdout
+        stream.write("".join(json.dumps(document, separators=(",", ":")) + "\n" for document in documents))
+        stream.flush()
+
+
+class Instrumentation:
+    """
+    Node and LLM instrumentation for one workflow.
+
+    Args:
+        exporter: Receives the EMF documents on `flush()` (default `EMFExporter()`).
+        namespace: CloudWatch metric namespace.
+        dimensions: Extra dimensions added to every document (e.g. {"Service": "doc-processing"}).
+        cost_per_1k_tokens: Default price of metered LLMs, for the Cost metric.
+    """
+
+    def __init__(self, exporter=None, namespace: str = DEFAULT_NAMESPACE,
+                 dimensions: Optional[Dict[str, str]] = None, cost_per_1k_tokens: Optional[float] = None):
+        self.exporter = exporter if exporter is not None else EMFExporter()
+        self.namespace = namespace
+        self.dimensions = dict(dimensions or {})
+        self.cost_per_1k_tokens = cost_per_1k_tokens
+        self._lock = threading.Lock()
+        self.nodes: Dict[str, NodeStats] = {}
+
+    def _finish(self, name: str, started: float, outcome: str, sample: NodeSample):
+        wall_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            stats = self.nodes.get(name)
+            if stats is None:
+                stats = self.nodes[name] = NodeStats()
+            stats.record(wall_ms, outcome, sample)
+
+    @staticmethod
+    def _outcome(state) -> str:
+        return ERROR if isinstance(state, dict) and state.get("next_action") == "error_handling" else OK
+
+    def node(self, name: str, func: Callable) -> Callable:
+        """Wrap a (sync or async) node function so each invocation is recorded under `name`."""
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_node(*args, **kwargs):
+                sample, started = NodeSample(), time.perf_counter()
+                token = _sample.set(sample)
+                try:
+                    state = await func(*args, **kwargs)
+                except BaseException:
+                    self._finish(name, started, EXCEPTION, sample)
+                    raise
+                finally:
+                    _sample.reset(token)
+                self._finish(name, started, self._outcome(state), sample)
+                return state
+            return async_node
+
+        @functools.wraps(func)
+        def sync_node(*args, **kwargs):
+            sample, started = NodeSample(), time.perf_counter()
+            token = _sample.set(sample)
+            try:
+                state = func(*args, **kwargs)
+            except BaseException:
+                self._finish(name, started, EXCEPTION, sample)
+                raise
+            finally:
+                _sample.reset(token)
+            self._finish(name, started, self._outcome(state), sample)
+            return state
+        return sync_node
+
+    def meter(self, llm, cost_per_1k_tokens: Optional[float] = None) -> "MeteredLLM":
+        """Wrap `llm` so its calls are charged to the node making them."""
+        price = self.cost_per_1k_tokens if cost_per_1k_tokens is None else cost_per_1k_tokens
+        return MeteredLLM(llm, price)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Cumulative counters and latency percentiles (milliseconds) per node."""
+        with self._lock:
+            return {
+                name: {
+                    **stats.totals,
+                    "latency_ms": stats.latency.summary(),
+                    "queue_wait_ms": stats.queue_wait.summary(),
+                    "llm_latency_ms": stats.llm_latency.summary(),
+                }
+                for name, stats in self.nodes.items()
+            }
+
+    def _document(self, name: str, stats: NodeStats, timestamp_ms: int) -> Dict[str, Any]:
+        dimensions = {**self.dimensions, "Node": name}
+        latency = stats.window_latency
+        document = {
+            "_aws": {
+                "Timestamp": timestamp_ms,
+                "CloudWatchMetrics": [{
+                    "Namespace": self.namespace,
+                    "Dimensions": [list(dimensions)],
+                    "Metrics": [],
+                }],
+            },
+            **dimensions,
+        }
+        metrics = document["_aws"]["CloudWatchMetrics"][0]["Metrics"]
+
+        def histogram(metric: str, values: Histogram):
+            if values.count:
+                metric_values, counts = values.values_and_counts()
+                metrics.append({"Name": metric, "Unit": "Milliseconds"})
+                document[metric] = {"Values": metric_values, "Counts": counts, "Count": values.count,
+                                    "Sum": round(values.total, 3), "Min": min(metric_values),
+                                    "Max": max(metric_values)}
+
+        histogram("Latency", latency)
+        histogram("QueueWait", stats.window_queue_wait)
+        histogram("LLMLatency", stats.window_llm_latency)
+        for metric, counter, unit in (("Invocations", "invocations", "Count"), ("Errors", "errors", "Count"),
+                                      ("LLMCalls", "llm_calls", "Count"), ("PromptTokens", "prompt_tokens", "Count"),
+                                      ("CompletionTokens", "completion_tokens", "Count"),
+                                      ("CacheHits", "cache_hits", "Count"), ("Cost", "cost", "None")):
+            metrics.append({"Name": metric, "Unit": unit})
+            document[metric] = stats.window[counter]
+
+        # Percentiles of this window, as searchable properties (not metrics)
+        for q in (50, 95, 99):
+            document[f"LatencyP{q}"] = round(latency.percentile(q), 3)
+        return document
+
+    def flush(self) -> List[Dict[str, Any]]:
+        """Export one EMF document per node that ran since the last flush, and return them."""
+        timestamp_ms = int(time.time() * 1000)
+        with self._lock:
+            documents = []
+            for name, stats in self.nodes.items():
+                if stats.window["invocations"]:
+                    documents.append(self._document(name, stats, timestamp_ms))
+                    stats.reset_window()
+        if documents:
+            self.exporter.export(documents)
+        return documents
+
+
+def usage_tokens(prompt, response):
+    """(prompt tokens, completion tokens): the response's usage metadata if present, else estimated."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    return count_tokens(str(prompt)), count_tokens(response_text(response))
+
+
+class MeteredLLM:
+    """Wraps an LLM and charges each call's latency, tokens and cost to the current node."""
+
+    def __init__(self, llm, cost_per_1k_tokens: Optional[float] = None):
+        self.llm = llm
+        self.cost_per_1k_tokens = cost_per_1k_tokens
+
+    def __getattr__(self, name):
+        if name == "llm":
+            raise AttributeError(name)
+        return getattr(self.llm, name)
+
+    def _record(self, sample: Optional[NodeSample], hits_before: int, started: float, prompt_tokens: int,
+                completion_tokens: int):
+        if sample is None:
+            return
+        ms = (time.perf_counter() - started) * 1000
+        if sample.cache_hits > hits_before:
+            # Answered by the response cache: no provider call to time or bill
+            return
+        cost = (prompt_tokens + completion_tokens) / 1000 * (self.cost_per_1k_tokens or 0.0)
+        sample.add_llm_call(ms, prompt_tokens, completion_tokens, cost)
+
+    def invoke(self, prompt, *args, **kwargs):
+        sample = _sample.get()
+        hits_before, started = sample.cache_hits if sample else 0, time.perf_counter()
+        response = self.llm.invoke(prompt, *args, **kwargs)
+        self._record(sample, hits_before, started, *usage_tokens(prompt, response))
+        return response
+
+    async def ainvoke(self, prompt, *args, **kwargs):
+        sample = _sample.get()
+        hits_before, started = sample.cache_hits if sample else 0, time.perf_counter()
+        if args or kwargs:
+            response = await self.llm.ainvoke(prompt, *args, **kwargs)
+        else:
+            response = await ainvoke_llm(self.llm, prompt)
+        self._record(sample, hits_before, started, *usage_tokens(prompt, response))
+        return response
+
+    # Only offered when the wrapped LLM streams, so `hasattr(llm, "stream")` checks stay truthful
+    @property
+    def stream(self):
+        if not hasattr(self.llm, "stream"):
+            raise AttributeError("stream")
+        return self._stream
+
+    @property
+    def astream(self):
+        if not hasattr(self.llm, "astream"):
+            raise AttributeError("astream")
+        return self._astream
+
+    def _stream(self, prompt, *args, **kwargs):
+        sample = _sample.get()
+        hits_before, started, text = sample.cache_hits if sample else 0, time.perf_counter(), []
+        try:
+            for chunk in self.llm.stream(prompt, *args, **kwargs):
+                text.append(response_text(chunk))
+                yield chunk
+        finally:
+            # Also runs when the consumer stops early (the extraction cancels once all fields arrived)
+            self._record(sample, hits_before, started, count_tokens(str(prompt)), count_tokens("".join(text)))
+
+    async def _astream(self, prompt, *args, **kwargs):
+        sample = _sample.get()
+        hits_before, started, text = sample.cache_hits if sample else 0, time.perf_counter(), []
+        try:
+            async for chunk in self.llm.astream(prompt, *args, **kwargs):
+                text.append(response_text(chunk))
+                yield chunk
+        finally:
+            self._record(sample, hits_before, started, count_tokens(str(prompt)), count_tokens("".join(text)))
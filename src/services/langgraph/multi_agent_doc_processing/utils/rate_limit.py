@@ -0,0 +1,425 @@
+# =============================================================================
+"""
+rate_limit.py
+Per-provider/model request and token budgets in front of the LLM calls.
+
+Each (provider, model) has a `RateLimitScheduler` with two token buckets, one
+for requests per minute and one for tokens per minute. A call reserves one
+request plus its estimated tokens; calls that do not fit wait in a priority
+queue and are admitted strictly in (priority, arrival) order as the buckets
+refill, so a burst is smoothed to the provider limit instead of turning into a
+storm of 429s. When a 429 does come back, its `Retry-After` pauses the whole
+scheduler before the call is retried.
+
+Priority comes from the `current_priority` context variable, which the
+workflow sets from the document type (`priority_for`): types with a higher
+approval `threshold` in DOCUMENT_TYPES go first, and types without one
+(`inf`, never routed for approval) go last.
+
+Put the limiter directly around the provider client, under a response cache,
+so cache hits neither wait in the queue nor spend budget; `RateLimiter.wrap`
+leaves an already-limited client as it is.
+
+Budgets are per process. With N concurrent Lambda containers, give each
+container 1/N of the account limit.
+"""
+# =============================================================================
+
+import asyncio
+import contextvars
+import functools
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from src.services.langgraph.multi_agent_doc_processing.state import DOCUMENT_TYPES
+from src.services.langgraph.multi_agent_doc_processing.utils.chunking import count_tokens
+from src.services.langgraph.multi_agent_doc_processing.utils.llm import ainvoke_llm, innermost_llm, response_text
+from src.services.langgraph.multi_agent_doc_processing.utils.metrics import record_queue_wait
+
+current_priority: contextvars.ContextVar = contextvars.ContextVar("llm_priority", default=0)
+
+
+def priority_for(document_type: Optional[str]) -> int:
+    """Rank of the document type by approval threshold (higher threshold -> higher priority)."""
+    finite = sorted(
+        {config["threshold"] for config in DOCUMENT_TYPES.values() if math.isfinite(config["threshold"])}
+    )
+    threshold = DOCUMENT_TYPES.get(document_type or "", {}).get("threshold")
+    if threshold is None or not math.isfinite(threshold):
+        return 0
+    return finite.index(threshold) + 1
+
+
+def prioritized(node):
+    """Wrap a (sync or async) workflow node so its LLM calls carry the document's priority."""
+    if asyncio.iscoroutinefunction(node):
+        @functools.wraps(node)
+        async def async_node(state, *args, **kwargs):
+            token = current_priority.set(priority_for(state.get("document_type")))
+            try:
+                return await node(state, *args, **kwargs)
+            finally:
+                current_priority.reset(token)
+        return async_node
+
+    @functools.wraps(node)
+    def sync_node(state, *args, **kwargs):
+        token = current_priority.set(priority_for(state.get("document_type")))
+        try:
+            return node(state, *args, **kwargs)
+        finally:
+            current_priority.reset(token)
+    return sync_node
+
+
+class TokenBucket:
+    """Refills at `per_minute / 60` units per second up to `capacity`; may go into debt."""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None, clock=time.monotonic):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self._clock = clock
+        self.level = self.capacity
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` can be taken (a request larger than the bucket waits for a full bucket)."""
+        self._refill()
+        needed = min(amount, self.capacity)
+        if self.level >= needed:
+            return 0.0
+        return (needed - self.level) / self.rate
+
+    def take(self, amount: float):
+        self._refill()
+        self.level -= amount
+
+
+class RateLimitScheduler:
+    """
+    Admits LLM calls within a requests-per-minute and tokens-per-minute budget.
+
+    Args:
+        requests_per_minute: Request budget (None for unlimited).
+        tokens_per_minute: Token budget, prompt plus expected output (None for unlimited).
+        burst_seconds: Bucket size in seconds of budget; smaller values smooth bursts more.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None,
+                 burst_seconds: float = 10.0, clock=time.monotonic):
+        self._clock = clock
+        self.buckets = {}
+        if requests_per_minute:
+            self.buckets["requests"] = TokenBucket(
+                requests_per_minute, max(1.0, requests_per_minute / 60 * burst_seconds), clock)
+        if tokens_per_minute:
+            self.buckets["tokens"] = TokenBucket(
+                tokens_per_minute, max(1.0, tokens_per_minute / 60 * burst_seconds), clock)
+
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._queue = []
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+
+        self.admitted = 0
+        self.throttled = 0
+        self.peak_queue_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    # ------------------------------------------------------------------ admission
+
+    def _enqueue(self, priority: int) -> tuple:
+        ticket = (-priority, next(self._sequence))
+        heapq.heappush(self._queue, ticket)
+        self.peak_queue_depth = max(self.peak_queue_depth, len(self._queue))
+        return ticket
+
+    def _try_admit(self, ticket: tuple, tokens: float) -> Optional[float]:
+        """With the lock held: admit `ticket` and return None, or return seconds to wait."""
+        if self._queue[0] != ticket:
+            return 0.05
+        wait = max(0.0, self._paused_until - self._clock())
+        for name, bucket in self.buckets.items():
+            wait = max(wait, bucket.wait_time(1 if name == "requests" else tokens))
+        if wait > 0:
+            return wait
+        for name, bucket in self.buckets.items():
+            bucket.take(1 if name == "requests" else tokens)
+        heapq.heappop(self._queue)
+        return None
+
+    def _admitted(self, started: float):
+        waited = self._clock() - started
+        self.admitted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        self._ready.notify_all()
+        record_queue_wait(waited)
+
+    def acquire(self, tokens: float = 0, priority: Optional[int] = None):
+        """Block until a call of `tokens` estimated tokens may start."""
+        started = self._clock()
+        with self._lock:
+            ticket = self._enqueue(current_priority.get() if priority is None else priority)
+            try:
+                while True:
+                    wait = self._try_admit(ticket, tokens)
+                    if wait is None:
+                        self._admitted(started)
+                        return
+                    self._ready.wait(timeout=wait)
+            finally:
+                # Interrupted while waiting: leave the queue, or it would block everyone behind the ticket
+                self._discard(ticket)
+
+    async def aacquire(self, tokens: float = 0, priority: Optional[int] = None):
+        """Async `acquire`: waits on the event loop instead of blocking the thread."""
+        started = self._clock()
+        with self._lock:
+            ticket = self._enqueue(current_priority.get() if priority is None else priority)
+        try:
+            while True:
+                with self._lock:
+                    wait = self._try_admit(ticket, tokens)
+                    if wait is None:
+                        self._admitted(started)
+                        return
+                await asyncio.sleep(min(wait, 0.05))
+        finally:
+            with self._lock:
+                self._discard(ticket)
+
+    def _discard(self, ticket: tuple):
+        """With the lock held: drop a ticket that was not admitted."""
+        if ticket in self._queue:
+            self._queue.remove(ticket)
+            heapq.heapify(self._queue)
+            self._ready.notify_all()
+
+    def settle(self, estimated: float, actual: float):
+        """Charge (or refund) the difference between estimated and actual tokens."""
+        bucket = self.buckets.get("tokens")
+        if bucket is not None and actual != estimated:
+            with self._lock:
+                bucket.take(actual - estimated)
+
+    def pause(self, seconds: float):
+        """Admit nothing for `seconds` (a provider's Retry-After)."""
+        with self._lock:
+            self.throttled += 1
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+    # ------------------------------------------------------------------ stats
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "queue_depth": len(self._queue),
+                "peak_queue_depth": self.peak_queue_depth,
+                "admitted": self.admitted,
+                "throttled": self.throttled,
+                "avg_wait_seconds": self.total_wait / self.admitted if self.admitted else 0.0,
+                "max_wait_seconds": self.max_wait,
+            }
+
+
+# =============================================================================
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds to wait if `error` is a rate-limit (HTTP 429) error, else None."""
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    if status != 429 and "RateLimit" not in type(error).__name__:
+        return None
+
+    headers = getattr(response, "headers", None) or {}
+    for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(header) if hasattr(headers, "get") else None
+        if value is None:
+            continue
+        try:
+            return max(0.0, float(value) * scale)
+        except (TypeError, ValueError):
+            continue
+    return 0.0
+
+
+def llm_key(llm) -> Tuple[str, str]:
+    """(provider, model) identifying the budget an LLM client draws from."""
+    inner = innermost_llm(llm)
+    provider = getattr(inner, "_llm_type", None) or type(inner).__name__
+    model = getattr(inner, "model", None) or getattr(inner, "model_name", None) or ""
+    return str(provider), str(model)
+
+
+class RateLimitedLLM:
+    """
+    Wraps an LLM so every call is admitted by its scheduler and 429s are retried
+    after the provider's Retry-After (exponential backoff when none is given).
+    """
+
+    def __init__(self, llm, scheduler: RateLimitScheduler, expected_output_tokens: int = 256,
+                 max_retries: int = 5, max_backoff: float = 60.0):
+        self.llm = llm
+        self.scheduler = scheduler
+        self.expected_output_tokens = expected_output_tokens
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+
+    def __getattr__(self, name):
+        if name == "llm":
+            raise AttributeError(name)
+        return getattr(self.llm, name)
+
+    def _estimate(self, prompt) -> int:
+        return count_tokens(str(prompt)) + self.expected_output_tokens
+
+    def _backoff(self, error: Exception, attempt: int) -> Optional[float]:
+        delay = retry_after(error)
+        if delay is None or attempt >= self.max_retries:
+            return None
+        return min(self.max_backoff, delay or 2 ** attempt)
+
+    def invoke(self, prompt, *args, **kwargs):
+        estimate = self._estimate(prompt)
+        for attempt in itertools.count():
+            self.scheduler.acquire(estimate)
+            try:
+                response = self.llm.invoke(prompt, *args, **kwargs)
+            except Exception as e:
+                delay = self._backoff(e, attempt)
+                if delay is None:
+                    raise
+                self.scheduler.pause(delay)
+                continue
+            self.scheduler.settle(estimate, count_tokens(str(prompt)) + count_tokens(response_text(response)))
+            return response
+
+    async def ainvoke(self, prompt, *args, **kwargs):
+        estimate = self._estimate(prompt)
+        for attempt in itertools.count():
+            await self.scheduler.aacquire(estimate)
+            try:
+                if args or kwargs:
+                    response = await self.llm.ainvoke(prompt, *args, **kwargs)
+                else:
+                    response = await ainvoke_llm(self.llm, prompt)
+            except Exception as e:
+                delay = self._backoff(e, attempt)
+                if delay is None:
+                    raise
+                self.scheduler.pause(delay)
+                continue
+            self.scheduler.settle(estimate, count_tokens(str(prompt)) + count_tokens(response_text(response)))
+            return response
+
+    def stream(self, prompt, *args, **kwargs):
+        """
+        Stream under the budget. A 429 before the first chunk is retried like `invoke`;
+        the tokens actually streamed are settled even when the caller stops early.
+        """
+        estimate = self._estimate(prompt)
+        for attempt in itertools.count():
+            self.scheduler.acquire(estimate)
+            received = []
+            try:
+                for chunk in self.llm.stream(prompt, *args, **kwargs):
+                    received.append(response_text(chunk))
+                    yield chunk
+                return
+            except Exception as e:
+                delay = None if received else self._backoff(e, attempt)
+                if delay is None:
+                    raise
+                self.scheduler.pause(delay)
+            finally:
+                self.scheduler.settle(estimate, count_tokens(str(prompt)) + count_tokens("".join(received)))
+
+    async def astream(self, prompt, *args, **kwargs):
+        """Async variant of `stream`."""
+        estimate = self._estimate(prompt)
+        for attempt in itertools.count():
+            await self.scheduler.aacquire(estimate)
+            received = []
+            try:
+                async for chunk in self.llm.astream(prompt, *args, **kwargs):
+                    received.append(response_text(chunk))
+                    yield chunk
+                return
+            except Exception as e:
+                delay = None if received else self._backoff(e, attempt)
+                if delay is None:
+                    raise
+                self.scheduler.pause(delay)
+            finally:
+                self.scheduler.settle(estimate, count_tokens(str(prompt)) + count_tokens("".join(received)))
+
+
+def rate_limited(llm) -> bool:
+    """Whether a `RateLimitedLLM` is among the wrappers of `llm`."""
+    while True:
+        if isinstance(llm, RateLimitedLLM):
+            return True
+        if not (hasattr(llm, "__dict__") and "llm" in vars(llm)):
+            return False
+        llm = vars(llm)["llm"]
+
+
+class RateLimiter:
+    """
+    Shares one `RateLimitScheduler` per (provider, model) across every wrapped client.
+
+    Args:
+        limits: (provider, model) or model name -> (requests_per_minute, tokens_per_minute).
+        default: Limits for models not listed in `limits`.
+    """
+
+    def __init__(self, limits: Optional[Dict[Any, Tuple[Optional[float], Optional[float]]]] = None,
+                 default: Tuple[Optional[float], Optional[float]] = (None, None), burst_seconds: float = 10.0):
+        self.limits = dict(limits or {})
+        self.default = default
+        self.burst_seconds = burst_seconds
+        self._lock = threading.Lock()
+        self.schedulers: Dict[Tuple[str, str], RateLimitScheduler] = {}
+
+    @classmethod
+    def from_env(cls) -> Optional["RateLimiter"]:
+        """Limiter from LLM_RPM / LLM_TPM (per process), or None when neither is set."""
+        rpm, tpm = os.getenv("LLM_RPM"), os.getenv("LLM_TPM")
+        if not rpm and not tpm:
+            return None
+        return cls(default=(float(rpm) if rpm else None, float(tpm) if tpm else None))
+
+    def scheduler_for(self, llm) -> RateLimitScheduler:
+        key = llm_key(llm)
+        with self._lock:
+            if key not in self.schedulers:
+                rpm, tpm = self.limits.get(key, self.limits.get(key[1], self.default))
+                self.schedulers[key] = RateLimitScheduler(rpm, tpm, burst_seconds=self.burst_seconds)
+            return self.schedulers[key]
+
+    def wrap(self, llm):
+        """
+        `llm` behind its model's scheduler. A client that already has a limiter
+        among its layers (e.g. under a response cache) is returned as is.
+        """
+        if rate_limited(llm):
+            return llm
+        return RateLimitedLLM(llm, self.scheduler_for(llm))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            schedulers = dict(self.schedulers)
+        return {f"{provider}:{model}": scheduler.stats() for (provider, model), scheduler in schedulers.items()}
@@ -0,0 +1,162 @@
+# =============================================================================
+"""
+records.py
+Fixed-layout result records for compact state mode.
+
+With `compact_state` set on the state, the extract, validate and route nodes
+store their results as slotted records instead of dicts:
+  - ExtractionRecord: the document type plus a tuple of values in the type's
+    DOCUMENT_TYPES field order (the field names are shared, not repeated).
+  - ValidationRecord: the overall score, a tuple of field scores in the same
+    order, and the missing fields.
+  - RoutingRecord: the routing decision's six attributes.
+
+Each record is a read-only `Mapping` with the same keys as the dict it
+replaces, so `record["overall_score"]`, `.get()`, `.items()` and `dict(record)`
+keep working in the nodes, learners and serializers. Records are slotted
+dataclasses, so the checkpoint serializer can round-trip them.
+"""
+# =============================================================================
+
+import abc
+import functools
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Any, Dict, Tuple
+
+from src.services.langgraph.multi_agent_doc_processing.state import DOCUMENT_TYPES
+
+NOT_FOUND = "NOT_FOUND"
+
+
+@functools.lru_cache(maxsize=None)
+def type_fields(doc_type: str) -> Tuple[str, ...]:
+    return tuple(DOCUMENT_TYPES.get(doc_type, {}).get("fields", []))
+
+
+class RecordView(Mapping):
+    """Read-only mapping interface over a slotted record."""
+
+    __slots__ = ()
+
+    @abc.abstractmethod
+    def _keys(self) -> Tuple[str, ...]:
+        """The record's keys, in order."""
+
+    @abc.abstractmethod
+    def _lookup(self, key: str) -> Any:
+        """The value of a key known to be in `_keys()`."""
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._keys():
+            raise KeyError(key)
+        return self._lookup(key)
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self) -> int:
+        return len(self._keys())
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        return self.to_dict() == dict(other)
+
+    __hash__ = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: self._lookup(key) for key in self._keys()}
+
+
+@dataclass(slots=True, eq=False)
+class ExtractionRecord(RecordView):
+    doc_type: str
+    values: Tuple[Any, ...]
+
+    @classmethod
+    def from_dict(cls, doc_type: str, extracted_data) -> "ExtractionRecord":
+        return cls(doc_type, tuple(extracted_data.get(field, NOT_FOUND) for field in type_fields(doc_type)))
+
+    def _keys(self):
+        return type_fields(self.doc_type)
+
+    def _lookup(self, key):
+        return self.values[self._keys().index(key)]
+
+
+@dataclass(slots=True, eq=False)
+class ValidationRecord(RecordView):
+    doc_type: str
+    overall_score: float
+    scores: Tuple[float, ...]
+    missing: Tuple[str, ...]
+
+    KEYS = ("overall_score", "field_scores", "missing_fields", "issues")
+
+    @classmethod
+    def from_dict(cls, doc_type: str, results) -> "ValidationRecord":
+        field_scores = results.get("field_scores", {})
+        return cls(
+            doc_type,
+            results.get("overall_score", 0.0),
+            tuple(field_scores.get(field, 0.0) for field in type_fields(doc_type)),
+            tuple(results.get("missing_fields", ())),
+        )
+
+    def _keys(self):
+        return ValidationRecord.KEYS
+
+    def _lookup(self, key):
+        if key == "overall_score":
+            return self.overall_score
+        if key == "field_scores":
+            return dict(zip(type_fields(self.doc_type), self.scores))
+        if key == "missing_fields":
+            return list(self.missing)
+        return []
+
+
+@dataclass(slots=True, eq=False)
+class RoutingRecord(RecordView):
+    target_system: str
+    requires_approval: bool
+    routing_priority: str
+    reference_id: str
+    routing_timestamp: str
+    integration_status: str
+
+    @classmethod
+    def from_dict(cls, routing_result) -> "RoutingRecord":
+        return cls(**{key: routing_result[key] for key in cls.__slots__})
+
+    def _keys(self):
+        return RoutingRecord.__slots__
+
+    def _lookup(self, key):
+        return getattr(self, key)
+
+
+def compact(state) -> bool:
+    return bool(state.get("compact_state", False))
+
+
+def store_extraction(state, extracted_data) -> None:
+    """Record extracted fields on the state (as an `ExtractionRecord` in compact mode)."""
+    if compact(state) and state.get("document_type") in DOCUMENT_TYPES:
+        extracted_data = ExtractionRecord.from_dict(state["document_type"], extracted_data)
+    state["extracted_data"] = extracted_data
+
+
+def store_validation(state, validation_results) -> None:
+    """Record validation results on the state (as a `ValidationRecord` in compact mode)."""
+    if compact(state) and not validation_results.get("issues"):
+        validation_results = ValidationRecord.from_dict(state.get("document_type", ""), validation_results)
+    state["validation_results"] = validation_results
+
+
+def store_routing(state, routing_result) -> None:
+    """Record the routing decision on the state (as a `RoutingRecord` in compact mode)."""
+    if compact(state):
+        routing_result = RoutingRecord.from_dict(routing_result)
+    state["routing_result"] = routing_result
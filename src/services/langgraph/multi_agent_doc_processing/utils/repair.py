@@ -0,0 +1,95 @@
+# =============================================================================
+"""
+repair.py
+Settings and statistics for the bounded field-repair loop.
+
+After validation, a document whose classification is trusted but which has
+missing or low-scoring fields is sent back to the LLM with a short prompt for
+just those fields, then re-validated. The loop stops when every field passes,
+after `max_iterations` attempts, or when the next prompt would exceed the
+document's `max_tokens` budget; only then does the document go to human review.
+"""
+# =============================================================================
+
+import threading
+from typing import Any, Dict, List
+
+from src.services.langgraph.multi_agent_doc_processing.utils.chunking import count_tokens
+
+
+class RepairStats:
+    """Thread-safe counters for the repair loop."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.attempts = 0
+        self.fields_requested = 0
+        self.fields_answered = 0
+        self.resolved = 0
+        self.exhausted = 0
+        self.tokens = 0
+
+    def incr(self, counter: str, amount: int = 1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            finished = self.resolved + self.exhausted
+            return {
+                "attempts": self.attempts,
+                "fields_requested": self.fields_requested,
+                "fields_answered": self.fields_answered,
+                "resolved": self.resolved,
+                "exhausted": self.exhausted,
+                "resolution_rate": self.resolved / finished if finished else 0.0,
+                "tokens": self.tokens,
+            }
+
+
+class RepairConfig:
+    """
+    Settings for the repair loop.
+
+    Args:
+        max_iterations: Repair attempts per document.
+        max_tokens: Estimated tokens (prompts plus expected answers) a document may
+            spend on repairs.
+        min_field_score: Fields scoring below this are re-requested.
+        min_confidence: Documents classified with lower confidence are not
+            repaired (their type, not their fields, is in doubt).
+        expected_output_tokens: Estimated answer size per requested field.
+    """
+
+    def __init__(self, max_iterations: int = 2, max_tokens: int = 4000, min_field_score: float = 0.8,
+                 min_confidence: float = 0.8, expected_output_tokens: int = 20):
+        self.max_iterations = max_iterations
+        self.max_tokens = max_tokens
+        self.min_field_score = min_field_score
+        self.min_confidence = min_confidence
+        self.expected_output_tokens = expected_output_tokens
+        self.stats = RepairStats()
+
+    def failing_fields(self, state) -> List[str]:
+        results = state.get("validation_results") or {}
+        field_scores = results.get("field_scores", {})
+        failing = list(results.get("missing_fields", []))
+        failing += [
+            field for field, score in field_scores.items()
+            if score < self.min_field_score and field not in failing
+        ]
+        return failing
+
+    def estimate_tokens(self, prompt: str, fields: List[str]) -> int:
+        return count_tokens(prompt) + self.expected_output_tokens * len(fields)
+
+    def within_budget(self, state, prompt: str, fields: List[str]) -> bool:
+        spent = state.get("repair_tokens", 0)
+        return spent + self.estimate_tokens(prompt, fields) <= self.max_tokens
+
+    def should_repair(self, state) -> bool:
+        if state.get("confidence_score", 0.0) < self.min_confidence:
+            return False
+        if state.get("repair_attempts", 0) >= self.max_iterations:
+            return False
+        return bool(self.failing_fields(state))
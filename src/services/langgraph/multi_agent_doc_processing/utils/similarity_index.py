@@ -0,0 +1,212 @@
+# =============================================================================
+"""
+similarity_index.py
+MinHash/LSH index of processed documents, used to recognise near-duplicates of
+templated documents (same vendor layout, different numbers and dates).
+
+Documents are normalised (lower-cased, every digit run collapsed to "0") and
+split into word shingles. A MinHash signature of `num_perm` 32-bit values is
+computed with NumPy and cut into `bands`; each band is a bucket key, so a lookup
+costs one signature plus `bands` dict probes regardless of index size. Candidate
+matches are confirmed by comparing signatures (an estimate of Jaccard similarity).
+
+Memory is bounded by `max_entries`: the oldest entries are evicted first. Each
+entry holds its signature (num_perm * 4 bytes), its bucket keys and the
+classification/extraction payload. A document whose near-duplicate is already
+indexed refreshes that entry instead of adding another, so a vendor's stream of
+templated documents occupies one entry and the buckets stay small.
+"""
+# =============================================================================
+
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.services.langgraph.multi_agent_doc_processing.state import DocumentState, DOCUMENT_TYPES
+
+# Mersenne-style prime just above 2**32 for the universal hash family
+_PRIME = np.uint64(4294967311)
+_MAX_HASH = np.uint32(0xFFFFFFFF)
+
+_DIGITS = re.compile(r"\d+")
+_WORDS = re.compile(r"\w+")
+
+
+def normalize(content: str) -> List[str]:
+    """Lower-case word tokens with numbers masked, so only the template text counts."""
+    return _WORDS.findall(_DIGITS.sub("0", content.lower()))
+
+
+class SimilarMatch:
+    """A near-duplicate found in the index."""
+
+    __slots__ = ("similarity", "document_type", "confidence", "extracted_data")
+
+    def __init__(self, similarity: float, document_type: str, confidence: float, extracted_data: Dict[str, Any]):
+        self.similarity = similarity
+        self.document_type = document_type
+        self.confidence = confidence
+        self.extracted_data = extracted_data
+
+    def head_start(self, content: str) -> Dict[str, Any]:
+        """Known field values that appear verbatim in the new document (e.g. the vendor name)."""
+        fields = DOCUMENT_TYPES.get(self.document_type, {}).get("fields", [])
+        return {
+            field: value
+            for field, value in self.extracted_data.items()
+            if field in fields and isinstance(value, str) and value != "NOT_FOUND" and value and value in content
+        }
+
+
+class NearDuplicateIndex:
+    """
+    Bounded MinHash/LSH index over processed `document_content`.
+
+    Args:
+        num_perm: Signature length; must be divisible by `bands`.
+        bands: Number of LSH bands. More bands find less similar candidates.
+        threshold: Minimum estimated similarity for `lookup` to return a match.
+        shingle_size: Words per shingle.
+        max_entries: Maximum indexed documents; the oldest are evicted first.
+        min_score: Minimum validation `overall_score` for `learn` to index a document.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, threshold: float = 0.8, shingle_size: int = 3,
+                 max_entries: int = 100_000, min_score: float = 0.8, seed: int = 7):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.max_entries = max_entries
+        self.min_score = min_score
+
+        rng = np.random.default_rng(seed)
+        # a < 2**31 keeps a * x + b inside uint64 for 32-bit x
+        self._a = rng.integers(1, 2**31 - 1, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 2**32 - 1, size=num_perm, dtype=np.uint64)
+
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()   # id -> (signature, band keys, payload)
+        self._buckets: Dict[int, Dict[int, None]] = {}   # band key -> entry ids (insertion-ordered set)
+        self._next_id = 0
+
+        self.lookups = 0
+        self.hits = 0
+        self.evictions = 0
+        self.refreshes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def signature(self, content: str) -> np.ndarray:
+        tokens = normalize(content)
+        n = self.shingle_size
+        shingles = {" ".join(tokens[i:i + n]) for i in range(max(1, len(tokens) - n + 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        permuted = (hashes[:, None] * self._a + self._b) % _PRIME
+        return np.minimum(permuted.min(axis=0), _MAX_HASH).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[int]:
+        return [
+            hash((band, signature[band * self.rows:(band + 1) * self.rows].tobytes()))
+            for band in range(self.bands)
+        ]
+
+    def add(self, content: str, document_type: str, extracted_data: Dict[str, Any], confidence: float = 0.9):
+        """
+        Index a processed document with its classification and extraction. If a
+        near-duplicate of the same type is indexed, it is replaced by this document
+        (signature, buckets and payload) and becomes the newest entry instead.
+        """
+        signature = self.signature(content)
+        keys = self._band_keys(signature)
+        payload = (document_type, confidence, dict(extracted_data))
+        with self._lock:
+            entry_id, similarity = self._nearest(signature, keys)
+            if entry_id is not None and similarity >= self.threshold and \
+                    self._entries[entry_id][2][0] == document_type:
+                self._unbucket(entry_id, self._entries[entry_id][1])
+                self._entries[entry_id] = (signature, keys, payload)
+                self._bucket(entry_id, keys)
+                self._entries.move_to_end(entry_id)
+                self.refreshes += 1
+                return
+
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (signature, keys, payload)
+            self._bucket(entry_id, keys)
+            while len(self._entries) > self.max_entries:
+                self._evict_oldest()
+
+    def _bucket(self, entry_id: int, keys: List[int]):
+        for key in keys:
+            self._buckets.setdefault(key, {})[entry_id] = None
+
+    def _unbucket(self, entry_id: int, keys: List[int]):
+        for key in keys:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                continue
+            bucket.pop(entry_id, None)
+            if not bucket:
+                del self._buckets[key]
+
+    def _evict_oldest(self):
+        entry_id, (_, keys, _) = self._entries.popitem(last=False)
+        self._unbucket(entry_id, keys)
+        self.evictions += 1
+
+    def lookup(self, content: str) -> Optional[SimilarMatch]:
+        """Return the most similar indexed document at or above the threshold, if any."""
+        signature = self.signature(content)
+        keys = self._band_keys(signature)
+        with self._lock:
+            self.lookups += 1
+            entry_id, similarity = self._nearest(signature, keys)
+            if entry_id is None or similarity < self.threshold:
+                return None
+            self.hits += 1
+            document_type, confidence, extracted_data = self._entries[entry_id][2]
+
+        return SimilarMatch(similarity, document_type, confidence, extracted_data)
+
+    def _nearest(self, signature: np.ndarray, keys: List[int]):
+        """With the lock held: (entry id, similarity) of the most similar candidate, or (None, 0.0)."""
+        candidates = {entry_id for key in keys for entry_id in self._buckets.get(key, ())}
+        best, best_similarity = None, 0.0
+        for entry_id in candidates:
+            similarity = float(np.count_nonzero(self._entries[entry_id][0] == signature)) / self.num_perm
+            if similarity > best_similarity:
+                best, best_similarity = entry_id, similarity
+        return best, best_similarity
+
+    def learn(self, state: DocumentState):
+        """Index a finished document when its extraction validated well."""
+        score = state.get("validation_results", {}).get("overall_score", 0.0)
+        if score < self.min_score or state.get("document_type") not in DOCUMENT_TYPES:
+            return
+        self.add(
+            state.get("document_content", ""),
+            state["document_type"],
+            state.get("extracted_data", {}),
+            confidence=state.get("confidence_score", 0.9),
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+                "evictions": self.evictions,
+                "refreshes": self.refreshes,
+            }
@@ -1,55 +1,252 @@
 import functools
 from langgraph.graph import StateGraph, END
-from langchain_ollama import OllamaLLM 
+from langchain_core.runnables import RunnableLambda
 from src.services.langgraph.multi_agent_doc_processing.state import DocumentState
-from src.services.langgraph.multi_agent_doc_processing.agents.classify_agent.classify_document import classify_document
-from src.services.langgraph.multi_agent_doc_processing.agents.extract_agent.extract_data import extract_data
+from src.services.langgraph.multi_agent_doc_processing.agents.classify_agent.classify_document import classify_document, aclassify_document
+from src.services.langgraph.multi_agent_doc_processing.agents.extract_agent.extract_data import extract_data, aextract_data
+from src.services.langgraph.multi_agent_doc_processing.agents.classify_extract_agent.classify_extract import classify_and_extract, aclassify_and_extract
 from src.services.langgraph.multi_agent_doc_processing.agents.validate_agent.validate_data import validate_data
 from src.services.langgraph.multi_agent_doc_processing.agents.route_agent.route_document import route_document
+from src.services.langgraph.multi_agent_doc_processing.agents.escalate_agent.escalate_document import escalate_document, aescalate_document
+from src.services.langgraph.multi_agent_doc_processing.agents.repair_agent.repair_fields import repair_fields, arepair_fields, plan_repair
+from src.services.langgraph.multi_agent_doc_processing.utils.cascade import TierMeter, SMALL, LARGE
+from src.services.langgraph.multi_agent_doc_processing.utils.rate_limit import prioritized
 
-def create_document_workflow(llm=None) -> StateGraph:
+def llm_node(name, func, afunc, prioritize: bool = False, instrumentation=None, **kwargs) -> RunnableLambda:
+    """
+    Node with sync and async implementations that "bake in" `kwargs` (the llm and options).
+    With `prioritize`, LLM calls made by the node carry the document type's priority;
+    with `instrumentation`, each invocation is recorded under `name`.
+    """
+    sync_node, async_node = functools.partial(func, **kwargs), functools.partial(afunc, **kwargs)
+    if prioritize:
+        sync_node, async_node = prioritized(sync_node), prioritized(async_node)
+    if instrumentation is not None:
+        sync_node, async_node = instrumentation.node(name, sync_node), instrumentation.node(name, async_node)
+    return RunnableLambda(sync_node, afunc=async_node, name=name)
+
+
+def with_learners(validate_node, learners):
+    """Run the validation node, then let each learner record the validated document (unless it is being repaired)."""
+    @functools.wraps(validate_node)
+    def validate_and_learn(state: DocumentState) -> DocumentState:
+        state = validate_node(state)
+        if state.get("next_action") == "repair":
+            return state
+        for learner in learners:
+            learner.learn(state)
+        return state
+    return validate_and_learn
+
+
+def with_cascade(validate_node, cascade):
+    """Run the validation node, then decide whether the document escalates to the larger model."""
+    @functools.wraps(validate_node)
+    def validate_and_decide(state: DocumentState) -> DocumentState:
+        revalidation = state.get("processing_stage") in ("repaired", "corrected")
+        state = validate_node(state)
+        if revalidation:
+            # Re-validation after a repair or a reviewer's corrections; already counted and decided on
+            return state
+        stats = cascade.stats
+        if state.get("model_tier", SMALL) == SMALL:
+            stats.incr("documents")
+            if cascade.should_escalate(state):
+                stats.incr("escalated")
+                state["next_action"] = "escalate"
+            else:
+                stats.incr("accepted_small")
+        elif state.get("human_review_required", False):
+            stats.incr("review_after_escalation")
+        else:
+            stats.incr("accepted_large")
+        return state
+    return validate_and_decide
+
+
+def with_repair(validate_node, repair, long_document=None):
+    """Run the validation node, then send documents with failing fields to the repair node while budget remains."""
+    @functools.wraps(validate_node)
+    def validate_and_repair(state: DocumentState) -> DocumentState:
+        state = validate_node(state)
+        if state.get("next_action") == "escalate":
+            return state
+        if plan_repair(state, repair, long_document) is not None:
+            state["next_action"] = "repair"
+        elif state.get("repair_attempts", 0):
+            repair.stats.incr("resolved" if not repair.failing_fields(state) else "exhausted")
+        return state
+    return validate_and_repair
+
+
+def create_document_workflow(llm=None, fused: bool = False, pre_classifier=None, similarity_index=None,
+                             template_store=None, rule_extraction: bool = False,
+                             streaming: bool = False, long_document=None, cascade=None,
+                             rate_limiter=None, structured_output: bool = False, repair=None,
+                             checkpointer=None, instrumentation=None) -> StateGraph:
     """
     Assemble the complete LangGraph document processing workflow.
+
+    The LLM nodes carry both a sync and an async implementation, so the same
+    compiled graph serves `invoke` (blocking LLM calls) and `ainvoke`
+    (the LLM's async API, many documents multiplexed on one event loop).
+
+    Args:
+        llm: LLM client injected into the classify/extract nodes.
+        fused: Replace the classify and extract nodes with a single
+            "classify_extract" node that makes one LLM call per document.
+            The classify/extract options below (pre_classifier through
+            long_document, and structured_output) need the separate nodes and
+            raise ValueError when combined with it.
+        pre_classifier: Optional `PreClassifier`; when it is confident the
+            classify node skips its LLM call.
+        similarity_index: Optional `NearDuplicateIndex`. Near-duplicates of earlier
+            documents reuse their type and a head-start extraction, and documents
+            that validate well are added to the index.
+        template_store: Optional `TemplateStore`. Learned vendor templates fill
+            fields before the extract node asks the LLM for the rest.
+        rule_extraction: Run the deterministic field extractors first and send
+            the LLM a reduced prompt for the fields they could not find.
+        streaming: Parse the extraction from the LLM's token stream and cancel
+            generation once every requested field has arrived.
+        long_document: Optional `LongDocumentConfig`. Classification sees only
+            the leading tokens and extraction runs over parallel chunks, keeping
+            every prompt within its token budget.
+        cascade: Optional `CascadeConfig`. `llm` becomes the small first tier, and
+            documents scoring below its thresholds after validation are re-run
+            once on `cascade.escalation_llm` before routing.
+        rate_limiter: Optional `RateLimiter`. LLM calls wait for their model's
+            request/token budget, queued by document-type priority, and 429s are
+            retried after the provider's Retry-After. LLMs already limited under
+            a response cache (see `app.with_response_cache`) are not wrapped again.
+        structured_output: Constrain extraction to a JSON schema built from
+            DOCUMENT_TYPES using the provider's structured-output/JSON mode.
+        repair: Optional `RepairConfig`. Documents with missing or low-scoring
+            fields are re-asked for just those fields and re-validated, up to
+            `repair.max_iterations` times within `repair.max_tokens`, before
+            falling back to human review.
+        checkpointer: Optional LangGraph checkpointer (e.g. `KVCheckpointSaver`).
+            Runs are then invoked with a `thread_id` (the document id) and can be
+            resumed after an error or with a reviewer's corrections.
+        instrumentation: Optional `Instrumentation`. Every node records its wall
+            time, outcome, rate-limiter queue wait, cache hits and the latency,
+            tokens and cost of its LLM calls; `instrumentation.flush()` exports
+            them as CloudWatch EMF metrics.
     
     Returns:
         Compiled LangGraph workflow ready for invocation.
     """
 
-    # Create the LLM instance
+    if fused:
+        unsupported = [name for name, value in (
+            ("pre_classifier", pre_classifier), ("similarity_index", similarity_index),
+            ("template_store", template_store), ("rule_extraction", rule_extraction),
+            ("streaming", streaming), ("long_document", long_document),
+            ("structured_output", structured_output),
+        ) if value is not None and value is not False]
+        if unsupported:
+            raise ValueError(f"fused=True cannot be combined with {', '.join(unsupported)}")
+
+    # Create the LLM instance (imported here so OpenAI deployments never load langchain_ollama)
     if llm is None:
-        llm = Ollama(model="llama3.2", temperature=0)
-    
-    # Create partial functions that "bake in" the llm argument
-    classify_with_llm = functools.partial(classify_document, llm=llm)
-    extract_with_llm = functools.partial(extract_data, llm=llm)
+        from langchain_ollama import OllamaLLM
+        llm = OllamaLLM(model="llama3.2", temperature=0)
+    if instrumentation is not None:
+        llm = instrumentation.meter(llm, cascade.small_cost_per_1k_tokens if cascade is not None else None)
+    if cascade is not None:
+        llm = TierMeter(llm, SMALL, cascade.stats)
+    if rate_limiter is not None:
+        llm = rate_limiter.wrap(llm)
+    prioritize = rate_limiter is not None
+    node_options = dict(prioritize=prioritize, instrumentation=instrumentation)
+
+    extract_options = dict(template_store=template_store, rule_extraction=rule_extraction,
+                           streaming=streaming, long_document=long_document,
+                           structured_output=structured_output)
 
     workflow = StateGraph(DocumentState)
 
+    if fused:
+        # One LLM round-trip returns both the type and its fields
+        workflow.add_node("classify_extract", llm_node(
+            "classify_extract", classify_and_extract, aclassify_and_extract, **node_options, llm=llm,
+        ))
+        workflow.set_entry_point("classify_extract")
+        workflow.add_edge("classify_extract", "validate")
+    else:
+        # Create partial functions that "bake in" the llm argument
+        classify_with_llm = llm_node(
+            "classify", classify_document, aclassify_document, **node_options, llm=llm,
+            pre_classifier=pre_classifier, similarity_index=similarity_index, long_document=long_document,
+        )
+        extract_with_llm = llm_node(
+            "extract", extract_data, aextract_data, **node_options, llm=llm, **extract_options,
+        )
+        workflow.add_node("classify", classify_with_llm)
+        workflow.add_node("extract", extract_with_llm)
+
+        # Set entry point and main edges
+        workflow.set_entry_point("classify")
+        workflow.add_edge("classify", "extract")
+        workflow.add_edge("extract", "validate")
+
+    # Components that learn from documents that validated well
+    learners = [learner for learner in (similarity_index, template_store) if learner is not None]
+
+    validate_node = validate_data
+    if cascade is not None:
+        validate_node = with_cascade(validate_node, cascade)
+    if repair is not None:
+        validate_node = with_repair(validate_node, repair, long_document)
+    if learners:
+        validate_node = with_learners(validate_node, learners)
+    route_node = route_document
+    if instrumentation is not None:
+        validate_node = instrumentation.node("validate", validate_node)
+        route_node = instrumentation.node("route", route_node)
+
     # Register agent nodes (steps)
-    workflow.add_node("classify", classify_with_llm)
-    workflow.add_node("extract", extract_with_llm)
-    workflow.add_node("validate", validate_data)
-    workflow.add_node("route", route_document)
+    workflow.add_node("validate", validate_node)
+    workflow.add_node("route", route_node)
+
+    branches = {
+        "route": "route",
+        "human_review": END,
+    }
+    escalation_llm = None
+    if cascade is not None:
+        # Low-scoring documents are re-run once on the larger model, then re-validated
+        escalation_llm = cascade.escalation_llm
+        if instrumentation is not None:
+            escalation_llm = instrumentation.meter(escalation_llm, cascade.large_cost_per_1k_tokens)
+        escalation_llm = TierMeter(escalation_llm, LARGE, cascade.stats)
+        if rate_limiter is not None:
+            escalation_llm = rate_limiter.wrap(escalation_llm)
+        workflow.add_node("escalate", llm_node(
+            "escalate", escalate_document, aescalate_document, **node_options,
+            llm=escalation_llm, cascade=cascade, **extract_options,
+        ))
+        workflow.add_edge("escalate", "validate")
+        branches["escalate"] = "escalate"
 
-    # Set entry point and main edges
-    workflow.set_entry_point("classify")
-    workflow.add_edge("classify", "extract")
-    workflow.add_edge("extract", "validate")
+    if repair is not None:
+        # Failing fields are re-requested on the document's current tier, then re-validated
+        workflow.add_node("repair", llm_node(
+            "repair", repair_fields, arepair_fields, **node_options, llm=llm, repair=repair,
+            escalation_llm=escalation_llm, long_document=long_document, structured_output=structured_output,
+        ))
+        workflow.add_edge("repair", "validate")
+        branches["repair"] = "repair"
 
     # Conditional routing after validation step
     def should_route_or_review(state: DocumentState) -> str:
+        if state.get('next_action') in ("escalate", "repair"):
+            return state['next_action']
         return "human_review" if state.get('human_review_required', False) else "route"
 
-    workflow.add_conditional_edges(
-        "validate",
-        should_route_or_review,
-        {
-            "route": "route",
-            "human_review": END,
-        }
-    )
+    workflow.add_conditional_edges("validate", should_route_or_review, branches)
 
     # End after routing node completes
     workflow.add_edge("route", END)
 
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
@@ -31,3 +31,57 @@ def test_document_processing_workflow_end_to_end():
     assert result["document_type"] == "invoice"
     assert result["processing_stage"] != "received"
     assert "extracted_data" in result
+
+
+class AsyncMockLLM(MockLLM):
+    def __init__(self):
+        self.async_calls = 0
+
+    async def ainvoke(self, prompt):
+        self.async_calls += 1
+        return self.invoke(prompt)
+
+@pytest.mark.integration
+def test_document_processing_workflow_ainvoke_uses_async_llm():
+    import asyncio
+
+    mock_llm = AsyncMockLLM()
+    workflow = create_document_workflow(llm=mock_llm)
+
+    doc = DocumentState(
+        document_id="TEST-002",
+        document_name="Invoice Example",
+        document_content="This is a fake invoice for $ 1000.",
+        human_review_required=False,
+        error_count=0,
+        processing_stage="received",
+        messages=[]
+    )
+
+    result = asyncio.run(workflow.ainvoke(doc))
+    assert result["document_type"] == "invoice"
+    assert result["extracted_data"]["invoice_number"] == "#123"
+    assert mock_llm.async_calls == 2
+
+
+@pytest.mark.integration
+def test_document_processing_workflow_with_routing_llm():
+    """A RoutingLLM over two providers is a drop-in `llm`; a failing provider fails over."""
+    from src.llm_router import RoutingLLM
+
+    class FailingLLM:
+        def invoke(self, prompt):
+            raise RuntimeError("provider down")
+
+    router = RoutingLLM([("down:model", FailingLLM()), ("mock:model", MockLLM())])
+    workflow = create_document_workflow(llm=router)
+
+    result = workflow.invoke(DocumentState(
+        document_content="This is a fake invoice for $ 1000.",
+        human_review_required=False,
+        error_count=0,
+        processing_stage="received",
+        messages=[],
+    ))
+    assert result["document_type"] == "invoice"
+    assert router.stats()["failovers"] >= 1
@@ -33,10 +33,74 @@ def test_get_openai_key_from_secrets_manager(monkeypatch):
         {"client": staticmethod(lambda svc: FakeSecretsManager())}
     )
     monkeypatch.setattr(app, "boto3", fake_boto3)
+    monkeypatch.setattr(app, "_secret_cache", {})
 
     assert app.get_openai_key() == "secret-from-aws"
 
 
+@pytest.mark.unit
+def test_get_openai_key_caches_secret_for_container_lifetime(monkeypatch):
+    """Secrets Manager is called once per ARN; later calls reuse the cached value."""
+    calls = []
+
+    class FakeSecretsManager:
+        def get_secret_value(self, SecretId):
+            calls.append(SecretId)
+            return {"SecretString": "cached-secret"}
+
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.setenv("OPENAI_SECRET_ARN", "arn-1")
+    monkeypatch.setattr(app, "boto3", type("FakeBoto3", (), {"client": staticmethod(lambda svc: FakeSecretsManager())}))
+    monkeypatch.setattr(app, "_secret_cache", {})
+
+    assert app.get_openai_key() == "cached-secret"
+    assert app.get_openai_key() == "cached-secret"
+    assert calls == ["arn-1"]
+
+
+@pytest.mark.unit
+def test_eager_init_only_inside_lambda(monkeypatch):
+    monkeypatch.delenv("AWS_LAMBDA_FUNCTION_NAME", raising=False)
+    assert not app.eager_init_enabled()
+
+    monkeypatch.setenv("AWS_LAMBDA_FUNCTION_NAME", "doc-processor")
+    assert app.eager_init_enabled()
+
+    monkeypatch.setenv("EAGER_INIT", "false")
+    assert not app.eager_init_enabled()
+
+
+@pytest.mark.unit
+def test_failed_init_reports_its_error_and_is_retried(monkeypatch):
+    """A failed initialization raises its own error and is not cached."""
+    import sys
+    import types
+
+    class FakeChatOpenAI:
+        def __init__(self, **kwargs):
+            self.kwargs = kwargs
+
+    keys = iter([RuntimeError("Secrets Manager throttled"), "sk-test"])
+
+    def get_openai_key():
+        key = next(keys)
+        if isinstance(key, Exception):
+            raise key
+        return key
+
+    monkeypatch.setitem(sys.modules, "langchain_openai", types.SimpleNamespace(ChatOpenAI=FakeChatOpenAI))
+    monkeypatch.setattr(app, "get_openai_key", get_openai_key)
+    monkeypatch.setattr(app, "workflow_instance", None)
+
+    with pytest.raises(RuntimeError, match="Secrets Manager throttled"):
+        app.get_app()
+    assert app.workflow_instance is None
+
+    workflow = app.get_app()
+    assert workflow is app.workflow_instance
+    assert app.get_app() is workflow
+
+
 # -------------------------------
 # handler() Tests
 # -------------------------------
@@ -87,3 +151,259 @@ def test_handler_handles_exception(monkeypatch):
     body = json.loads(response["body"])
     assert response["statusCode"] == 500
     assert "workflow failed" in body["error"]
+
+
+@pytest.mark.unit
+def test_handler_processes_batch_with_per_document_errors(monkeypatch):
+    """Batch mode returns one entry per document; a failure does not fail the batch."""
+    event = {"body": json.dumps({
+        "documents": [
+            {"document_id": "A", "document_content": "Invoice for $ 500"},
+            {"document_id": "B", "document_content": "explode"},
+            "Receipt for $ 20",
+        ],
+        "max_concurrency": 2,
+    })}
+
+    class FakeWorkflow:
+        def invoke(self, state):
+            if state["document_content"] == "explode":
+                raise RuntimeError("boom")
+            return {"document_content": state["document_content"], "document_type": "invoice"}
+
+    monkeypatch.setattr("app.get_app", lambda: FakeWorkflow())
+
+    response = app.handler(event, {})
+    assert response["statusCode"] == 200
+    body = json.loads(response["body"])
+    assert body["succeeded"] == 2
+    assert body["failed"] == 1
+    assert [r["index"] for r in body["results"]] == [0, 1, 2]
+    assert body["results"][0]["document_id"] == "A"
+    assert body["results"][1]["status"] == "error"
+    assert "boom" in body["results"][1]["error"]
+    assert body["results"][2]["result"] == {"document_type": "invoice"}  # input echo left out by default
+
+
+@pytest.mark.unit
+def test_process_batch_respects_concurrency_cap():
+    """No more than max_concurrency documents run at the same time."""
+    import threading
+    import time
+
+    lock = threading.Lock()
+    active = {"now": 0, "peak": 0}
+
+    class SlowWorkflow:
+        def invoke(self, state):
+            with lock:
+                active["now"] += 1
+                active["peak"] = max(active["peak"], active["now"])
+            time.sleep(0.02)
+            with lock:
+                active["now"] -= 1
+            return {"ok": True}
+
+    results = app.process_batch(SlowWorkflow(), ["doc"] * 8, max_concurrency=3)
+    assert all(r["status"] == "success" for r in results)
+    assert 1 < active["peak"] <= 3
+
+
+@pytest.mark.unit
+def test_batch_isolates_malformed_entries_and_caps_concurrency(monkeypatch):
+    """Null or non-object entries fail on their own; client concurrency is capped."""
+    import asyncio
+
+    class EchoWorkflow:
+        def invoke(self, state):
+            return {"document_type": "invoice"}
+
+        async def ainvoke(self, state):
+            return self.invoke(state)
+
+    documents = [None, 42, {"document_id": "A", "document_content": "Invoice"}]
+    for results in (app.process_batch(EchoWorkflow(), documents, max_concurrency=10_000),
+                    asyncio.run(app.aprocess_batch(EchoWorkflow(), documents, max_concurrency="many"))):
+        assert [r["status"] for r in results] == ["error", "error", "success"]
+        assert "not NoneType" in results[0]["error"]
+        assert results[2]["document_id"] == "A"
+
+    monkeypatch.setattr(app, "BATCH_MAX_CONCURRENCY", 4)
+    assert app.batch_concurrency(10_000, 100) == 4
+    assert app.batch_concurrency(2, 100) == 2
+    assert app.batch_concurrency(0, 100) == 1
+
+
+@pytest.mark.unit
+def test_ahandler_runs_batch_on_event_loop(monkeypatch):
+    """The async handler multiplexes batch documents through workflow.ainvoke."""
+    import asyncio
+
+    event = {"documents": ["one", "two", "three"], "max_concurrency": 2, "fields": "document_content"}
+
+    class AsyncWorkflow:
+        def __init__(self):
+            self.active = 0
+            self.peak = 0
+
+        async def ainvoke(self, state):
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            await asyncio.sleep(0.01)
+            self.active -= 1
+            return {"document_content": state["document_content"]}
+
+    workflow = AsyncWorkflow()
+    monkeypatch.setattr("app.get_app", lambda: workflow)
+
+    response = asyncio.run(app.ahandler(event, {}))
+    body = json.loads(response["body"])
+    assert response["statusCode"] == 200
+    assert body["succeeded"] == 3
+    assert [r["result"]["document_content"] for r in body["results"]] == ["one", "two", "three"]
+    assert workflow.peak == 2
+
+
+@pytest.mark.unit
+def test_cascade_config_from_env(monkeypatch):
+    class FakeChatModel:
+        def __init__(self, **kwargs):
+            self.kwargs = kwargs
+
+    monkeypatch.delenv("CASCADE_ESCALATION_MODEL", raising=False)
+    assert app.cascade_config(FakeChatModel, "key") is None
+
+    monkeypatch.setenv("CASCADE_ESCALATION_MODEL", "gpt-4o")
+    monkeypatch.setenv("CASCADE_MIN_SCORE", "0.9")
+    cascade = app.cascade_config(FakeChatModel, "key")
+    assert cascade.escalation_llm.kwargs["model"] == "gpt-4o"
+    assert cascade.min_score == 0.9
+
+
+@pytest.mark.unit
+def test_repair_config_from_env(monkeypatch):
+    monkeypatch.delenv("REPAIR_MAX_ITERATIONS", raising=False)
+    assert app.repair_config() is None
+    monkeypatch.setenv("REPAIR_MAX_ITERATIONS", "0")
+    assert app.repair_config() is None
+
+    monkeypatch.setenv("REPAIR_MAX_ITERATIONS", "3")
+    monkeypatch.setenv("REPAIR_MAX_TOKENS", "1500")
+    repair = app.repair_config()
+    assert repair.max_iterations == 3
+    assert repair.max_tokens == 1500
+
+
+@pytest.mark.unit
+def test_instrumentation_from_env(monkeypatch):
+    monkeypatch.delenv("METRICS_ENABLED", raising=False)
+    assert app.instrumentation_from_env() is None
+    monkeypatch.setenv("METRICS_ENABLED", "false")
+    assert app.instrumentation_from_env() is None
+
+    monkeypatch.setenv("METRICS_ENABLED", "true")
+    monkeypatch.setenv("METRICS_NAMESPACE", "Docs")
+    monkeypatch.setenv("METRICS_COST_PER_1K_TOKENS", "0.15")
+    monkeypatch.setenv("AWS_LAMBDA_FUNCTION_NAME", "my-agentic-app")
+    instrumentation = app.instrumentation_from_env()
+    assert instrumentation.namespace == "Docs"
+    assert instrumentation.cost_per_1k_tokens == 0.15
+    assert instrumentation.dimensions == {"FunctionName": "my-agentic-app"}
+
+
+@pytest.mark.unit
+def test_handler_resumes_reviewed_document_with_corrections(monkeypatch, tmp_path):
+    from src.services.langgraph.multi_agent_doc_processing.workflow import create_document_workflow
+    from src.services.langgraph.multi_agent_doc_processing.utils.checkpoint import (
+        KVCheckpointSaver, SQLiteCheckpointStore,
+    )
+
+    class ReceiptLLM:
+        calls = 0
+
+        def invoke(self, prompt):
+            ReceiptLLM.calls += 1
+            content = "receipt" if prompt.startswith("Classify") else '{"vendor": "Corner Cafe"}'
+            return type("Response", (), {"content": content})()
+
+    saver = KVCheckpointSaver(SQLiteCheckpointStore(str(tmp_path / "checkpoints.sqlite3")))
+    workflow = create_document_workflow(llm=ReceiptLLM(), checkpointer=saver)
+    monkeypatch.setattr("app.get_app", lambda: workflow)
+
+    first = json.loads(app.handler({"document_id": "doc-9", "document_content": "Corner Cafe"}, None)["body"])
+    assert first["human_review_required"] is True
+    calls = ReceiptLLM.calls
+
+    corrected = app.handler(
+        {"document_id": "doc-9", "corrections": {"date": "2024-06-01", "amount": "$ 4.00"}}, None)
+    body = json.loads(corrected["body"])
+    assert corrected["statusCode"] == 200
+    assert body["processing_complete"] is True
+    assert ReceiptLLM.calls == calls
+
+
+@pytest.mark.unit
+def test_corrections_without_checkpointing_are_rejected(monkeypatch):
+    class FakeWorkflow:
+        def invoke(self, state):
+            return state
+
+    monkeypatch.setattr("app.get_app", lambda: FakeWorkflow())
+    response = app.handler({"document_id": "doc-1", "corrections": {"date": "2024-06-01"}}, None)
+    assert response["statusCode"] == 500
+    assert "corrections" in json.loads(response["body"])["error"]
+
+
+@pytest.mark.unit
+def test_serialize_dispatches_on_type():
+    from pydantic import BaseModel
+    from langchain_core.messages import AIMessage, HumanMessage, messages_to_dict
+
+    class Result(BaseModel):
+        score: float
+        tags: list
+
+    messages = [HumanMessage(content="hi"), AIMessage(content="Routed")]
+    data = {"messages": messages, "mixed": [AIMessage(content="a"), 1], "model": Result(score=0.9, tags=("x",)),
+            "nested": {"n": None, "t": (1, 2)}}
+
+    out = app.serialize(data)
+    assert out["messages"] == messages_to_dict(messages)
+    assert out["mixed"][1] == 1 and out["mixed"][0]["type"] == "ai"
+    assert out["model"] == {"score": 0.9, "tags": ["x"]}
+    assert out["nested"] == {"n": None, "t": [1, 2]}
+    json.dumps(out)
+
+
+@pytest.mark.unit
+def test_handler_projects_fields_and_gzips_large_bodies(monkeypatch):
+    import base64
+    import gzip
+    from langchain_core.messages import AIMessage
+
+    class FakeWorkflow:
+        def invoke(self, state):
+            return {"document_content": state["document_content"], "messages": [AIMessage(content="done")],
+                    "extracted_data": {"value": "$ 10"}, "document_type": "contract"}
+
+    monkeypatch.setattr("app.get_app", lambda: FakeWorkflow())
+    content = "clause " * 2000
+
+    default = json.loads(app.handler({"document_content": content}, None)["body"])
+    assert default == {"extracted_data": {"value": "$ 10"}, "document_type": "contract"}
+
+    projected = app.handler({"queryStringParameters": {"fields": "extracted_data"},
+                             "body": json.dumps({"document_content": content})}, None)
+    assert json.loads(projected["body"]) == {"extracted_data": {"value": "$ 10"}}
+
+    full = app.handler({"headers": {"Accept-Encoding": "gzip, br"},
+                        "body": json.dumps({"document_content": content, "fields": "*"})}, None)
+    assert full["isBase64Encoded"] is True
+    assert full["headers"]["Content-Encoding"] == "gzip"
+    body = json.loads(gzip.decompress(base64.b64decode(full["body"])))
+    assert body["document_content"] == content
+    assert body["messages"][0]["data"]["content"] == "done"
+    assert len(full["body"]) < len(content) / 10
+
+    small = app.handler({"headers": {"Accept-Encoding": "gzip"}, "body": json.dumps({"document_content": "x"})}, None)
+    assert "isBase64Encoded" not in small
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import pytest
+
+from src.services.langgraph.multi_agent_doc_processing.workflow import create_document_workflow
+from src.services.langgraph.multi_agent_doc_processing.utils.cascade import CascadeConfig
+
+
+class MockLLMResponse:
+    def __init__(self, content):
+        self.content = content
+
+
+class ScriptedLLM:
+    """Answers 'receipt' to classification prompts and `extraction(prompt)` to extraction prompts."""
+
+    def __init__(self, extraction, classification="receipt"):
+        self.extraction = extraction
+        self.classification = classification
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        if prompt.startswith("Classify"):
+            return MockLLMResponse(self.classification)
+        return MockLLMResponse(json.dumps(self.extraction(prompt)))
+
+
+GOOD = {"date": "2024-06-01", "amount": "$ 42.00", "vendor": "Corner Cafe"}
+
+
+def small_extraction(prompt):
+    if "hard receipt" in prompt:
+        return {**GOOD, "amount": "NOT_FOUND"}
+    return GOOD
+
+
+def initial_state(content):
+    return {
+        "document_content": content,
+        "extracted_data": {},
+        "error_count": 0,
+        "human_review_required": False,
+        "processing_stage": "received",
+        "messages": [],
+    }
+
+
+@pytest.mark.unit
+def test_cascade_escalates_only_low_scoring_documents():
+    small = ScriptedLLM(small_extraction)
+    large = ScriptedLLM(lambda prompt: {"amount": "$ 42.00"})
+    cascade = CascadeConfig(large, min_score=0.8, small_cost_per_1k_tokens=0.1, large_cost_per_1k_tokens=1.0)
+    workflow = create_document_workflow(llm=small, cascade=cascade)
+
+    easy = workflow.invoke(initial_state("easy receipt from Corner Cafe, $ 42.00"))
+    hard = workflow.invoke(initial_state("hard receipt from Corner Cafe, forty-two dollars"))
+
+    assert easy.get("model_tier", "small") == "small"
+    assert hard["model_tier"] == "large"
+    assert hard["extracted_data"]["amount"] == "$ 42.00"
+    assert hard["validation_results"]["overall_score"] == 1.0
+    assert not hard["human_review_required"]
+
+    # The larger model is only asked for the field that failed validation
+    assert len(large.prompts) == 1
+    assert "amount" in large.prompts[0] and "vendor" not in large.prompts[0].split("Document:")[0]
+
+    report = cascade.report()
+    assert report["documents"] == 2
+    assert report["small_tier_hit_rate"] == 0.5
+    assert report["escalation_rate"] == 0.5
+    assert report["large_tier_hit_rate"] == 1.0
+    assert report["tiers"]["small"]["calls"] == 4
+    assert report["tiers"]["large"]["calls"] == 1
+    assert report["latency_saved_seconds"] is not None
+    assert report["cost_saved"] is not None
+
+
+@pytest.mark.unit
+def test_low_confidence_reclassifies_on_larger_model():
+    small = ScriptedLLM(lambda prompt: GOOD, classification="no idea")
+    large = ScriptedLLM(lambda prompt: GOOD)
+    cascade = CascadeConfig(large)
+    workflow = create_document_workflow(llm=small, cascade=cascade)
+
+    result = workflow.invoke(initial_state("receipt from Corner Cafe"))
+
+    assert result["document_type"] == "receipt"
+    assert result["confidence_score"] == 0.9
+    assert not result["human_review_required"]
+    assert large.prompts[0].startswith("Classify")
+    assert cascade.report()["escalation_rate"] == 1.0
+
+
+@pytest.mark.unit
+def test_cascade_async_path_escalates():
+    small = ScriptedLLM(small_extraction)
+    large = ScriptedLLM(lambda prompt: {"amount": "$ 42.00"})
+    cascade = CascadeConfig(large)
+    workflow = create_document_workflow(llm=small, cascade=cascade)
+
+    result = asyncio.run(workflow.ainvoke(initial_state("hard receipt")))
+    assert result["model_tier"] == "large"
+    assert result["extracted_data"]["amount"] == "$ 42.00"
+    assert cascade.report()["large_tier_hit_rate"] == 1.0
+
+
+class StreamingLLM(ScriptedLLM):
+    def stream(self, prompt):
+        content = self.invoke(prompt).content
+        for i in range(0, len(content), 8):
+            yield MockLLMResponse(content[i:i + 8])
+
+
+@pytest.mark.unit
+def test_streamed_extraction_is_metered_per_tier():
+    from src.services.langgraph.multi_agent_doc_processing.utils.cascade import TierMeter, SMALL
+
+    cascade = CascadeConfig(ScriptedLLM(lambda prompt: GOOD))
+    workflow = create_document_workflow(llm=StreamingLLM(lambda prompt: GOOD), cascade=cascade, streaming=True)
+
+    result = workflow.invoke(initial_state("receipt from Corner Cafe, $ 42.00"))
+    assert result["extracted_data"] == GOOD
+
+    small = cascade.report()["tiers"]["small"]
+    assert small["calls"] == 2  # classify (invoke) and extract (stream)
+    assert small["tokens"] > 20
+    assert not hasattr(TierMeter(ScriptedLLM(lambda prompt: GOOD), SMALL, cascade.stats), "stream")
+
@@ -0,0 +1,226 @@
+import asyncio
+import json
+import pytest
+
+from src.services.langgraph.multi_agent_doc_processing.workflow import create_document_workflow
+from src.services.langgraph.multi_agent_doc_processing.utils.checkpoint import (
+    DynamoDBCheckpointStore,
+    KVCheckpointSaver,
+    SQLiteCheckpointStore,
+    ainvoke_checkpointed,
+    aresume_with_corrections,
+    invoke_checkpointed,
+    resume_with_corrections,
+    thread_config,
+)
+
+
+class MockLLMResponse:
+    def __init__(self, content):
+        self.content = content
+
+
+class CountingLLM:
+    """Classifies as 'receipt' and extracts `extraction`, counting calls."""
+
+    def __init__(self, extraction):
+        self.extraction = extraction
+        self.calls = 0
+
+    def invoke(self, prompt):
+        self.calls += 1
+        if prompt.startswith("Classify"):
+            return MockLLMResponse("receipt")
+        return MockLLMResponse(json.dumps(self.extraction))
+
+
+class FakeTable:
+    """Local stand-in for a boto3 DynamoDB Table."""
+    def __init__(self):
+        self.items = {}
+
+    def get_item(self, Key):
+        item = self.items.get(Key["session_id"])
+        return {"Item": item} if item else {}
+
+    def put_item(self, Item):
+        assert len(json.dumps(Item)) < 400 * 1024, "DynamoDB items are limited to 400KB"
+        self.items[Item["session_id"]] = Item
+
+    def delete_item(self, Key):
+        self.items.pop(Key["session_id"], None)
+
+
+class FailingOnceLearner:
+    """Raises on its first call, simulating a crash inside the validate node."""
+    def __init__(self):
+        self.failed = False
+
+    def learn(self, state):
+        if not self.failed:
+            self.failed = True
+            raise RuntimeError("transient failure")
+
+    def apply_with_audit(self, state):
+        return {}, frozenset()
+
+
+def initial_state():
+    return {
+        "document_content": "Receipt from Corner Cafe",
+        "extracted_data": {},
+        "error_count": 0,
+        "human_review_required": False,
+        "processing_stage": "received",
+        "messages": [],
+    }
+
+
+MISSING = {"date": "NOT_FOUND", "amount": "NOT_FOUND", "vendor": "Corner Cafe"}
+
+STORES = [
+    lambda tmp_path: SQLiteCheckpointStore(str(tmp_path / "checkpoints.sqlite3")),
+    lambda tmp_path: DynamoDBCheckpointStore(FakeTable()),
+]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("make_store", STORES)
+def test_reviewer_corrections_resume_without_llm_calls(tmp_path, make_store):
+    llm = CountingLLM(MISSING)
+    workflow = create_document_workflow(llm=llm, checkpointer=KVCheckpointSaver(make_store(tmp_path)))
+
+    reviewed = workflow.invoke(initial_state(), thread_config("doc-1"))
+    assert reviewed["human_review_required"] is True
+    calls = llm.calls
+
+    result = resume_with_corrections(workflow, "doc-1", {"date": "2024-06-01", "amount": "$ 42.00"})
+
+    assert llm.calls == calls
+    assert result["extracted_data"] == {"date": "2024-06-01", "amount": "$ 42.00", "vendor": "Corner Cafe"}
+    assert result["validation_results"]["overall_score"] == pytest.approx(1.0)
+    assert result["processing_complete"] is True
+
+
+@pytest.mark.unit
+def test_checkpoints_survive_a_new_saver(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite3")
+    llm = CountingLLM(MISSING)
+    create_document_workflow(llm=llm, checkpointer=KVCheckpointSaver(SQLiteCheckpointStore(path))).invoke(
+        initial_state(), thread_config("doc-2"))
+
+    saver = KVCheckpointSaver(SQLiteCheckpointStore(path))
+    workflow = create_document_workflow(llm=llm, checkpointer=saver)
+    history = list(saver.list(thread_config("doc-2")))
+
+    assert workflow.get_state(thread_config("doc-2")).values["human_review_required"] is True
+    assert len(history) > 3
+    assert [c.config["configurable"]["checkpoint_id"] for c in history] == sorted(
+        (c.config["configurable"]["checkpoint_id"] for c in history), reverse=True)
+    assert len(list(saver.list(thread_config("doc-2"), limit=2))) == 2
+
+
+@pytest.mark.unit
+def test_failed_run_resumes_at_the_failing_node(tmp_path):
+    llm = CountingLLM({"date": "2024-06-01", "amount": "$ 42.00", "vendor": "Corner Cafe"})
+    saver = KVCheckpointSaver(SQLiteCheckpointStore(str(tmp_path / "checkpoints.sqlite3")))
+    workflow = create_document_workflow(llm=llm, checkpointer=saver, template_store=FailingOnceLearner())
+
+    with pytest.raises(RuntimeError):
+        invoke_checkpointed(workflow, initial_state(), "doc-3")
+    calls = llm.calls
+
+    result = invoke_checkpointed(workflow, initial_state(), "doc-3")
+
+    assert llm.calls == calls
+    assert result["processing_complete"] is True
+
+
+@pytest.mark.unit
+def test_delete_thread_removes_all_items():
+    table = FakeTable()
+    saver = KVCheckpointSaver(DynamoDBCheckpointStore(table))
+    workflow = create_document_workflow(llm=CountingLLM(MISSING), checkpointer=saver)
+    workflow.invoke(initial_state(), thread_config("doc-4"))
+    assert table.items
+
+    saver.delete_thread("doc-4")
+    assert table.items == {}
+
+
+@pytest.mark.unit
+def test_sqlite_items_expire_and_are_pruned(tmp_path, monkeypatch):
+    import time
+    store = SQLiteCheckpointStore(str(tmp_path / "checkpoints.sqlite3"), ttl=60)
+    saver = KVCheckpointSaver(store)
+    create_document_workflow(llm=CountingLLM(MISSING), checkpointer=saver).invoke(initial_state(),
+                                                                                   thread_config("doc-old"))
+    assert len(store) > 0
+
+    # Past the TTL: old items read as missing, and the next write deletes them
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert saver.get_tuple(thread_config("doc-old")) is None
+    store.set("checkpoint#doc-new#", "x")
+    assert len(store) == 1
+
+
+@pytest.mark.unit
+def test_async_resume_with_corrections(tmp_path):
+    llm = CountingLLM(MISSING)
+    saver = KVCheckpointSaver(SQLiteCheckpointStore(str(tmp_path / "checkpoints.sqlite3")))
+    workflow = create_document_workflow(llm=llm, checkpointer=saver)
+
+    async def run():
+        await workflow.ainvoke(initial_state(), thread_config("doc-5"))
+        return await aresume_with_corrections(workflow, "doc-5", {"date": "2024-06-01", "amount": "$ 4.00"})
+
+    result = asyncio.run(run())
+    assert result["processing_complete"] is True
+
+
+@pytest.mark.unit
+def test_resume_unknown_document_raises(tmp_path):
+    saver = KVCheckpointSaver(SQLiteCheckpointStore(str(tmp_path / "checkpoints.sqlite3")))
+    workflow = create_document_workflow(llm=CountingLLM(MISSING), checkpointer=saver)
+    with pytest.raises(KeyError):
+        resume_with_corrections(workflow, "missing", {"date": "2024-06-01"})
+
+
+@pytest.mark.unit
+def test_resubmitting_a_finished_document_starts_fresh(tmp_path):
+    llm = CountingLLM({"date": "2024-06-01", "amount": "$ 42.00", "vendor": "Corner Cafe"})
+    saver = KVCheckpointSaver(SQLiteCheckpointStore(str(tmp_path / "checkpoints.sqlite3")))
+    workflow = create_document_workflow(llm=llm, checkpointer=saver)
+    first = invoke_checkpointed(workflow, initial_state(), "doc-6")
+    assert first["extracted_data"]["vendor"] == "Corner Cafe"
+
+    llm.extraction = {"date": "2024-07-01", "vendor": "Harbor Books"}
+    state = {**initial_state(), "document_content": "Receipt from Harbor Books"}
+    second = invoke_checkpointed(workflow, state, "doc-6")
+
+    assert second["extracted_data"] == {"date": "2024-07-01", "amount": "NOT_FOUND", "vendor": "Harbor Books"}
+    assert second["validation_results"]["overall_score"] < 1.0
+
+    llm.extraction = MISSING
+    third = asyncio.run(ainvoke_checkpointed(workflow, initial_state(), "doc-6"))
+    assert third["extracted_data"] == MISSING
+
+
+@pytest.mark.unit
+def test_long_documents_are_stored_once_outside_checkpoint_items():
+    table = FakeTable()
+    saver = KVCheckpointSaver(DynamoDBCheckpointStore(table))
+    workflow = create_document_workflow(llm=CountingLLM(MISSING), checkpointer=saver)
+    state = {**initial_state(), "document_content": "Receipt from Corner Cafe\n" + "line item 1.00\n" * 60_000}
+
+    invoke_checkpointed(workflow, state, "doc-7")
+
+    # The content and the raw input that carried it, each ~1.2MB encoded, in 256KB parts
+    blobs = {key.rsplit("#", 1)[0] for key in table.items if key.startswith("blob#")}
+    assert len(blobs) == 2
+    assert workflow.get_state(thread_config("doc-7")).values["document_content"] == state["document_content"]
+    assert resume_with_corrections(workflow, "doc-7", {"date": "2024-06-01", "amount": "$ 4.00"})["processing_complete"]
+
+    saver.delete_thread("doc-7")
+    assert table.items == {}
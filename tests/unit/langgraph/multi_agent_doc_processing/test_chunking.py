@@ -0,0 +1,138 @@
+import json
+import threading
+import pytest
+from src.services.langgraph.multi_agent_doc_processing.utils import chunking
+from src.services.langgraph.multi_agent_doc_processing.utils.chunking import (
+    LongDocumentConfig, chunk_text, count_tokens, leading_text,
+)
+from src.services.langgraph.multi_agent_doc_processing.agents.extract_agent.extract_data import (
+    extract_data, merge_chunk_fields,
+)
+from src.services.langgraph.multi_agent_doc_processing.agents.classify_agent.classify_document import classify_document
+
+class MockLLMResponse:
+    def __init__(self, content):
+        self.content = content
+
+class ChunkAwareLLM:
+    """Answers from whatever contract fields appear in the prompt's document text."""
+    def __init__(self):
+        self.prompt_tokens = []
+        self.lock = threading.Lock()
+
+    def invoke(self, prompt):
+        with self.lock:
+            self.prompt_tokens.append(count_tokens(prompt))
+        if "Classify" in prompt:
+            return MockLLMResponse("contract")
+        document = prompt.split("Document:", 1)[1]
+        found = {}
+        if "Contract Number: MSA-7" in document:
+            found["contract_number"] = "MSA-7"
+        if "Effective Date: 2025-03-01" in document:
+            found["effective_date"] = "2025-03-01"
+        if "Total Value: $ 90,000.00" in document:
+            found["value"] = "$ 90,000.00"
+        return MockLLMResponse(json.dumps(found))
+
+LONG_CONTRACT = (
+    "MASTER SERVICES AGREEMENT\nContract Number: MSA-7\n"
+    + "The supplier shall provide services as described in the schedules. " * 150
+    + "\nEffective Date: 2025-03-01\n"
+    + "Either party may terminate this agreement with notice. " * 150
+    + "\nTotal Value: $ 90,000.00\n"
+)
+
+@pytest.mark.unit
+def test_chunk_text_respects_budget_and_overlap():
+    text = " ".join(f"w{i}" for i in range(100))
+    chunks = chunk_text(text, max_tokens=30, overlap_tokens=5)
+    assert all(count_tokens(c) <= 30 for c in chunks)
+    assert chunks[0].split()[-1] in chunks[1].split()[:5]
+    assert chunks[-1].endswith("w99")
+    assert chunk_text("short text", max_tokens=30) == ["short text"]
+
+@pytest.mark.unit
+def test_leading_text_trims_to_budget():
+    prefix = leading_text("one two three four", 3)
+    assert "one two three four".startswith(prefix)
+    assert 0 < count_tokens(prefix) <= 3
+    assert leading_text("one two", 10) == "one two"
+
+@pytest.mark.unit
+def test_estimate_scales_words_to_bpe_tokens(monkeypatch):
+    monkeypatch.setattr(chunking, "_encoding", lambda: None)
+    assert count_tokens("one two three") == 4
+    assert count_tokens(" ".join(["word"] * 10)) == 13
+    assert leading_text("one two three four", 3) == "one two"
+
+@pytest.mark.unit
+def test_encoding_is_only_loaded_from_a_local_bpe_cache(monkeypatch, tmp_path):
+    calls = []
+
+    class FakeTiktoken:
+        @staticmethod
+        def get_encoding(name):
+            calls.append(name)
+            raise OSError("no network")
+
+    monkeypatch.setattr(chunking, "tiktoken", FakeTiktoken)
+    chunking._encoding.cache_clear()
+    try:
+        # No cache dir (or an empty one): tiktoken would download the file, so it is not asked
+        monkeypatch.delenv("TIKTOKEN_CACHE_DIR", raising=False)
+        assert chunking._encoding() is None
+        chunking._encoding.cache_clear()
+        monkeypatch.setenv("TIKTOKEN_CACHE_DIR", str(tmp_path))
+        assert chunking._encoding() is None
+        assert calls == []
+
+        # A failed load is remembered, not retried on every count
+        (tmp_path / "bpe").write_text("x")
+        chunking._encoding.cache_clear()
+        assert chunking._encoding() is None
+        assert count_tokens("one two three") == 4
+        assert calls == [chunking.ENCODING]
+    finally:
+        chunking._encoding.cache_clear()
+
+@pytest.mark.unit
+def test_tiktoken_encoding_is_used_when_available(monkeypatch):
+    class CharEncoding:
+        """One token per character."""
+        def encode(self, text, disallowed_special=()):
+            return list(text)
+
+        def decode_with_offsets(self, tokens):
+            return "".join(tokens), list(range(len(tokens)))
+
+    monkeypatch.setattr(chunking, "_encoding", lambda: CharEncoding())
+    assert count_tokens("abc de") == 6
+    assert leading_text("abc de", 4) == "abc"
+    assert chunk_text("abcdefgh", max_tokens=4, overlap_tokens=1) == ["abcd", "defg", "gh"]
+
+@pytest.mark.unit
+def test_merge_chunk_fields_majority_then_earliest():
+    merged = merge_chunk_fields([
+        {"a": "X", "b": "NOT_FOUND", "c": "first"},
+        {"a": "y", "b": "NOT_FOUND", "c": "second"},
+        {"a": "x ", "b": "NOT_FOUND", "c": "NOT_FOUND"},
+    ], ["a", "b", "c"])
+    assert merged == {"a": "X", "b": "NOT_FOUND", "c": "first"}
+
+@pytest.mark.unit
+def test_long_document_extraction_stays_within_budget():
+    config = LongDocumentConfig(max_prompt_tokens=400, overlap_tokens=40, max_workers=4)
+    llm = ChunkAwareLLM()
+    state = {"document_content": LONG_CONTRACT, "error_count": 0, "messages": []}
+
+    state = classify_document(state, llm, long_document=config)
+    state = extract_data(state, llm, long_document=config)
+
+    assert state["document_type"] == "contract"
+    assert state["extracted_data"]["contract_number"] == "MSA-7"
+    assert state["extracted_data"]["effective_date"] == "2025-03-01"
+    assert state["extracted_data"]["value"] == "$ 90,000.00"
+    assert state["extracted_data"]["parties"] == "NOT_FOUND"
+    assert len(llm.prompt_tokens) > 3
+    assert max(llm.prompt_tokens) <= 400
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import pytest
+from src.services.langgraph.multi_agent_doc_processing.agents.classify_extract_agent.classify_extract import (
+    aclassify_and_extract,
+    classify_and_extract,
+)
+from src.services.langgraph.multi_agent_doc_processing.workflow import create_document_workflow
+
+class MockLLMResponse:
+    def __init__(self, content):
+        self.content = content
+
+class MockLLM:
+    def __init__(self, content):
+        self._content = content
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        return MockLLMResponse(self._content)
+
+def make_state(content):
+    return {
+       'document_id': 'TEST-010',
+       'document_name': 'Fused Sample',
+       'document_content': content,
+       'document_type': '',
+       'confidence_score': 0.0,
+       'extracted_data': {},
+       'validation_results': {},
+       'processing_stage': '',
+       'next_action': '',
+       'error_count': 0,
+       'human_review_required': False,
+       'processing_complete': False,
+       'messages': []
+   }
+
+@pytest.mark.unit
+def test_classify_and_extract_single_llm_call():
+    llm = MockLLM("Sure! " + json.dumps({
+        "document_type": "invoice",
+        "fields": {"invoice_number": "#12345", "date": "2024-06-01", "amount": "$ 1000.00"},
+    }))
+
+    result_state = classify_and_extract(make_state("INVOICE #12345 ..."), llm)
+    assert len(llm.prompts) == 1
+    assert result_state["document_type"] == "invoice"
+    assert result_state["confidence_score"] == pytest.approx(0.9)
+    assert result_state["extracted_data"]["invoice_number"] == "#12345"
+    assert result_state["extracted_data"]["vendor"] == "NOT_FOUND"
+    assert result_state["processing_stage"] == "extracted"
+    assert result_state["next_action"] == "validate_data"
+
+@pytest.mark.unit
+def test_classify_and_extract_malformed_output_falls_back_to_keywords():
+    llm = MockLLM("not json at all")
+
+    result_state = classify_and_extract(make_state("Your receipt from the store"), llm)
+    assert result_state["document_type"] == "receipt"
+    assert result_state["human_review_required"] is True
+    assert set(result_state["extracted_data"].values()) == {"NOT_FOUND"}
+
+@pytest.mark.unit
+def test_fused_workflow_feeds_validate_and_route():
+    llm = MockLLM(json.dumps({
+        "document_type": "receipt",
+        "fields": {"date": "2024-06-01", "amount": "$ 42.00", "vendor": "Corner Cafe"},
+    }))
+    workflow = create_document_workflow(llm=llm, fused=True)
+
+    result = workflow.invoke(make_state("RECEIPT Corner Cafe 2024-06-01 $ 42.00"))
+    assert len(llm.prompts) == 1
+    assert result["validation_results"]["overall_score"] == pytest.approx(1.0)
+    assert result["processing_stage"] == "routed"
+
+class FailingLLM:
+    def invoke(self, prompt):
+        raise RuntimeError("provider unavailable")
+
+    async def ainvoke(self, prompt):
+        raise RuntimeError("provider unavailable")
+
+@pytest.mark.unit
+def test_failed_llm_call_still_records_an_extraction():
+    result_state = classify_and_extract(make_state("INVOICE #12345 ..."), FailingLLM())
+    assert result_state["extracted_data"] == {}
+    assert result_state["error_count"] == 1
+    assert result_state["next_action"] == "error_handling"
+
+    async_state = asyncio.run(aclassify_and_extract(make_state("INVOICE #12345 ..."), FailingLLM()))
+    assert async_state["extracted_data"] == {}
+
+@pytest.mark.unit
+def test_fused_workflow_sends_failed_documents_to_review():
+    state = make_state("INVOICE #12345 ...")
+    del state["extracted_data"]
+    result = create_document_workflow(llm=FailingLLM(), fused=True).invoke(state)
+    assert result["validation_results"]["overall_score"] == 0
+    assert result["human_review_required"] is True
+
+@pytest.mark.unit
+def test_fused_workflow_rejects_classify_and_extract_options():
+    from src.services.langgraph.multi_agent_doc_processing.agents.extract_agent.vendor_templates import TemplateStore
+    from src.services.langgraph.multi_agent_doc_processing.utils.similarity_index import NearDuplicateIndex
+
+    with pytest.raises(ValueError, match="template_store"):
+        create_document_workflow(llm=MockLLM("{}"), fused=True, template_store=TemplateStore())
+    with pytest.raises(ValueError, match="similarity_index, rule_extraction"):
+        create_document_workflow(llm=MockLLM("{}"), fused=True, similarity_index=NearDuplicateIndex(),
+                                 rule_extraction=True)
+    with pytest.raises(ValueError, match="streaming"):
+        create_document_workflow(llm=MockLLM("{}"), fused=True, streaming=True)
@@ -0,0 +1,46 @@
+import sys
+import pytest
+from src.services.langgraph.multi_agent_doc_processing.utils.cold_start import (
+    LazyModule,
+    import_time_report,
+    parse_importtime,
+)
+
+
+@pytest.mark.unit
+def test_lazy_module_imports_on_first_attribute_access(monkeypatch):
+    monkeypatch.delitem(sys.modules, "colorsys", raising=False)
+
+    lazy = LazyModule("colorsys")
+    assert "colorsys" not in sys.modules
+    assert "not loaded" in repr(lazy)
+
+    assert lazy.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+    assert "colorsys" in sys.modules
+
+
+@pytest.mark.unit
+def test_parse_importtime_reads_self_cumulative_and_depth():
+    output = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       120 |        120 |     json.decoder",
+        "import time:       300 |        420 |   json",
+        "import time:        80 |        500 | app",
+        "unrelated stderr line",
+    ])
+    timings = parse_importtime(output)
+    assert [(t.module, t.self_us, t.cumulative_us, t.depth) for t in timings] == [
+        ("json.decoder", 120, 120, 2),
+        ("json", 300, 420, 1),
+        ("app", 80, 500, 0),
+    ]
+
+
+@pytest.mark.unit
+def test_import_time_report_ranks_modules_by_self_time():
+    report = import_time_report("json", top=3)
+    assert report["module"] == "json"
+    assert report["total_ms"] > 0
+    assert 1 <= len(report["top"]) <= 3
+    self_times = [entry["self_ms"] for entry in report["top"]]
+    assert self_times == sorted(self_times, reverse=True)
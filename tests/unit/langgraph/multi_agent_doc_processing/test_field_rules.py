@@ -0,0 +1,88 @@
+import pytest
+from src.services.langgraph.multi_agent_doc_processing.agents.extract_agent.field_rules import (
+    rule_extract, normalize_amount, normalize_date,
+)
+from src.services.langgraph.multi_agent_doc_processing.agents.extract_agent.extract_data import extract_data
+
+class MockLLMResponse:
+    def __init__(self, content):
+        self.content = content
+
+class RecordingLLM:
+    def __init__(self, content):
+        self.content = content
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        return MockLLMResponse(self.content)
+
+INVOICE = """INVOICE #INV-2025-045
+Date: January 15, 2025
+Vendor: Enterprise Tech Solutions
+Amount Due: $12,500"""
+
+@pytest.mark.unit
+@pytest.mark.parametrize("raw,expected", [
+    ("$12,500", "$ 12,500.00"),
+    ("1000.5", "$ 1,000.50"),
+    ("0", None),
+])
+def test_normalize_amount(raw, expected):
+    assert normalize_amount(raw) == expected
+
+@pytest.mark.unit
+@pytest.mark.parametrize("raw,expected", [
+    ("January 15, 2025", "2025-01-15"),
+    ("1/5/2025", "2025-01-05"),
+    ("2025-1-5", "2025-01-05"),
+    ("not a date", None),
+])
+def test_normalize_date(raw, expected):
+    assert normalize_date(raw) == expected
+
+@pytest.mark.unit
+def test_rule_extract_structured_invoice_fields():
+    fields = rule_extract(INVOICE, ["invoice_number", "date", "amount", "vendor"])
+    assert fields == {
+        "invoice_number": "INV-2025-045",
+        "date": "2025-01-15",
+        "amount": "$ 12,500.00",
+        "vendor": "Enterprise Tech Solutions",
+    }
+
+@pytest.mark.unit
+def test_amount_label_and_value_must_share_a_line():
+    content = "ORDER SUMMARY\nTotal\n3 widgets at $ 15.00 each\nAmount Due: $ 45.00"
+    assert rule_extract(content, ["amount"]) == {"amount": "$ 45.00"}
+    assert rule_extract("Contract value\n12 months", ["value"]) == {}
+
+@pytest.mark.unit
+def test_rule_extract_contract_fields():
+    content = "SOFTWARE LICENSE AGREEMENT\nContract Number: SLA-2025-012\nParties: DocuFlow Inc. & CloudTech Corp\nEffective Date: 03/01/2025"
+    fields = rule_extract(content, ["contract_number", "parties", "effective_date", "value"])
+    assert fields == {
+        "contract_number": "SLA-2025-012",
+        "parties": "DocuFlow Inc. & CloudTech Corp",
+        "effective_date": "2025-03-01",
+    }
+
+@pytest.mark.unit
+def test_extract_data_skips_llm_when_rules_find_everything():
+    llm = RecordingLLM("{}")
+    state = {"document_type": "invoice", "document_content": INVOICE, "error_count": 0, "messages": []}
+    result = extract_data(state, llm, rule_extraction=True)
+    assert llm.prompts == []
+    assert result["extracted_data"]["amount"] == "$ 12,500.00"
+    assert result["next_action"] == "validate_data"
+
+@pytest.mark.unit
+def test_extract_data_sends_reduced_prompt_for_missing_fields():
+    llm = RecordingLLM('{"vendor": "Corner Cafe"}')
+    content = "Thanks for visiting!\nCorner Cafe\nDate: 2024-06-01\nTotal: $ 4.50"
+    state = {"document_type": "receipt", "document_content": content, "error_count": 0, "messages": []}
+    result = extract_data(state, llm, rule_extraction=True)
+    assert len(llm.prompts) == 1
+    assert '"vendor"' in llm.prompts[0]
+    assert '"amount"' not in llm.prompts[0] and '"date"' not in llm.prompts[0]
+    assert result["extracted_data"] == {"date": "2024-06-01", "amount": "$ 4.50", "vendor": "Corner Cafe"}
@@ -0,0 +1,252 @@
+import asyncio
+import json
+import threading
+import time
+import pytest
+
+import app
+from src.services.langgraph.multi_agent_doc_processing.utils.idempotency import (
+    COMPLETED,
+    DynamoDBIdempotencyStore,
+    Idempotency,
+    KeyReuseError,
+    RequestInProgress,
+    SQLiteIdempotencyStore,
+    request_key,
+)
+
+
+class ConditionalCheckFailed(Exception):
+    response = {"Error": {"Code": "ConditionalCheckFailedException"}}
+
+
+class FakeTable:
+    """Local stand-in for a boto3 DynamoDB Table, honouring the conditions the store uses."""
+
+    def __init__(self):
+        self.items = {}
+        self._lock = threading.Lock()
+
+    def get_item(self, Key, ConsistentRead=False):
+        item = self.items.get(Key["session_id"])
+        return {"Item": dict(item)} if item else {}
+
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeValues=None):
+        with self._lock:
+            existing = self.items.get(Item["session_id"])
+            if ConditionExpression and existing and existing["expires_at"] > ExpressionAttributeValues[":now"]:
+                raise ConditionalCheckFailed()
+            self.items[Item["session_id"]] = dict(Item)
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeNames, ExpressionAttributeValues):
+        with self._lock:
+            item = self.items.setdefault(Key["session_id"], {"session_id": Key["session_id"]})
+            for assignment in UpdateExpression[len("SET "):].split(", "):
+                name, value = assignment.split(" = ")
+                item[ExpressionAttributeNames.get(name, name)] = ExpressionAttributeValues[value]
+
+    def delete_item(self, Key, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None):
+        with self._lock:
+            item = self.items.get(Key["session_id"])
+            if ConditionExpression and (not item or item["status"] != ExpressionAttributeValues[":status"]):
+                raise ConditionalCheckFailed()
+            self.items.pop(Key["session_id"], None)
+
+
+STORES = [
+    lambda tmp_path: SQLiteIdempotencyStore(str(tmp_path / "idempotency.sqlite3")),
+    lambda tmp_path: DynamoDBIdempotencyStore(FakeTable()),
+]
+
+
+@pytest.mark.unit
+def test_request_key_prefers_client_keys():
+    body = {"document_content": "x"}
+    assert request_key({"headers": {"Idempotency-Key": "abc"}}, body) == "client:abc"
+    assert request_key({}, {**body, "request_id": "r-1"}) == "client:r-1"
+    assert request_key({}, body) == request_key({}, dict(body))
+    assert request_key({}, body) != request_key({}, {"document_content": "y"})
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("make_store", STORES)
+def test_repeats_replay_the_stored_response(tmp_path, make_store):
+    idempotency = Idempotency(make_store(tmp_path))
+    calls = []
+
+    def execute():
+        calls.append(1)
+        return {"statusCode": 200, "body": "first"}
+
+    assert idempotency.run("k", "f", execute) == {"statusCode": 200, "body": "first"}
+    assert idempotency.run("k", "f", execute) == {"statusCode": 200, "body": "first"}
+    assert len(calls) == 1
+    assert idempotency.store.get("k")["status"] == COMPLETED
+
+    with pytest.raises(KeyReuseError):
+        idempotency.run("k", "other-body", execute)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("make_store", STORES)
+def test_failures_release_the_claim(tmp_path, make_store):
+    idempotency = Idempotency(make_store(tmp_path))
+
+    def explode():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        idempotency.run("k", "f", explode)
+    assert idempotency.run("k", "f", lambda: {"statusCode": 500}, lambda r: r["statusCode"] == 200) == {"statusCode": 500}
+    assert idempotency.run("k", "f", lambda: {"statusCode": 200}) == {"statusCode": 200}
+
+
+@pytest.mark.unit
+def test_store_failures_still_return_the_response(tmp_path):
+    class TooLargeStore(SQLiteIdempotencyStore):
+        def complete(self, key, response, ttl):
+            raise ValueError("Item size has exceeded the maximum allowed size")
+
+    idempotency = Idempotency(TooLargeStore(str(tmp_path / "idempotency.sqlite3")))
+    calls = []
+
+    def execute():
+        calls.append(1)
+        return {"statusCode": 200, "body": "large"}
+
+    assert idempotency.run("k", "f", execute) == {"statusCode": 200, "body": "large"}
+    assert idempotency.run("k", "f", execute) == {"statusCode": 200, "body": "large"}
+    assert len(calls) == 2  # not stored, so the retry runs again
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("make_store", STORES)
+def test_concurrent_duplicates_wait_for_the_first_execution(tmp_path, make_store):
+    store = make_store(tmp_path)
+    calls = []
+
+    def execute():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"statusCode": 200, "body": "only once"}
+
+    # Separate guards share the store, like two Lambda containers
+    guards = [Idempotency(store, poll_interval=0.01) for _ in range(4)]
+    results = []
+    threads = [threading.Thread(target=lambda g=g: results.append(g.run("k", "f", execute))) for g in guards]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [{"statusCode": 200, "body": "only once"}] * 4
+
+
+@pytest.mark.unit
+def test_waiting_times_out_and_expired_leases_are_taken_over(tmp_path):
+    store = SQLiteIdempotencyStore(str(tmp_path / "idempotency.sqlite3"))
+    assert store.claim("k", "f", lease=0.2)
+
+    with pytest.raises(RequestInProgress):
+        Idempotency(store, wait_timeout=0.05, poll_interval=0.01).run("k", "f", lambda: "never")
+
+    time.sleep(0.25)
+    assert Idempotency(store).run("k", "f", lambda: "took over") == "took over"
+
+
+@pytest.mark.unit
+def test_async_duplicates_run_once(tmp_path):
+    idempotency = Idempotency(SQLiteIdempotencyStore(str(tmp_path / "idempotency.sqlite3")), poll_interval=0.01)
+    calls = []
+
+    async def execute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"statusCode": 200}
+
+    async def run():
+        return await asyncio.gather(*(idempotency.arun("k", "f", execute) for _ in range(3)))
+
+    assert asyncio.run(run()) == [{"statusCode": 200}] * 3
+    assert len(calls) == 1
+
+
+@pytest.mark.unit
+def test_async_store_calls_leave_the_loop_and_local_duplicates_do_not_poll(tmp_path):
+    class RecordingStore(SQLiteIdempotencyStore):
+        def __init__(self, path):
+            super().__init__(path)
+            self.threads = []
+
+        def get(self, key):
+            self.threads.append(threading.get_ident())
+            return super().get(key)
+
+    store = RecordingStore(str(tmp_path / "idempotency.sqlite3"))
+    idempotency = Idempotency(store, poll_interval=0.001)
+
+    async def execute():
+        await asyncio.sleep(0.2)
+        return {"statusCode": 200}
+
+    async def run():
+        return threading.get_ident(), await asyncio.gather(*(idempotency.arun("k", "f", execute) for _ in range(3)))
+
+    loop_thread, results = asyncio.run(run())
+    assert results == [{"statusCode": 200}] * 3
+    assert loop_thread not in store.threads
+    # One lookup per duplicate before it waits, and one after the execution finished
+    assert len(store.threads) <= 5
+
+
+@pytest.mark.unit
+def test_handler_replays_retried_requests(monkeypatch, tmp_path):
+    invocations = []
+
+    class FakeWorkflow:
+        def invoke(self, state):
+            invocations.append(state)
+            return {"document_content": state["document_content"], "routing": len(invocations)}
+
+    monkeypatch.setattr("app.get_app", lambda: FakeWorkflow())
+    monkeypatch.setattr(app, "_idempotency", None)
+    monkeypatch.setenv("IDEMPOTENCY_PATH", str(tmp_path / "idempotency.sqlite3"))
+    monkeypatch.delenv("IDEMPOTENCY_TABLE", raising=False)
+
+    event = {"body": json.dumps({"document_content": "invoice 42"})}
+    first, retry = app.handler(event, None), app.handler(event, None)
+    reused = app.handler({"headers": {"Idempotency-Key": "k-1"}, "body": json.dumps({"document_content": "a"})}, None)
+    conflict = app.handler({"headers": {"Idempotency-Key": "k-1"}, "body": json.dumps({"document_content": "b"})}, None)
+
+    assert first == retry
+    assert json.loads(first["body"])["routing"] == 1
+    assert len(invocations) == 2
+    assert reused["statusCode"] == 200
+    assert conflict["statusCode"] == 422
+
+
+@pytest.mark.unit
+def test_batches_with_failed_documents_are_not_replayed(monkeypatch, tmp_path):
+    invocations = []
+
+    class FlakyWorkflow:
+        def invoke(self, state):
+            invocations.append(state)
+            if len(invocations) == 1:
+                raise RuntimeError("provider unavailable")
+            return {"document_type": "invoice"}
+
+    monkeypatch.setattr("app.get_app", lambda: FlakyWorkflow())
+    monkeypatch.setattr(app, "_idempotency", None)
+    monkeypatch.setenv("IDEMPOTENCY_PATH", str(tmp_path / "idempotency.sqlite3"))
+    monkeypatch.delenv("IDEMPOTENCY_TABLE", raising=False)
+
+    event = {"body": json.dumps({"documents": ["invoice 42"]})}
+    first, retry, replay = (json.loads(app.handler(event, None)["body"]) for _ in range(3))
+
+    assert first["failed"] == 1
+    assert retry["failed"] == 0
+    assert replay == retry
+    assert len(invocations) == 2
@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+from src.services.langgraph.multi_agent_doc_processing.utils.json_stream import IncrementalJSONObjectParser
+from src.services.langgraph.multi_agent_doc_processing.agents.extract_agent.extract_data import extract_data, aextract_data
+
+class MockChunk:
+    def __init__(self, content):
+        self.content = content
+
+class StreamingLLM:
+    """Streams scripted chunks and records how much of the stream was consumed."""
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.consumed = 0
+        self.closed = False
+
+    def invoke(self, prompt):
+        raise AssertionError("streaming mode should not call invoke")
+
+    def stream(self, prompt):
+        try:
+            for chunk in self.chunks:
+                self.consumed += 1
+                yield MockChunk(chunk)
+        finally:
+            self.closed = True
+
+    async def astream(self, prompt):
+        try:
+            for chunk in self.chunks:
+                self.consumed += 1
+                yield MockChunk(chunk)
+        finally:
+            self.closed = True
+
+RECEIPT_CHUNKS = [
+    "Here is the data: {\"date\": \"2024-",
+    "06-01\", \"amount\": \"$ 4",
+    ".50\", \"vendor\": \"Cafe, {Main} St\"",
+    "}\n\nExplanation: the date was found ",
+    "near the top of the receipt and ...",
+    " (many more tokens)",
+]
+
+def receipt_state():
+    return {"document_type": "receipt", "document_content": "receipt", "error_count": 0, "messages": []}
+
+@pytest.mark.unit
+def test_parser_publishes_members_as_they_complete():
+    parser = IncrementalJSONObjectParser()
+    assert parser.feed('noise {"a": "x, y", "b": [1, {"c"') == {"a": "x, y"}
+    assert parser.feed(': 2}], "d": "\\"q\\""') == {"b": [1, {"c": 2}]}
+    assert parser.feed('}  trailing') == {"d": '"q"'}
+    assert parser.done
+    assert parser.feed('{"e": 1}') == {}
+
+@pytest.mark.unit
+def test_parser_keeps_completed_members_of_truncated_output():
+    parser = IncrementalJSONObjectParser()
+    parser.feed('{"date": "2024-06-01", "amount": "$ 4.5')
+    assert parser.fields == {"date": "2024-06-01"}
+    assert not parser.done
+
+@pytest.mark.unit
+def test_streaming_extraction_stops_after_last_field():
+    llm = StreamingLLM(RECEIPT_CHUNKS)
+    result = extract_data(receipt_state(), llm, streaming=True)
+    assert result["extracted_data"] == {"date": "2024-06-01", "amount": "$ 4.50", "vendor": "Cafe, {Main} St"}
+    assert llm.consumed == 4
+    assert llm.closed
+
+@pytest.mark.unit
+def test_async_streaming_extraction_survives_truncation():
+    llm = StreamingLLM(RECEIPT_CHUNKS[:2])
+    result = asyncio.run(aextract_data(receipt_state(), llm, streaming=True))
+    assert result["extracted_data"] == {"date": "2024-06-01", "amount": "NOT_FOUND", "vendor": "NOT_FOUND"}
+    assert result["next_action"] == "validate_data"
+    assert llm.closed
@@ -0,0 +1,158 @@
+import asyncio
+import pytest
+from src.services.langgraph.multi_agent_doc_processing.utils.llm_cache import (
+    CachedLLM, LRUCache, SQLiteCacheStore, DynamoDBCacheStore, cache_key,
+)
+from src.services.langgraph.multi_agent_doc_processing.agents.extract_agent.extract_data import extract_data
+
+class MockLLMResponse:
+    def __init__(self, content):
+        self.content = content
+
+class CountingLLM:
+    model = "mock-model"
+    temperature = 0
+
+    def __init__(self, content="invoice"):
+        self.content = content
+        self.calls = 0
+
+    def invoke(self, prompt):
+        self.calls += 1
+        return MockLLMResponse(self.content)
+
+class FakeTable:
+    """Local stand-in for a boto3 DynamoDB Table."""
+    def __init__(self):
+        self.items = {}
+
+    def get_item(self, Key):
+        item = self.items.get(Key["session_id"])
+        return {"Item": item} if item else {}
+
+    def put_item(self, Item):
+        self.items[Item["session_id"]] = Item
+
+@pytest.mark.unit
+def test_cached_llm_serves_repeated_prompts_from_memory():
+    llm = CountingLLM()
+    cached = CachedLLM(llm)
+
+    assert cached.invoke("Classify A").content == "invoice"
+    assert cached.invoke("Classify A").content == "invoice"
+    assert asyncio.run(cached.ainvoke("Classify A")).content == "invoice"
+    cached.invoke("Classify B")
+
+    assert llm.calls == 2
+    stats = cached.stats.snapshot()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 2
+    assert cached.model == "mock-model"   # attributes pass through
+
+@pytest.mark.unit
+def test_cache_key_depends_on_model_and_temperature():
+    a, b = CountingLLM(), CountingLLM()
+    b.temperature = 0.7
+    assert cache_key(a, "prompt") == cache_key(CountingLLM(), "prompt")
+    assert cache_key(a, "prompt") != cache_key(b, "prompt")
+
+@pytest.mark.unit
+def test_cache_key_depends_on_invoke_options():
+    llm = CountingLLM()
+    json_mode = {"response_format": {"type": "json_object"}}
+    assert cache_key(llm, "prompt", **json_mode) != cache_key(llm, "prompt")
+    assert cache_key(llm, "prompt", **json_mode) == cache_key(llm, "prompt", response_format={"type": "json_object"})
+
+    class KwargsLLM(CountingLLM):
+        def invoke(self, prompt, **kwargs):
+            return super().invoke(prompt)
+
+    inner = KwargsLLM()
+    cached = CachedLLM(inner)
+    cached.invoke("prompt")
+    cached.invoke("prompt", **json_mode)
+    cached.invoke("prompt", **json_mode)
+    assert inner.calls == 2
+
+@pytest.mark.unit
+def test_complete_streams_are_cached_and_replayed():
+    class StreamingLLM(CountingLLM):
+        def stream(self, prompt):
+            self.calls += 1
+            for word in ("in", "voice"):
+                yield MockLLMResponse(word)
+
+    inner = StreamingLLM()
+    cached = CachedLLM(inner)
+    assert not hasattr(CachedLLM(CountingLLM()), "stream")
+
+    partial = cached.stream("early stop")
+    next(partial)
+    partial.close()
+    assert [c.content for c in cached.stream("early stop")] == ["in", "voice"]  # the partial answer was not kept
+    assert [c.content for c in cached.stream("early stop")] == ["invoice"]
+    assert cached.invoke("early stop").content == "invoice"
+    assert inner.calls == 2
+
+@pytest.mark.unit
+def test_lru_evicts_oldest_and_expires_by_ttl(monkeypatch):
+    cache = LRUCache(max_entries=2, ttl=10)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")              # "b" is now least recently used
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.stats.evictions == 1
+
+    import time
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+    assert cache.get("a") is None
+    assert cache.stats.expirations == 1
+
+@pytest.mark.unit
+def test_sqlite_store_prunes_expired_and_least_recently_used_rows(tmp_path, monkeypatch):
+    import time
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr(time, "time", lambda: next(clock))
+    store = SQLiteCacheStore(path=str(tmp_path / "cache.sqlite3"), ttl=100, max_entries=2)
+    store.set("a", "1")
+    store.set("b", "2")
+    assert store.get("a") == "1"    # "b" is now least recently used
+    store.set("c", "3")
+    assert len(store) == 2
+    assert store.get("b") is None
+    assert store.get("a") == "1"
+
+    # Expired rows are deleted by the next write, not only skipped on read
+    monkeypatch.setattr(time, "time", lambda: 5000)
+    store.set("d", "4")
+    assert len(store) == 1 and store.get("d") == "4"
+
+@pytest.mark.unit
+@pytest.mark.parametrize("make_store", [
+    lambda tmp_path: SQLiteCacheStore(path=str(tmp_path / "cache.sqlite3")),
+    lambda tmp_path: DynamoDBCacheStore(FakeTable()),
+])
+def test_persistent_tier_survives_new_process_cache(tmp_path, make_store):
+    store = make_store(tmp_path)
+    first = CountingLLM()
+    CachedLLM(first, store=store).invoke("Extract these fields")
+
+    # A fresh in-process cache (e.g. a new Lambda container) still hits the store
+    second = CountingLLM()
+    cached = CachedLLM(second, store=store)
+    assert cached.invoke("Extract these fields").content == "invoice"
+    assert second.calls == 0
+    assert cached.stats.persistent_hits == 1
+
+@pytest.mark.unit
+def test_resubmitted_document_skips_extraction_llm_call():
+    llm = CountingLLM('{"date": "2024-06-01", "amount": "$ 5.00", "vendor": "Cafe"}')
+    cached = CachedLLM(llm)
+    for _ in range(3):
+        state = {"document_type": "receipt", "document_content": "Cafe receipt", "error_count": 0, "messages": []}
+        result = extract_data(state, cached)
+        assert result["extracted_data"]["vendor"] == "Cafe"
+    assert llm.calls == 1
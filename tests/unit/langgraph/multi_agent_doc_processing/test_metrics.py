@@ -0,0 +1,142 @@
+import asyncio
+import io
+import json
+import random
+import pytest
+from langchain_core.messages import AIMessage
+
+from src.services.langgraph.multi_agent_doc_processing.workflow import create_document_workflow
+from src.services.langgraph.multi_agent_doc_processing.utils.llm_cache import CachedLLM
+from src.services.langgraph.multi_agent_doc_processing.utils.metrics import (
+    EMFExporter,
+    Histogram,
+    InMemoryExporter,
+    Instrumentation,
+    record_queue_wait,
+)
+
+
+class ReceiptLLM:
+    """Answers with usage metadata, like a chat model."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, prompt):
+        self.calls += 1
+        if prompt.startswith("Classify"):
+            return AIMessage(content="receipt",
+                             usage_metadata={"input_tokens": 40, "output_tokens": 1, "total_tokens": 41})
+        content = json.dumps({"date": "2024-06-01", "amount": "$ 42.00", "vendor": "Corner Cafe"})
+        return AIMessage(content=content, usage_metadata={"input_tokens": 60, "output_tokens": 20, "total_tokens": 80})
+
+
+def initial_state():
+    return {
+        "document_content": "Receipt from Corner Cafe",
+        "extracted_data": {},
+        "error_count": 0,
+        "human_review_required": False,
+        "processing_stage": "received",
+        "messages": [],
+    }
+
+
+def by_node(documents):
+    return {document["Node"]: document for document in documents}
+
+
+@pytest.mark.unit
+def test_nodes_and_llm_calls_are_recorded_as_emf():
+    exporter = InMemoryExporter()
+    instrumentation = Instrumentation(exporter, cost_per_1k_tokens=0.5)
+    create_document_workflow(llm=ReceiptLLM(), instrumentation=instrumentation).invoke(initial_state())
+
+    documents = by_node(instrumentation.flush())
+    assert set(documents) == {"classify", "extract", "validate", "route"}
+    assert documents == by_node(exporter.documents)
+
+    extract = documents["extract"]
+    assert extract["_aws"]["CloudWatchMetrics"][0]["Namespace"] == "DocumentProcessing"
+    assert extract["_aws"]["CloudWatchMetrics"][0]["Dimensions"] == [["Node"]]
+    assert (extract["Invocations"], extract["Errors"], extract["LLMCalls"]) == (1, 0, 1)
+    assert (extract["PromptTokens"], extract["CompletionTokens"]) == (60, 20)
+    assert extract["Cost"] == pytest.approx(0.04)
+    assert extract["Latency"]["Count"] == 1 and len(extract["Latency"]["Values"]) == 1
+    assert documents["validate"]["LLMCalls"] == 0
+
+    # The next flush only covers new samples; the snapshot stays cumulative
+    assert instrumentation.flush() == []
+    assert instrumentation.snapshot()["classify"]["prompt_tokens"] == 40
+
+
+@pytest.mark.unit
+def test_async_runs_and_cache_hits():
+    instrumentation = Instrumentation(InMemoryExporter())
+    llm = CachedLLM(ReceiptLLM())
+    workflow = create_document_workflow(llm=llm, instrumentation=instrumentation)
+
+    async def run():
+        await workflow.ainvoke(initial_state())
+        await workflow.ainvoke(initial_state())
+
+    asyncio.run(run())
+    snapshot = instrumentation.snapshot()
+    assert snapshot["classify"]["invocations"] == 2
+    assert snapshot["classify"]["llm_calls"] == 1
+    assert snapshot["classify"]["cache_hits"] == 1
+    assert snapshot["extract"]["llm_latency_ms"]["count"] == 1
+
+
+@pytest.mark.unit
+def test_outcomes_and_queue_wait():
+    instrumentation = Instrumentation(InMemoryExporter())
+
+    def queued(state):
+        record_queue_wait(0.05)
+        return state
+
+    def failed(state):
+        raise RuntimeError("boom")
+
+    instrumentation.node("queued", queued)({})
+    instrumentation.node("errored", lambda state: {"next_action": "error_handling"})({})
+    with pytest.raises(RuntimeError):
+        instrumentation.node("failed", failed)({})
+
+    snapshot = instrumentation.snapshot()
+    assert snapshot["queued"]["queue_wait_ms"]["p50"] == pytest.approx(50, rel=0.03)
+    assert snapshot["errored"]["errors"] == 1
+    assert snapshot["failed"]["errors"] == 1
+    record_queue_wait(1.0)  # outside a node: ignored
+
+
+@pytest.mark.unit
+def test_histogram_percentiles_and_emf_value_limit():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(4, 1) for _ in range(5000)]
+    histogram = Histogram()
+    for value in values:
+        histogram.record(value)
+
+    ordered = sorted(values)
+    for q in (50, 95, 99):
+        assert histogram.percentile(q) == pytest.approx(ordered[int(q / 100 * len(ordered)) - 1], rel=0.05)
+
+    emf_values, counts = histogram.values_and_counts()
+    assert len(emf_values) <= 100
+    assert sum(counts) == 5000
+
+
+@pytest.mark.unit
+def test_emf_exporter_writes_json_lines():
+    stream = io.StringIO()
+    instrumentation = Instrumentation(EMFExporter(stream), namespace="Test", dimensions={"FunctionName": "fn"})
+    instrumentation.node("route", lambda state: state)({})
+    instrumentation.flush()
+
+    (line,) = stream.getvalue().splitlines()
+    document = json.loads(line)
+    assert document["_aws"]["CloudWatchMetrics"][0]["Dimensions"] == [["FunctionName", "Node"]]
+    assert document["FunctionName"] == "fn" and document["Node"] == "route"
+    assert document["LatencyP99"] >= 0
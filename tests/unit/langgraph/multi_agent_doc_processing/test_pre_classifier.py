@@ -0,0 +1,77 @@
+import pytest
+from src.services.langgraph.multi_agent_doc_processing.agents.classify_agent.pre_classifier import PreClassifier
+from src.services.langgraph.multi_agent_doc_processing.agents.classify_agent.classify_document import classify_document
+
+class MockLLMResponse:
+    def __init__(self, content):
+        self.content = content
+
+class CountingLLM:
+    def __init__(self, response_content):
+        self.response_content = response_content
+        self.calls = 0
+
+    def invoke(self, prompt):
+        self.calls += 1
+        return MockLLMResponse(self.response_content)
+
+def make_state(content):
+    return {
+       'document_id': 'TEST-020',
+       'document_name': 'Pre-classified Doc',
+       'document_content': content,
+       'processing_stage': '',
+       'confidence_score': 0.0,
+       'error_count': 0,
+       'extracted_data': {},
+       'validation_results': {},
+       'next_action': '',
+       'human_review_required': False,
+       'processing_complete': False,
+       'messages': [],
+       'document_type': ''
+   }
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "content,expected_type",
+    [
+        ("INVOICE #INV-2025-045\nBill To: ACME\nAmount Due: $ 12,500.00", "invoice"),
+        ("RECEIPT\nCorner Cafe\nSubtotal $ 4.00\nVisa xxxx 1234", "receipt"),
+        ("SOFTWARE LICENSE AGREEMENT\nContract Number: SLA-2025-012\nParties: A & B", "contract"),
+        ("Q1 2025 PERFORMANCE REPORT\nPrepared by: Ops\nExecutive Summary", "report"),
+    ]
+)
+def test_pre_classifier_confident_on_structured_documents(content, expected_type):
+    doc_type, confidence = PreClassifier().score(content)
+    assert doc_type == expected_type
+    assert confidence >= 0.9
+
+@pytest.mark.unit
+def test_pre_classifier_defers_weak_evidence():
+    classifier = PreClassifier(threshold=0.9)
+    assert classifier.classify("This is a fake invoice for $ 1000.") is None
+    assert classifier.classify("Random unrelated text.") is None
+    # A header alone is not enough to skip the LLM
+    assert classifier.classify("RECEIPT") is None
+
+@pytest.mark.unit
+def test_classify_document_short_circuits_llm_and_counts():
+    classifier = PreClassifier(threshold=0.9)
+    llm = CountingLLM("report")
+
+    skipped = classify_document(make_state("INVOICE #123\nAmount Due: $ 50.00"), llm, pre_classifier=classifier)
+    assert skipped["document_type"] == "invoice"
+    assert skipped["next_action"] == "extract_data"
+    assert llm.calls == 0
+
+    asked = classify_document(make_state("Quarterly numbers"), llm, pre_classifier=classifier)
+    assert asked["document_type"] == "report"
+    assert llm.calls == 1
+
+    stats = classifier.stats.snapshot()
+    assert stats["evaluated"] == 2
+    assert stats["short_circuited"] == 1
+    assert stats["deferred"] == 1
+    assert stats["by_type"] == {"invoice": 1}
+    assert stats["short_circuit_rate"] == pytest.approx(0.5)
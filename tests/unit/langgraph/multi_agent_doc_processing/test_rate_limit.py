@@ -0,0 +1,250 @@
+import asyncio
+import threading
+import time
+import pytest
+
+from src.services.langgraph.multi_agent_doc_processing.utils.llm_cache import CachedLLM
+from src.services.langgraph.multi_agent_doc_processing.utils.rate_limit import (
+    RateLimitedLLM,
+    RateLimiter,
+    RateLimitScheduler,
+    TokenBucket,
+    current_priority,
+    prioritized,
+    priority_for,
+    retry_after,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class MockLLMResponse:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers):
+        self.status_code = status_code
+        self.headers = headers
+
+
+class RateLimitError(Exception):
+    def __init__(self, retry_after_seconds):
+        super().__init__("429 Too Many Requests")
+        self.status_code = 429
+        self.response = FakeResponse(429, {"retry-after": str(retry_after_seconds)})
+
+
+@pytest.mark.unit
+def test_token_bucket_refills_at_per_minute_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(per_minute=60, capacity=2, clock=clock)
+    assert bucket.wait_time(2) == 0
+    bucket.take(2)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    clock.now = 1.0
+    assert bucket.wait_time(1) == 0
+
+
+@pytest.mark.unit
+def test_priority_follows_document_thresholds():
+    assert priority_for("invoice") > priority_for("receipt") > priority_for("contract") > priority_for("report")
+    assert priority_for("unknown") == priority_for("report") == 0
+
+
+@pytest.mark.unit
+def test_scheduler_admits_queued_calls_in_priority_order():
+    scheduler = RateLimitScheduler(requests_per_minute=1200, burst_seconds=0.05)  # 1-request bucket, 20/s
+    scheduler.acquire()  # drain the bucket so the next callers queue
+
+    order = []
+
+    def call(priority):
+        scheduler.acquire(priority=priority)
+        order.append(priority)
+
+    threads = []
+    for priority in (0, 1, 3, 2):
+        thread = threading.Thread(target=call, args=(priority,))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.005)  # all four are queued before the bucket refills (50 ms)
+    for thread in threads:
+        thread.join()
+
+    assert order == [3, 2, 1, 0]
+    stats = scheduler.stats()
+    assert stats["admitted"] == 5
+    assert stats["peak_queue_depth"] == 4
+    assert stats["queue_depth"] == 0
+    assert stats["max_wait_seconds"] > 0
+
+
+@pytest.mark.unit
+def test_requests_are_held_to_the_budget():
+    scheduler = RateLimitScheduler(requests_per_minute=600, burst_seconds=0.1)  # 10/s, 1 burst
+    start = time.perf_counter()
+    for _ in range(4):
+        scheduler.acquire()
+    assert time.perf_counter() - start >= 0.28
+
+
+@pytest.mark.unit
+def test_retry_after_parses_rate_limit_errors():
+    assert retry_after(RateLimitError(3)) == 3.0
+    assert retry_after(ValueError("bad json")) is None
+
+
+@pytest.mark.unit
+def test_rate_limited_llm_retries_429_after_retry_after():
+    class ThrottledLLM:
+        def __init__(self):
+            self.calls = []
+
+        def invoke(self, prompt):
+            self.calls.append(time.perf_counter())
+            if len(self.calls) == 1:
+                raise RateLimitError(0.1)
+            return MockLLMResponse("ok")
+
+    inner = ThrottledLLM()
+    scheduler = RateLimitScheduler(requests_per_minute=6000)
+    llm = RateLimitedLLM(inner, scheduler)
+
+    assert llm.invoke("prompt").content == "ok"
+    assert len(inner.calls) == 2
+    assert inner.calls[1] - inner.calls[0] >= 0.1
+    assert scheduler.stats()["throttled"] == 1
+
+
+@pytest.mark.unit
+def test_rate_limited_llm_gives_up_after_max_retries():
+    class AlwaysThrottled:
+        def invoke(self, prompt):
+            raise RateLimitError(0)
+
+    llm = RateLimitedLLM(AlwaysThrottled(), RateLimitScheduler(), max_retries=2, max_backoff=0.01)
+    with pytest.raises(RateLimitError):
+        llm.invoke("prompt")
+
+
+@pytest.mark.unit
+def test_async_calls_wait_for_token_budget():
+    class EchoLLM:
+        async def ainvoke(self, prompt):
+            return MockLLMResponse("ok")
+
+    # 60k tokens/min = 1000/s; each call reserves ~100 tokens after the 50-token burst is used
+    scheduler = RateLimitScheduler(tokens_per_minute=60_000, burst_seconds=0.05)
+    llm = RateLimitedLLM(EchoLLM(), scheduler, expected_output_tokens=50)
+
+    async def run():
+        start = time.perf_counter()
+        await asyncio.gather(*(llm.ainvoke("word " * 48) for _ in range(4)))
+        return time.perf_counter() - start
+
+    assert asyncio.run(run()) >= 0.1
+    assert scheduler.stats()["admitted"] == 4
+
+
+@pytest.mark.unit
+def test_limiter_shares_scheduler_per_model_and_prioritized_sets_context():
+    class Model:
+        def __init__(self, model):
+            self.model = model
+
+    limiter = RateLimiter(limits={"big": (10, None)}, default=(100, None))
+    assert limiter.scheduler_for(Model("big")) is limiter.wrap(Model("big")).scheduler
+    assert limiter.scheduler_for(Model("small")) is not limiter.scheduler_for(Model("big"))
+    assert "Model:big" in limiter.stats()
+
+    seen = []
+    node = prioritized(lambda state: seen.append(current_priority.get()) or state)
+    node({"document_type": "invoice"})
+    assert seen == [priority_for("invoice")]
+    assert current_priority.get() == 0
+
+
+@pytest.mark.unit
+def test_cache_hits_skip_a_limiter_under_the_cache():
+    class EchoLLM:
+        model = "echo"
+
+        def invoke(self, prompt):
+            return MockLLMResponse("ok")
+
+    limiter = RateLimiter(default=(6000, None))
+    llm = CachedLLM(limiter.wrap(EchoLLM()))
+    assert limiter.wrap(llm) is llm
+
+    llm.invoke("prompt")
+    llm.invoke("prompt")
+    assert limiter.stats()["EchoLLM:echo"]["admitted"] == 1
+
+
+@pytest.mark.unit
+def test_streams_retry_429_and_settle_streamed_tokens():
+    class ThrottledStream:
+        def __init__(self):
+            self.attempts = 0
+
+        def stream(self, prompt):
+            self.attempts += 1
+            if self.attempts == 1:
+                raise RateLimitError(0)
+            for word in ("one", "two", "three", "four"):
+                yield MockLLMResponse(word + " ")
+
+    scheduler = RateLimitScheduler(tokens_per_minute=60_000)
+    llm = RateLimitedLLM(ThrottledStream(), scheduler, expected_output_tokens=500)
+    start = scheduler.buckets["tokens"].level
+
+    stream = llm.stream("prompt")
+    assert [next(stream).content for _ in range(2)] == ["one ", "two "]
+    stream.close()  # the caller stops once it has what it needs
+
+    assert llm.llm.attempts == 2
+    assert scheduler.stats()["throttled"] == 1
+    # Only the prompt and the two streamed words stay charged, not the 500 expected tokens
+    assert start - scheduler.buckets["tokens"].level < 20
+
+
+@pytest.mark.unit
+def test_async_streams_retry_429():
+    class ThrottledStream:
+        def __init__(self):
+            self.attempts = 0
+
+        async def astream(self, prompt):
+            self.attempts += 1
+            if self.attempts == 1:
+                raise RateLimitError(0)
+            yield MockLLMResponse("ok")
+
+    llm = RateLimitedLLM(ThrottledStream(), RateLimitScheduler(requests_per_minute=6000))
+
+    async def run():
+        return [chunk.content async for chunk in llm.astream("prompt")]
+
+    assert asyncio.run(run()) == ["ok"]
+
+
+@pytest.mark.unit
+def test_interrupted_acquire_leaves_the_queue():
+    scheduler = RateLimitScheduler(requests_per_minute=60, burst_seconds=1)
+    scheduler.acquire()  # drain the bucket so the next caller waits
+
+    def interrupted(timeout=None):
+        raise KeyboardInterrupt
+
+    scheduler._ready.wait = interrupted
+    with pytest.raises(KeyboardInterrupt):
+        scheduler.acquire()
+    assert scheduler.stats()["queue_depth"] == 0
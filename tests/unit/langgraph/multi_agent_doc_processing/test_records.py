@@ -0,0 +1,125 @@
+import json
+import pickle
+import sys
+import pytest
+
+from src.services.langgraph.multi_agent_doc_processing.workflow import create_document_workflow
+from src.services.langgraph.multi_agent_doc_processing.utils.audit import record_event
+from src.services.langgraph.multi_agent_doc_processing.utils.checkpoint import (
+    KVCheckpointSaver,
+    SQLiteCheckpointStore,
+    resume_with_corrections,
+    thread_config,
+)
+from src.services.langgraph.multi_agent_doc_processing.utils.records import (
+    ExtractionRecord,
+    RecordView,
+    RoutingRecord,
+    ValidationRecord,
+)
+
+
+class MockLLMResponse:
+    def __init__(self, content):
+        self.content = content
+
+
+class ReceiptLLM:
+    def __init__(self, extraction):
+        self.extraction = extraction
+
+    def invoke(self, prompt):
+        if prompt.startswith("Classify"):
+            return MockLLMResponse("receipt")
+        return MockLLMResponse(json.dumps(self.extraction))
+
+
+COMPLETE = {"date": "2024-06-01", "amount": "$ 42.00", "vendor": "Corner Cafe"}
+
+
+def initial_state(**flags):
+    return {
+        "document_content": "Receipt from Corner Cafe",
+        "extracted_data": {},
+        "error_count": 0,
+        "human_review_required": False,
+        "processing_stage": "received",
+        "messages": [],
+        **flags,
+    }
+
+
+@pytest.mark.unit
+def test_records_read_like_the_dicts_they_replace():
+    extraction = ExtractionRecord.from_dict("receipt", {"vendor": "Corner Cafe", "date": "2024-06-01"})
+    assert extraction == {"date": "2024-06-01", "amount": "NOT_FOUND", "vendor": "Corner Cafe"}
+    assert extraction["vendor"] == "Corner Cafe" and extraction.get("title") is None
+    assert not hasattr(extraction, "__dict__")
+
+    validation = ValidationRecord.from_dict(
+        "receipt", {"overall_score": 0.5, "field_scores": {"date": 1.0, "vendor": 0.5}, "missing_fields": ["amount"]})
+    assert validation["field_scores"] == {"date": 1.0, "amount": 0.0, "vendor": 0.5}
+    assert validation.to_dict() == {"overall_score": 0.5, "field_scores": {"date": 1.0, "amount": 0.0, "vendor": 0.5},
+                                    "missing_fields": ["amount"], "issues": []}
+
+    routing = RoutingRecord("expense_management", False, "medium", "REF-1", "2024-06-01T00:00:00", "success")
+    assert dict(routing)["reference_id"] == "REF-1"
+    assert pickle.loads(pickle.dumps(routing)) == routing
+
+    class Incomplete(RecordView):
+        def _keys(self):
+            return ()
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+@pytest.mark.unit
+def test_compact_quiet_run_keeps_records_and_codes_only():
+    workflow = create_document_workflow(llm=ReceiptLLM(COMPLETE))
+    result = workflow.invoke(initial_state(compact_state=True, audit_verbose=False))
+
+    assert isinstance(result["extracted_data"], ExtractionRecord)
+    assert isinstance(result["validation_results"], ValidationRecord)
+    assert isinstance(result["routing_result"], RoutingRecord)
+    assert result["extracted_data"] == COMPLETE
+    assert result["processing_complete"] is True
+    assert result["messages"] == []
+    assert [code for code, _ in result["audit_trail"]] == ["classified", "extracted", "validated", "routed"]
+
+
+@pytest.mark.unit
+def test_default_run_keeps_dicts_and_messages():
+    result = create_document_workflow(llm=ReceiptLLM(COMPLETE)).invoke(initial_state())
+
+    assert type(result["extracted_data"]) is dict
+    assert type(result["routing_result"]) is dict
+    assert len(result["messages"]) == len(result["audit_trail"]) == 4
+
+
+@pytest.mark.unit
+def test_event_codes_are_interned_and_messages_lazy():
+    quiet, verbose = {"audit_verbose": False}, {}
+    record_event(quiet, "".join(["ext", "racted"]), lambda: pytest.fail("message built in quiet mode"))
+    record_event(verbose, "extracted", lambda: "Extracted 3 fields")
+
+    assert quiet["audit_trail"][0][0] is sys.intern("extracted")
+    assert "messages" not in quiet
+    assert verbose["messages"][0].content == "Extracted 3 fields"
+
+
+@pytest.mark.unit
+def test_compact_records_survive_checkpoints(tmp_path):
+    saver = KVCheckpointSaver(SQLiteCheckpointStore(str(tmp_path / "checkpoints.sqlite3")))
+    llm = ReceiptLLM({**COMPLETE, "date": "NOT_FOUND", "amount": "NOT_FOUND"})
+    workflow = create_document_workflow(llm=llm, checkpointer=saver)
+    reviewed = workflow.invoke(initial_state(compact_state=True, audit_verbose=False), thread_config("doc-1"))
+    assert reviewed["human_review_required"] is True
+
+    restored = workflow.get_state(thread_config("doc-1")).values
+    assert isinstance(restored["extracted_data"], ExtractionRecord)
+    assert restored["extracted_data"] == reviewed["extracted_data"]
+
+    result = resume_with_corrections(workflow, "doc-1", {"date": "2024-06-01", "amount": "$ 42.00"})
+    assert result["extracted_data"] == COMPLETE
+    assert result["processing_complete"] is True
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import pytest
+
+from src.services.langgraph.multi_agent_doc_processing.workflow import create_document_workflow
+from src.services.langgraph.multi_agent_doc_processing.utils.cascade import CascadeConfig
+from src.services.langgraph.multi_agent_doc_processing.utils.repair import RepairConfig
+from src.services.langgraph.multi_agent_doc_processing.agents.repair_agent.repair_fields import build_repair_prompt
+
+
+class MockLLMResponse:
+    def __init__(self, content):
+        self.content = content
+
+
+class ScriptedLLM:
+    """Classifies as 'receipt'; answers extraction prompts, then repair prompts in turn."""
+
+    def __init__(self, extraction, repairs=()):
+        self.extraction = extraction
+        self.repairs = list(repairs)
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        if prompt.startswith("Classify"):
+            return MockLLMResponse("receipt")
+        if prompt.startswith("Re-check"):
+            return MockLLMResponse(json.dumps(self.repairs.pop(0) if self.repairs else {}))
+        return MockLLMResponse(json.dumps(self.extraction))
+
+    def repair_prompts(self):
+        return [prompt for prompt in self.prompts if prompt.startswith("Re-check")]
+
+
+def initial_state(content="Receipt from Corner Cafe, total forty-two dollars"):
+    return {
+        "document_content": content,
+        "extracted_data": {},
+        "error_count": 0,
+        "human_review_required": False,
+        "processing_stage": "received",
+        "messages": [],
+    }
+
+
+PARTIAL = {"date": "2024-06-01", "amount": "NOT_FOUND", "vendor": "NOT_FOUND"}
+
+
+@pytest.mark.unit
+def test_repair_requests_only_failing_fields_and_routes():
+    llm = ScriptedLLM(PARTIAL, repairs=[{"amount": "$ 42.00", "vendor": "Corner Cafe"}])
+    repair = RepairConfig(max_iterations=2)
+    result = create_document_workflow(llm=llm, repair=repair).invoke(initial_state())
+
+    prompts = llm.repair_prompts()
+    assert len(prompts) == 1
+    assert "amount" in prompts[0] and "vendor" in prompts[0]
+    assert "- date" not in prompts[0]
+    assert result["extracted_data"]["date"] == "2024-06-01"
+    assert result["extracted_data"]["amount"] == "$ 42.00"
+    assert result["human_review_required"] is False
+    assert result["processing_complete"] is True
+    assert result["repair_attempts"] == 1
+    assert repair.stats.snapshot()["resolved"] == 1
+
+
+@pytest.mark.unit
+def test_repair_stops_after_max_iterations_then_human_review():
+    llm = ScriptedLLM(PARTIAL)
+    repair = RepairConfig(max_iterations=2)
+    result = create_document_workflow(llm=llm, repair=repair).invoke(initial_state())
+
+    assert len(llm.repair_prompts()) == 2
+    assert result["repair_attempts"] == 2
+    assert result["human_review_required"] is True
+    assert repair.stats.snapshot()["exhausted"] == 1
+
+
+@pytest.mark.unit
+def test_repair_respects_token_budget():
+    llm = ScriptedLLM(PARTIAL)
+    repair = RepairConfig(max_iterations=5, max_tokens=10)
+    result = create_document_workflow(llm=llm, repair=repair).invoke(initial_state())
+
+    assert llm.repair_prompts() == []
+    assert result.get("repair_attempts", 0) == 0
+    assert result["human_review_required"] is True
+
+
+@pytest.mark.unit
+def test_repair_keeps_previous_value_when_not_improved():
+    llm = ScriptedLLM({"date": "2024-06-01", "amount": "forty-two", "vendor": "Corner Cafe"},
+                      repairs=[{"amount": "NOT_FOUND"}])
+    result = create_document_workflow(llm=llm, repair=RepairConfig(max_iterations=1)).invoke(initial_state())
+
+    assert result["extracted_data"]["amount"] == "forty-two"
+    assert 'amount: "forty-two" failed validation' in llm.repair_prompts()[0]
+
+
+@pytest.mark.unit
+def test_repair_skips_documents_with_doubtful_classification():
+    state = {"document_type": "receipt", "confidence_score": 0.5,
+             "validation_results": {"missing_fields": ["amount"], "field_scores": {"amount": 0.0}}}
+    assert RepairConfig().should_repair(state) is False
+
+
+@pytest.mark.unit
+def test_repair_prompt_is_trimmed_for_long_documents():
+    from src.services.langgraph.multi_agent_doc_processing.utils.chunking import LongDocumentConfig, count_tokens
+    state = {"document_type": "receipt", "document_content": "word " * 5000, "extracted_data": {}}
+    prompt = build_repair_prompt(state, ["amount"], LongDocumentConfig(max_prompt_tokens=300))
+    assert count_tokens(prompt) <= 300
+
+
+@pytest.mark.unit
+def test_repair_after_escalation_uses_larger_model():
+    small = ScriptedLLM({"date": "2024-06-01", "amount": "NOT_FOUND", "vendor": "NOT_FOUND"})
+    large = ScriptedLLM({"vendor": "Corner Cafe", "amount": "NOT_FOUND"}, repairs=[{"amount": "$ 42.00"}])
+    cascade = CascadeConfig(large, min_score=0.8)
+    repair = RepairConfig(max_iterations=1)
+    workflow = create_document_workflow(llm=small, cascade=cascade, repair=repair)
+
+    result = workflow.invoke(initial_state())
+
+    assert result["model_tier"] == "large"
+    assert small.repair_prompts() == []
+    assert len(large.repair_prompts()) == 1
+    assert result["extracted_data"]["amount"] == "$ 42.00"
+    assert result["processing_complete"] is True
+    assert cascade.stats.documents == 1
+    assert cascade.stats.escalated == 1
+
+
+@pytest.mark.unit
+def test_repair_async():
+    llm = ScriptedLLM(PARTIAL, repairs=[{"amount": "$ 42.00", "vendor": "Corner Cafe"}])
+    workflow = create_document_workflow(llm=llm, repair=RepairConfig())
+    result = asyncio.run(workflow.ainvoke(initial_state()))
+
+    assert result["extracted_data"]["vendor"] == "Corner Cafe"
+    assert result["processing_complete"] is True
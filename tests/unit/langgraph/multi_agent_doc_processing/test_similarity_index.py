@@ -0,0 +1,103 @@
+import pytest
+from src.services.langgraph.multi_agent_doc_processing.utils.similarity_index import NearDuplicateIndex
+from src.services.langgraph.multi_agent_doc_processing.workflow import create_document_workflow
+
+TEMPLATE = """ACME OFFICE SUPPLIES LTD
+Vendor: Acme Office Supplies
+Invoice number {number}
+Issued on {date}
+Please remit payment to account 0042 within thirty days of receipt of this invoice.
+Line items: paper, toner, staples, desk organisers and assorted stationery.
+Amount: $ {amount}
+Thank you for your continued business with Acme Office Supplies."""
+
+class MockLLMResponse:
+    def __init__(self, content):
+        self.content = content
+
+class CountingLLM:
+    def __init__(self):
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        if "Classify" in prompt:
+            return MockLLMResponse("invoice")
+        return MockLLMResponse(
+            '{"invoice_number": "INV-1", "date": "2024-06-01", "amount": "$ 100.00", "vendor": "Acme Office Supplies"}'
+        )
+
+def make_state(content):
+    return {"document_content": content, "error_count": 0, "human_review_required": False, "messages": []}
+
+@pytest.mark.unit
+def test_lookup_finds_templated_near_duplicate_only():
+    index = NearDuplicateIndex()
+    index.add(TEMPLATE.format(number="INV-1", date="2024-06-01", amount="100.00"), "invoice",
+              {"vendor": "Acme Office Supplies", "amount": "$ 100.00"})
+
+    match = index.lookup(TEMPLATE.format(number="INV-987", date="2025-01-15", amount="2,450.10"))
+    assert match is not None
+    assert match.document_type == "invoice"
+    assert match.similarity >= 0.8
+    assert match.head_start("... Acme Office Supplies ... $ 2,450.10") == {"vendor": "Acme Office Supplies"}
+
+    assert index.lookup("Quarterly performance report prepared by the operations team.") is None
+    assert index.stats()["hits"] == 1
+
+@pytest.mark.unit
+def test_index_is_bounded():
+    index = NearDuplicateIndex(max_entries=3)
+    for i in range(5):
+        index.add(f"document {i} " + "word " * i + chr(97 + i) * 5, "report", {})
+    assert len(index) == 3
+    assert index.stats()["evictions"] == 2
+
+@pytest.mark.unit
+def test_workflow_reuses_type_and_head_start_for_near_duplicates():
+    index = NearDuplicateIndex()
+    llm = CountingLLM()
+    workflow = create_document_workflow(llm=llm, similarity_index=index)
+
+    workflow.invoke(make_state(TEMPLATE.format(number="INV-1", date="2024-06-01", amount="100.00")))
+    assert len(llm.prompts) == 2
+    assert len(index) == 1
+
+    result = workflow.invoke(make_state(TEMPLATE.format(number="INV-2", date="2024-07-01", amount="250.00")))
+    # Classification came from the index; extraction only asked for the fields that change
+    assert len(llm.prompts) == 3
+    assert "Classify" not in llm.prompts[-1]
+    assert '"vendor"' not in llm.prompts[-1]
+    assert result["document_type"] == "invoice"
+    assert result["extracted_data"]["vendor"] == "Acme Office Supplies"
+
+@pytest.mark.unit
+def test_near_duplicates_refresh_one_entry_instead_of_growing_buckets():
+    index = NearDuplicateIndex()
+    for i in range(200):
+        index.add(TEMPLATE.format(number=f"INV-{i}", date="2024-06-01", amount=f"{i}.00"), "invoice",
+                  {"invoice_number": f"INV-{i}"})
+
+    assert len(index) == 1
+    assert max(len(bucket) for bucket in index._buckets.values()) == 1
+    assert index.stats()["refreshes"] == 199
+    assert index.lookup(TEMPLATE.format(number="INV-x", date="2025-01-01", amount="1.00")).extracted_data == {
+        "invoice_number": "INV-199"}
+
+    index.add(TEMPLATE.format(number="R-1", date="2024-06-01", amount="1.00"), "receipt", {})
+    assert len(index) == 2  # same layout, different type: kept apart
+
+@pytest.mark.unit
+def test_refreshed_entry_takes_the_new_documents_signature():
+    index = NearDuplicateIndex(threshold=0.5)
+    base = TEMPLATE.format(number="INV-1", date="2024-06-01", amount="1.00")
+    for note in ("urgent", "priority courier", "collect at front desk"):
+        latest = f"{base}\nDelivery note: {note}"
+        index.add(latest, "invoice", {"note": note})
+
+    assert len(index) == 1 and index.stats()["refreshes"] == 2
+    (signature, keys, payload), = index._entries.values()
+    assert (signature == index.signature(latest)).all()
+    assert set(index._buckets) == set(keys)
+    assert payload[2] == {"note": "collect at front desk"}
+
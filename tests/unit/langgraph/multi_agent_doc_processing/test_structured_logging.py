@@ -0,0 +1,89 @@
+import io
+import json
+import logging
+import threading
+import pytest
+
+from src.services.langgraph.multi_agent_doc_processing.logging.structured import (
+    BufferedQueueHandler,
+    SamplingFilter,
+    configure_logging,
+    flush_logs,
+    get_logger,
+    log_context,
+)
+
+
+class Recorder:
+    """Argument that records when, and on which thread, it is formatted."""
+
+    def __init__(self):
+        self.threads = []
+
+    def __str__(self):
+        self.threads.append(threading.current_thread())
+        return "recorded"
+
+
+@pytest.fixture
+def log_output():
+    output = io.StringIO()
+    configure_logging(level="INFO", sample_rate=1.0, handler=logging.StreamHandler(output))
+
+    def lines():
+        assert flush_logs(timeout=2.0)
+        return [json.loads(line) for line in output.getvalue().splitlines()]
+
+    yield lines
+    configure_logging()
+
+
+@pytest.mark.unit
+def test_json_lines_carry_correlation_fields(log_output):
+    log = get_logger("src.services.langgraph.multi_agent_doc_processing.agents.test", stage="extract")
+    with log_context(document_id="doc-1"):
+        log.info("Extracted %d/%d fields", 2, 3, extra={"field": "amount"})
+    log.warning("outside")
+
+    first, second = log_output()
+    assert first["message"] == "Extracted 2/3 fields"
+    assert (first["level"], first["document_id"], first["stage"], first["field"]) == ("INFO", "doc-1", "extract", "amount")
+    assert second["document_id"] is None
+
+
+@pytest.mark.unit
+def test_formatting_is_lazy_and_off_the_calling_thread(log_output):
+    log = get_logger("src.services.langgraph.multi_agent_doc_processing.agents.test")
+    skipped, logged = Recorder(), Recorder()
+    log.debug("field %s", skipped)
+    log.info("field %s", logged)
+
+    assert log_output()[0]["message"] == "field recorded"
+    assert skipped.threads == []
+    # pytest's own capture handlers also format on this thread; ours formats on the listener's
+    assert any(thread is not threading.current_thread() for thread in logged.threads)
+
+
+@pytest.mark.unit
+def test_field_lines_are_sampled_per_document():
+    sampler = SamplingFilter(0.5)
+
+    def kept(document_id, sampled=True):
+        record = logging.makeLogRecord({"msg": "x", "document_id": document_id, "sampled": sampled})
+        return sampler.filter(record)
+
+    decisions = [kept(f"doc-{i}") for i in range(200)]
+    assert 60 < sum(decisions) < 140
+    assert decisions == [kept(f"doc-{i}") for i in range(200)]
+    assert all(kept(f"doc-{i}", sampled=False) for i in range(20))
+    assert not SamplingFilter(0.0).filter(logging.makeLogRecord({"msg": "x", "sampled": True}))
+
+
+@pytest.mark.unit
+def test_full_queue_drops_instead_of_blocking():
+    import queue
+
+    handler = BufferedQueueHandler(queue.Queue(maxsize=1))
+    for _ in range(3):
+        handler.handle(logging.makeLogRecord({"msg": "x"}))
+    assert handler.dropped == 2
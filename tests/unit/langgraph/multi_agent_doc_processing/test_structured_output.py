@@ -0,0 +1,104 @@
+import json
+import pytest
+
+from src.services.langgraph.multi_agent_doc_processing.agents.extract_agent.extract_data import extract_data
+from src.services.langgraph.multi_agent_doc_processing.utils.cascade import CascadeStats, TierMeter
+from src.services.langgraph.multi_agent_doc_processing.utils.structured_output import (
+    decode_extraction,
+    extraction_schema,
+    structured_output_kwargs,
+)
+
+
+class MockLLMResponse:
+    def __init__(self, content):
+        self.content = content
+
+
+class ProviderLLM:
+    """Fake provider client recording the kwargs of each call."""
+
+    def __init__(self, llm_type, content="", **attrs):
+        self._llm_type = llm_type
+        self.content = content
+        self.kwargs = []
+        self.__dict__.update(attrs)
+
+    def invoke(self, prompt, **kwargs):
+        self.kwargs.append(kwargs)
+        return MockLLMResponse(self.content)
+
+
+def invoice_state():
+    return {
+        "document_content": "INVOICE #12345\nDate: 2024-06-01\nVendor: TechSupply Corp\nAmount Due: $ 1000.00",
+        "document_type": "invoice",
+        "extracted_data": {},
+        "error_count": 0,
+        "messages": [],
+    }
+
+
+@pytest.mark.unit
+def test_schema_is_built_once_per_type_and_fields():
+    fields = ("invoice_number", "amount")
+    schema = extraction_schema("invoice", fields)
+    assert schema is extraction_schema("invoice", fields)
+    assert schema["required"] == ["invoice_number", "amount"]
+    assert schema["additionalProperties"] is False
+    assert set(schema["properties"]) == set(fields)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("llm, expected", [
+    (ProviderLLM("openai-chat"), "json_schema"),
+    (ProviderLLM("openai-chat", openai_api_base="https://api.deepseek.com"), "json_object"),
+    (ProviderLLM("ollama-llm"), "format"),
+    (ProviderLLM("chat-ollama"), "format"),
+    (ProviderLLM("groq-chat"), "json_object"),
+    (ProviderLLM("anthropic-chat"), None),
+])
+def test_provider_specific_kwargs(llm, expected):
+    kwargs = structured_output_kwargs(llm, "receipt", ["date", "amount", "vendor"])
+    if expected is None:
+        assert kwargs == {}
+    elif expected == "format":
+        assert kwargs["format"]["required"] == ["date", "amount", "vendor"]
+    else:
+        assert kwargs["response_format"]["type"] == expected
+
+
+@pytest.mark.unit
+def test_kwargs_see_through_wrappers():
+    wrapped = TierMeter(ProviderLLM("openai-chat"), "small", CascadeStats())
+    assert "response_format" in structured_output_kwargs(wrapped, "receipt", ["date"])
+
+
+@pytest.mark.unit
+def test_decode_extraction_is_a_direct_decode():
+    assert decode_extraction('{"date": "2024-06-01", "amount": 12, "extra": "x"}', ["date", "amount", "vendor"]) == {
+        "date": "2024-06-01", "amount": "12", "vendor": "NOT_FOUND",
+    }
+    assert decode_extraction('Sure! {"date": "2024-06-01"}', ["date"]) is None
+
+
+@pytest.mark.unit
+def test_extract_data_uses_schema_and_direct_decode():
+    answer = {"invoice_number": "12345", "date": "2024-06-01", "amount": "$ 1000.00", "vendor": "TechSupply Corp"}
+    llm = ProviderLLM("openai-chat", json.dumps(answer))
+
+    state = extract_data(invoice_state(), llm, structured_output=True)
+
+    assert state["extracted_data"] == answer
+    sent = llm.kwargs[0]["response_format"]
+    assert sent["json_schema"]["strict"] is True
+    assert sent["json_schema"]["schema"]["required"] == ["invoice_number", "date", "amount", "vendor"]
+
+
+@pytest.mark.unit
+def test_extract_data_falls_back_to_text_parsing():
+    llm = ProviderLLM("anthropic-chat", 'Here you go: {"invoice_number": "12345"}')
+    state = extract_data(invoice_state(), llm, structured_output=True)
+    assert llm.kwargs == [{}]
+    assert state["extracted_data"]["invoice_number"] == "12345"
+    assert state["extracted_data"]["vendor"] == "NOT_FOUND"
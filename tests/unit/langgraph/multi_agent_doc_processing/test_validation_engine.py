@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from src.services.langgraph.multi_agent_doc_processing.agents.validate_agent.validation_engine import (
+    check_amount,
+    check_date,
+    compile_schema,
+    revalidate,
+    validate_batch,
+    validate_record,
+)
+
+RECORDS = [
+    {"invoice_number": "#12345", "date": "2024-06-01", "amount": "$ 1,000.00", "vendor": "TechSupply Corp"},
+    {"invoice_number": "12", "date": "June 1, 2024", "amount": "one thousand", "vendor": "X"},
+    {"invoice_number": "NOT_FOUND", "date": "yesterday", "amount": "$ 0.00", "vendor": "   "},
+    {"date": None, "amount": 250, "vendor": "A" * 201},
+    {},
+]
+
+
+@pytest.mark.unit
+def test_schema_is_compiled_once_per_type():
+    assert compile_schema("invoice") is compile_schema("invoice")
+    assert compile_schema("invoice").fields == ("invoice_number", "date", "amount", "vendor")
+    assert compile_schema("unknown").fields == ()
+
+
+@pytest.mark.unit
+def test_record_scores_match_field_rules():
+    results = validate_record("invoice", RECORDS[1])
+    assert results["field_scores"] == {"invoice_number": 0.5, "date": 1.0, "amount": 0.3, "vendor": 0.6}
+    assert results["missing_fields"] == []
+    assert results["overall_score"] == pytest.approx(0.6)
+
+    missing = validate_record("invoice", RECORDS[2])
+    assert missing["missing_fields"] == ["invoice_number", "vendor"]
+    assert missing["field_scores"]["date"] == 0.4
+    assert missing["field_scores"]["amount"] == 0.3
+
+
+@pytest.mark.unit
+def test_batch_matches_record_by_record_validation():
+    batch = validate_batch("invoice", RECORDS)
+
+    assert batch.scores.shape == (len(RECORDS), 4)
+    assert batch.to_results() == [validate_record("invoice", record) for record in RECORDS]
+    np.testing.assert_array_equal(batch.needs_review(), batch.overall < 0.6)
+
+
+@pytest.mark.unit
+def test_batch_handles_empty_input_unknown_types_and_list_values():
+    contracts = [{"parties": ["Acme", "Beta"]}, {"parties": ["Acme", "Beta"]}]
+    assert validate_batch("contract", contracts).to_results() == [validate_record("contract", c) for c in contracts]
+    assert len(validate_batch("invoice", [])) == 0
+    unknown = validate_batch("memo", [{"title": "x"}])
+    assert unknown.results(0)["overall_score"] == 0.0
+
+
+@pytest.mark.unit
+def test_revalidate_groups_by_type_and_keeps_order():
+    documents = [
+        {"document_type": "receipt", "extracted_data": {"date": "2024-06-01", "amount": "$ 4.50", "vendor": "Cafe"}},
+        {"document_type": "invoice", "extracted_data": RECORDS[0]},
+        {"document_type": "receipt", "extracted_data": {"date": "NOT_FOUND", "amount": "4.50", "vendor": "Cafe"}},
+    ]
+    results = revalidate(documents)
+
+    assert [r["overall_score"] for r in results] == pytest.approx([1.0, 1.0, 2 / 3])
+    assert results[2]["missing_fields"] == ["date"]
+
+
+@pytest.mark.unit
+def test_checks_accept_non_string_values():
+    assert check_amount(250) and check_amount(99.5)
+    assert not check_amount(None) and not check_amount(0) and not check_amount(["$ 5"])
+    assert not check_date(None) and not check_date(20240601)
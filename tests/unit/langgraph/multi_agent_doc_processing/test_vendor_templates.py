@@ -0,0 +1,134 @@
+import json
+import pytest
+from src.services.langgraph.multi_agent_doc_processing.agents.extract_agent.vendor_templates import (
+    TemplateStore, derive_rule, value_shape,
+)
+from src.services.langgraph.multi_agent_doc_processing.workflow import create_document_workflow
+
+TEMPLATE = """ACME OFFICE SUPPLIES LTD
+Invoice No. {number} (please quote on payment)
+Date: {date}
+Vendor: Acme Office Supplies
+Total Amount: {amount}"""
+
+class MockLLMResponse:
+    def __init__(self, content):
+        self.content = content
+
+class ScriptedLLM:
+    def __init__(self, fields):
+        self.fields = fields
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        if "Classify" in prompt:
+            return MockLLMResponse("invoice")
+        return MockLLMResponse(json.dumps(self.fields))
+
+def make_state(content):
+    return {"document_content": content, "error_count": 0, "human_review_required": False, "messages": []}
+
+@pytest.mark.unit
+def test_value_shape_generalises_digits_and_words():
+    import re
+    pattern = re.compile(value_shape("INV-2025-045"))
+    assert pattern.fullmatch("INV-2026-100")
+    assert not pattern.fullmatch("2026-100")
+
+@pytest.mark.unit
+def test_derive_rule_uses_label_anchor():
+    import re
+    content = TEMPLATE.format(number="INV-1", date="2024-06-01", amount="$ 100.00")
+    rule = re.compile(derive_rule(content, "INV-1"), re.MULTILINE)
+    other = TEMPLATE.format(number="INV-77", date="2025-01-15", amount="$ 9,999.99")
+    assert rule.search(other).group("value") == "INV-77"
+    assert derive_rule(content, "not in document") is None
+
+def acme_fields(number, date, amount):
+    return {"invoice_number": number, "date": date, "amount": amount, "vendor": "Acme Office Supplies"}
+
+@pytest.mark.unit
+def test_repeat_vendor_invoice_needs_no_llm_calls_once_rules_are_checked():
+    store = TemplateStore(min_samples=1, audit_rate=0.0)
+    llm = ScriptedLLM(acme_fields("INV-1", "2024-06-01", "$ 100.00"))
+    workflow = create_document_workflow(llm=llm, template_store=store)
+    workflow.invoke(make_state(TEMPLATE.format(number="INV-1", date="2024-06-01", amount="$ 100.00")))
+    assert len(store) == 1
+
+    # Second document: the new rules are checked against the LLM's own extraction
+    llm.fields = acme_fields("INV-2", "2024-07-09", "$ 2,450.10")
+    llm.prompts.clear()
+    workflow.invoke(make_state(TEMPLATE.format(number="INV-2", date="2024-07-09", amount="$ 2,450.10")))
+    assert len([p for p in llm.prompts if "Extract" in p]) == 1
+    assert store.stats()["precision"] == pytest.approx(1.0)
+
+    # Checked rules are trusted: only the classify prompt reaches the LLM
+    llm.prompts.clear()
+    result = workflow.invoke(make_state(TEMPLATE.format(number="INV-3", date="2024-08-02", amount="$ 7.00")))
+    assert [p for p in llm.prompts if "Extract" in p] == []
+    assert result["extracted_data"] == acme_fields("INV-3", "2024-08-02", "$ 7.00")
+    assert result["validation_results"]["overall_score"] == pytest.approx(1.0)
+    assert store.stats()["fully_covered"] == 1
+
+@pytest.mark.unit
+def test_rules_that_disagree_with_the_llm_are_dropped():
+    store = TemplateStore(min_samples=2, audit_rate=0.0)
+    llm = ScriptedLLM(acme_fields("INV-1", "2024-06-01", "$ 100.00"))
+    workflow = create_document_workflow(llm=llm, template_store=store)
+    workflow.invoke(make_state(TEMPLATE.format(number="INV-1", date="2024-06-01", amount="$ 100.00")))
+
+    # The LLM reads a different amount than the rule would (e.g. a subtotal line), twice
+    for number in ("INV-2", "INV-3"):
+        llm.fields = acme_fields(number, "2024-06-01", "$ 90.00")
+        workflow.invoke(make_state(TEMPLATE.format(number=number, date="2024-06-01", amount="$ 100.00")))
+
+    (template,) = store._templates.values()
+    assert "amount" not in template.rules
+    assert template.rules["invoice_number"].validated == 2
+
+@pytest.mark.unit
+def test_held_back_fields_are_audited_against_the_llm_not_the_field_rules():
+    store = TemplateStore(min_samples=2, audit_rate=0.0)
+    llm = ScriptedLLM({})
+    workflow = create_document_workflow(llm=llm, template_store=store, rule_extraction=True)
+    # The rules find every field of the first invoice, and the template learns from them
+    workflow.invoke(make_state(TEMPLATE.format(number="INV-1", date="2024-06-01", amount="$ 100.00")))
+    assert len(store) == 1
+
+    # The rules would normalise "2024-7-9" to "2024-07-09"; the audited date must come from the LLM
+    for number in ("INV-2", "INV-3"):
+        llm.fields = acme_fields(number, "2024-7-9", "$ 2,450.10")
+        llm.prompts.clear()
+        workflow.invoke(make_state(TEMPLATE.format(number=number, date="2024-7-9", amount="$ 2,450.10")))
+        (extract_prompt,) = [p for p in llm.prompts if "Extract" in p]
+        assert "date" in extract_prompt
+
+    (template,) = store._templates.values()
+    assert (template.rules["date"].applied, template.rules["date"].validated) == (2, 2)
+    assert store.stats()["precision"] == pytest.approx(1.0)
+
+@pytest.mark.unit
+def test_vendor_is_only_matched_in_issuer_context():
+    store = TemplateStore()
+    store.learn({
+        "document_type": "invoice",
+        "document_content": TEMPLATE.format(number="INV-1", date="2024-06-01", amount="$ 100.00"),
+        "extracted_data": acme_fields("INV-1", "2024-06-01", "$ 100.00"),
+        "validation_results": {"overall_score": 1.0, "field_scores": {}},
+    })
+    other_vendor = "GLOBEX CORP\nInvoice No. G-9\nDate: 2024-06-01\nBill to: Acme Office Supplies\nTotal Amount: $ 5.00"
+    assert store.apply({"document_type": "invoice", "document_content": other_vendor}) == {}
+    issued = "GLOBEX CORP\nAcme Office Supplies\nInvoice No. G-9"
+    assert store.apply({"document_type": "invoice", "document_content": issued})["vendor"] == "Acme Office Supplies"
+
+@pytest.mark.unit
+def test_low_scoring_extraction_does_not_create_template():
+    store = TemplateStore()
+    store.learn({
+        "document_type": "invoice",
+        "document_content": "Vendor: Acme\nDate: soon",
+        "extracted_data": {"vendor": "Acme", "date": "soon"},
+        "validation_results": {"overall_score": 0.4, "field_scores": {"vendor": 1.0, "date": 0.4}},
+    })
+    assert len(store) == 0
@@ -0,0 +1,113 @@
+import threading
+import time
+import pytest
+
+from src.llm_health import CircuitBreaker, ProviderHealth
+from src.llm_manager import LLMManager
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def wait(futures):
+    for future in futures:
+        future.result(timeout=5)
+
+
+@pytest.mark.unit
+def test_circuit_breaker_opens_then_half_opens():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now = 10
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now = 20
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.unit
+def test_reads_never_block_on_a_slow_probe():
+    release = threading.Event()
+
+    def slow_probe():
+        release.wait(5)
+        return True
+
+    health = ProviderHealth({"ollama": slow_probe})
+    start = time.perf_counter()
+    assert health.is_available("ollama")  # unknown counts as available
+    assert time.perf_counter() - start < 0.1
+    release.set()
+    health.close()
+
+
+@pytest.mark.unit
+def test_results_are_cached_for_ttl_and_failed_probes_mark_provider_down():
+    clock = FakeClock()
+    calls = {"ollama": 0}
+
+    def probe():
+        calls["ollama"] += 1
+        return False
+
+    health = ProviderHealth({"ollama": probe}, ttl=30, failure_threshold=3, clock=clock)
+    wait(health.refresh())
+    assert not health.is_available("ollama")
+    assert health.refresh() == []  # still fresh
+    assert calls["ollama"] == 1
+
+    clock.now = 31
+    wait(health.refresh())
+    assert calls["ollama"] == 2
+
+
+@pytest.mark.unit
+def test_open_breaker_suppresses_probes_until_half_open_probe_recovers():
+    clock = FakeClock()
+    outcomes = [False, False, True]
+
+    health = ProviderHealth({"openai": lambda: outcomes.pop(0)}, ttl=1, failure_threshold=2,
+                            reset_timeout=60, clock=clock)
+    wait(health.refresh())
+    clock.now = 2
+    wait(health.refresh())
+    assert health.snapshot()["openai"]["breaker"] == CircuitBreaker.OPEN
+
+    clock.now = 30
+    assert health.refresh() == []
+    assert not health.is_available("openai")
+
+    clock.now = 70
+    wait(health.refresh())
+    assert health.is_available("openai")
+
+
+@pytest.mark.unit
+def test_manager_prefers_configured_provider_and_skips_known_down():
+    health = ProviderHealth({"ollama": lambda: False, "openai": lambda: True}, failure_threshold=1)
+    wait(health.refresh())
+
+    manager = LLMManager(provider="ollama", health=health)
+    assert manager._get_preferred_provider() == "openai"
+    assert manager.available_providers == {"ollama": False, "openai": True}
+    with pytest.raises(ValueError):
+        manager.get_llm(provider="ollama")
+
+    manager.report_failure("openai")
+    with pytest.raises(RuntimeError):
+        manager._get_preferred_provider()
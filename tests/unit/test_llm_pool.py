@@ -0,0 +1,120 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.llm_health import ProviderHealth
+from src.llm_manager import LLMManager
+from src.llm_pool import ClientRegistry, PoolSettings
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.unit
+def test_registry_reuses_clients_per_key():
+    registry = ClientRegistry(PoolSettings())
+    first = registry.get("openai", "gpt-4o-mini", object, settings="a")
+    assert registry.get("openai", "gpt-4o-mini", object, settings="a") is first
+    assert registry.get("openai", "gpt-4o-mini", object, settings="b") is not first
+    assert registry.get("openai", "gpt-4o", object, settings="a") is not first
+
+    stats = registry.stats()
+    assert (stats["clients"], stats["hits"], stats["misses"]) == (3, 1, 3)
+
+
+@pytest.mark.unit
+def test_registry_builds_each_client_once_under_concurrency():
+    registry = ClientRegistry(PoolSettings())
+    builds = []
+
+    def factory():
+        builds.append(1)
+        time.sleep(0.02)
+        return object()
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get("ollama", None, factory)))
+               for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(builds) == 1
+    assert len({id(client) for client in results}) == 1
+
+
+@pytest.mark.unit
+def test_shared_sync_pool_reuses_keepalive_connections(server_url):
+    registry = ClientRegistry(PoolSettings(max_connections=4))
+    sync_client, _ = registry.http_clients("openai")
+    for _ in range(5):
+        assert sync_client.get(server_url).status_code == 200
+
+    pool = registry.stats()["pools"]["openai"]
+    assert pool["requests"] == 5
+    assert pool["connections_opened"] == 1
+    assert pool["connections_reused"] == 4
+    assert pool["in_flight"] == 0
+    assert pool["peak_utilisation"] == 0.25
+    registry.close()
+
+
+@pytest.mark.unit
+def test_async_pool_is_safe_across_event_loops(server_url):
+    registry = ClientRegistry(PoolSettings())
+    _, async_client = registry.http_clients("openai")
+
+    loop_pools = []
+
+    async def fetch_twice():
+        statuses = [(await async_client.get(server_url)).status_code for _ in range(2)]
+        transport, _ = async_client._transport._transports[asyncio.get_running_loop()]
+        assert len(transport._pool.connections) == 1
+        loop_pools.append(transport._pool)
+        return statuses
+
+    # A fresh loop per call, like the Lambda async_handler
+    assert asyncio.run(fetch_twice()) == [200, 200]
+    assert asyncio.run(fetch_twice()) == [200, 200]
+
+    pool = registry.stats()["pools"]["openai"]
+    assert pool["requests"] == 4
+    assert pool["connections_opened"] == 2
+    assert pool["connections_reused"] == 2
+
+    # Each loop's pool was closed when asyncio.run shut the loop down
+    assert [len(loop_pool.connections) for loop_pool in loop_pools] == [0, 0]
+    assert len(async_client._transport._transports) == 0
+
+
+@pytest.mark.unit
+def test_manager_get_llm_returns_the_same_client():
+    pytest.importorskip("langchain_ollama")
+    health = ProviderHealth({"ollama": lambda: True})
+    manager = LLMManager(provider="ollama", health=health, registry=ClientRegistry(PoolSettings()))
+
+    assert manager.get_llm() is manager.get_llm()
+    assert manager.get_llm(model="other-model") is not manager.get_llm()
@@ -0,0 +1,94 @@
+import asyncio
+import time
+import pytest
+
+from langchain_core.messages import AIMessage
+
+from src.llm_health import ProviderHealth
+from src.llm_router import RoutingLLM
+
+
+class ScriptedLLM:
+    """Fake provider whose latencies (seconds) are played back in order; the last one repeats."""
+
+    def __init__(self, name, latencies, fail=False):
+        self.name = name
+        self.latencies = list(latencies)
+        self.fail = fail
+        self.calls = 0
+
+    def _next_latency(self):
+        self.calls += 1
+        return self.latencies.pop(0) if len(self.latencies) > 1 else self.latencies[0]
+
+    def invoke(self, prompt):
+        time.sleep(self._next_latency())
+        if self.fail:
+            raise RuntimeError(f"{self.name} failed")
+        return AIMessage(content=self.name)
+
+    async def ainvoke(self, prompt):
+        await asyncio.sleep(self._next_latency())
+        if self.fail:
+            raise RuntimeError(f"{self.name} failed")
+        return AIMessage(content=self.name)
+
+
+@pytest.mark.unit
+def test_routes_to_fastest_target_once_measured():
+    slow, fast = ScriptedLLM("slow", [0.03]), ScriptedLLM("fast", [0.005])
+    router = RoutingLLM([("a:slow", slow), ("b:fast", fast)], min_samples=2, default_hedge_delay=1.0)
+    for _ in range(4):
+        router.invoke("warm-up")  # unmeasured targets are explored first
+    assert slow.calls and fast.calls
+
+    # Measured windows well above the real sleeps, so no hedge fires on a loaded machine
+    for _ in range(10):
+        router.latency["a:slow"].record(0.3)
+        router.latency["b:fast"].record(0.2)
+    slow.calls = fast.calls = 0
+    for _ in range(5):
+        assert router.invoke("doc").content == "fast"
+    assert (slow.calls, fast.calls) == (0, 5)
+
+
+@pytest.mark.unit
+def test_hedges_when_primary_exceeds_its_p95():
+    # Primary is usually fast (p95 = 5 ms) but this call stalls; the hedge answers first
+    primary = ScriptedLLM("primary", [0.5])
+    backup = ScriptedLLM("backup", [0.02])
+    router = RoutingLLM([("a:primary", primary), ("b:backup", backup)], min_samples=5)
+    for _ in range(10):
+        router.latency["a:primary"].record(0.005)
+        router.latency["b:backup"].record(0.02)
+
+    start = time.perf_counter()
+    assert router.invoke("doc").content == "backup"
+    assert time.perf_counter() - start < 0.3
+    assert (primary.calls, backup.calls) == (1, 1)
+    assert router.stats()["hedges"] == 1
+    assert router.stats()["hedge_wins"] == 1
+
+
+@pytest.mark.unit
+def test_fails_over_and_reports_failure_to_health():
+    health = ProviderHealth({"a": lambda: True, "b": lambda: True}, failure_threshold=1)
+    broken, backup = ScriptedLLM("broken", [0.0], fail=True), ScriptedLLM("backup", [0.0])
+    router = RoutingLLM([("a:broken", broken), ("b:backup", backup)], health=health)
+
+    assert router.invoke("doc").content == "backup"
+    assert not health.is_available("a")
+    assert router.ranked() == ["b:backup"]
+
+
+@pytest.mark.unit
+def test_ainvoke_hedges_and_cancels_the_loser():
+    stalled = ScriptedLLM("stalled", [5.0])
+    backup = ScriptedLLM("backup", [0.01])
+    router = RoutingLLM([("a:stalled", stalled), ("b:backup", backup)], default_hedge_delay=0.05)
+
+    start = time.perf_counter()
+    response = asyncio.run(router.ainvoke("doc"))
+    assert response.content == "backup"
+    assert time.perf_counter() - start < 1.0
+    assert router.stats()["hedge_wins"] == 1